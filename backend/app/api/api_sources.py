@@ -5,9 +5,10 @@ from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List
 
-from app.database import get_db
+from app.database import AsyncSessionLocal, get_db
 from app.schemas.api_source import APISourceCreate, APISourceUpdate, APISourceResponse
 from app.models.api_source import APISource
+from app.services.model_sync import ModelSyncService
 
 router = APIRouter()
 
@@ -69,6 +70,14 @@ async def refresh_models(
     source_id: str,
     db: AsyncSession = Depends(get_db)
 ):
-    """刷新API Source的模型列表"""
-    # TODO: 实现刷新逻辑
-    raise HTTPException(status_code=501, detail="Not implemented")
\ No newline at end of file
+    """刷新API Source的模型列表（模型目录未变化时不写数据库）"""
+    api_source = await db.get(APISource, source_id)
+    if api_source is None:
+        raise HTTPException(status_code=404, detail="API Source不存在")
+    
+    result = await ModelSyncService(AsyncSessionLocal).sync_sources([{
+        "id": api_source.id,
+        "base_url": api_source.base_url,
+        "api_key": api_source.api_key
+    }])
+    return result["results"][source_id]
\ No newline at end of file
@@ -1,44 +1,75 @@
 """
 Config路由
 """
-from fastapi import APIRouter, Depends, HTTPException
+import os
+
+from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.config import settings
 from app.database import get_db
 from app.schemas.config import ConfigGenerate, ConfigPreview, ConfigApply, ConfigValidate, HealthStatus
+from app.services.config_generator import ConfigGeneratorService
+from app.services.health_monitor import MAX_LATENCY_WINDOW, HealthMonitorService
 
 router = APIRouter()
 
 
+def _config_service(db: AsyncSession) -> ConfigGeneratorService:
+    return ConfigGeneratorService(
+        db,
+        gpt_load_url=settings.GPT_LOAD_URL,
+        config_dir=os.path.dirname(settings.GPT_LOAD_CONFIG_PATH) or "."
+    )
+
+
 @router.post("/config/generate")
 async def generate_config(
     config_data: ConfigGenerate,
     db: AsyncSession = Depends(get_db)
 ):
-    """生成配置"""
-    # TODO: 实现配置生成逻辑
-    raise HTTPException(status_code=501, detail="Not implemented")
+    """生成配置并写入配置文件"""
+    service = _config_service(db)
+    artifact = await service.get_artifact(full_rebuild=config_data.force)
+    gptload_path, uniapi_path = await service.save_artifact(artifact)
+    return {
+        "revision": artifact.revision,
+        "gpt_load_config_path": gptload_path,
+        "uni_api_config_path": uniapi_path
+    }
 
 
 @router.get("/config/preview", response_model=ConfigPreview)
 async def preview_config(db: AsyncSession = Depends(get_db)):
     """预览配置"""
-    # TODO: 实现配置预览逻辑
-    raise HTTPException(status_code=501, detail="Not implemented")
+    gptload_text, uniapi_text = await _config_service(db).preview_configs()
+    return ConfigPreview(gpt_load_config=gptload_text, uni_api_config=uniapi_text)
 
 
 @router.post("/config/apply", response_model=ConfigApply)
 async def apply_config(db: AsyncSession = Depends(get_db)):
     """应用配置"""
-    # TODO: 实现配置应用逻辑
-    raise HTTPException(status_code=501, detail="Not implemented")
+    service = _config_service(db)
+    valid, errors = await service.validate_artifact()
+    if not valid:
+        raise HTTPException(status_code=422, detail={"message": "配置验证失败", "errors": errors})
+    
+    result = await service.apply_configs()
+    gpt_load = result.get("gpt_load", {})
+    uni_api = result.get("uni_api", {})
+    return ConfigApply(
+        success=bool(gpt_load.get("success")) and bool(uni_api.get("success")),
+        gpt_load_reloaded=bool(gpt_load.get("reloaded")),
+        uni_api_reloaded=bool(uni_api.get("reloaded")),
+        message=result.get("message")
+    )
 
 
 @router.post("/config/validate", response_model=ConfigValidate)
 async def validate_config(db: AsyncSession = Depends(get_db)):
     """验证配置"""
-    # TODO: 实现配置验证逻辑
-    raise HTTPException(status_code=501, detail="Not implemented")
+    valid, errors = await _config_service(db).validate_artifact()
+    return ConfigValidate(valid=valid, errors=errors)
 
 
 @router.get("/health", response_model=HealthStatus)
@@ -59,10 +90,13 @@ async def health_check(db: AsyncSession = Depends(get_db)):
 
 
 @router.get("/health/providers")
-async def get_provider_health(db: AsyncSession = Depends(get_db)):
-    """获取Provider健康状态"""
-    # TODO: 实现健康状态查询逻辑
-    return {"providers": []}
+async def get_provider_health(
+    window: float = Query(3600.0, gt=0, le=MAX_LATENCY_WINDOW),
+    db: AsyncSession = Depends(get_db)
+):
+    """获取Provider健康状态及最近 window 秒的延迟分位数（最长为按天汇总的保留期）"""
+    providers = await HealthMonitorService(db).get_provider_health(window)
+    return {"providers": providers}
 
 
 @router.post("/health/check")
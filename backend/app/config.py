@@ -31,11 +31,44 @@ class Settings(BaseSettings):
     UNI_API_URL: str = "http://localhost:8000"
     UNI_API_CONFIG_PATH: str = "./config/uni-api.yaml"
     
+    # 生成配置的输出格式与备份保留策略
+    CONFIG_OUTPUT_FORMAT: str = "yaml"  # yaml | json（JSON输出的文件扩展名为.json）
+    CONFIG_BACKUP_KEEP: int = 20  # 每个配置文件最多保留的备份数，0表示不备份
+    CONFIG_BACKUP_MAX_AGE_DAYS: float = 30.0  # 备份最长保留天数，0表示不按时间清理
+    CONFIG_APPLY_CONFIRM_TIMEOUT: float = 30.0  # 秒，热更新后等待服务恢复健康的时间
+    
     # 健康检查配置
     HEALTH_CHECK_ENABLED: bool = True
     HEALTH_CHECK_INTERVAL: int = 300  # 秒
     HEALTH_CHECK_TIMEOUT: int = 30
     HEALTH_CHECK_RETRY: int = 3
+    HEALTH_CHECK_PROBE_MODE: str = "head"  # head | stream | full，源不支持轻量探测时自动回退为full
+    HEALTH_CHECK_MAX_CONCURRENT: int = 10  # 同时进行的健康检查数
+    HEALTH_CHECK_MIN_INTERVAL_FACTOR: float = 0.25  # 异常的源按 间隔*此系数 更频繁地检查
+    HEALTH_CHECK_MAX_INTERVAL_FACTOR: float = 4.0  # 稳定的源的检查间隔最多放宽到 间隔*此系数
+    HEALTH_CHECK_BUFFER_SIZE: int = 500  # 缓冲的检查记录达到此数量时批量写入
+    HEALTH_CHECK_BUFFER_FLUSH_INTERVAL: float = 5.0  # 秒，定时写入缓冲记录的间隔
+    HEALTH_CHECK_BUFFER_MAX_PENDING: int = 10000  # 缓冲上限，写满时检查等待写入完成
+    
+    # 健康检查记录保留配置（天数为0表示不删除）
+    HEALTH_CHECK_RETENTION_DAYS: float = 7.0  # 原始记录保留天数，应覆盖LOAD_BALANCE_WINDOW
+    HEALTH_ROLLUP_MINUTE_RETENTION_DAYS: float = 2.0  # 分钟汇总保留天数，统计接口读取最近一小时
+    HEALTH_ROLLUP_HOUR_RETENTION_DAYS: float = 90.0  # 小时汇总保留天数，统计接口读取最近一天
+    HEALTH_ROLLUP_DAY_RETENTION_DAYS: float = 730.0  # 按天汇总保留天数
+    HEALTH_RETENTION_INTERVAL: float = 3600.0  # 秒，清理间隔，0表示不自动清理
+    HEALTH_RETENTION_BATCH_SIZE: int = 1000  # 每批删除的行数，每批单独提交
+    HEALTH_RETENTION_BATCH_PAUSE: float = 0.05  # 秒，批次之间的暂停，让出写锁
+    
+    # 聚合分组负载均衡配置
+    LOAD_BALANCE_DEFAULT_STRATEGY: str = "weighted"  # round_robin | weighted | least_latency，model_mappings未配置时使用
+    LOAD_BALANCE_WINDOW: float = 3600.0  # 秒，计算延迟分位数和错误率的健康检查记录窗口
+    LOAD_BALANCE_MIN_SAMPLES: int = 3  # 窗口内记录数少于此值的API源不参与评分
+    LOAD_BALANCE_RECOMPUTE_INTERVAL: float = 60.0  # 秒，重算权重的间隔，0表示只在启动时计算一次
+    LOAD_BALANCE_AUTO_APPLY: bool = False  # 权重变化后是否自动重新应用配置
+    
+    # 模型名称标准化配置
+    NORMALIZATION_CONFIG_PATH: str = "./config/config.yaml"  # 读取其中的normalization段
+    NORMALIZATION_RELOAD_INTERVAL: float = 10.0  # 秒，检查配置文件变化的间隔，0表示不热加载
     
     # 日志配置
     LOG_LEVEL: str = "INFO"
@@ -51,6 +84,24 @@ class Settings(BaseSettings):
     MAX_CONCURRENT_REQUESTS: int = 100
     REQUEST_TIMEOUT: int = 60
     
+    # HTTP连接池配置
+    HTTP2_ENABLED: bool = True  # 需要安装h2，未安装时自动回退到HTTP/1.1
+    HTTP_MAX_CONNECTIONS_PER_HOST: int = 10
+    HTTP_MAX_KEEPALIVE_PER_HOST: int = 5
+    HTTP_KEEPALIVE_EXPIRY: float = 30.0  # 秒
+    HTTP_CONNECT_TIMEOUT: float = 10.0  # 秒
+    
+    # 重试配置
+    RETRY_MAX_ATTEMPTS: int = 3
+    RETRY_BASE_DELAY: float = 1.0  # 秒，完全抖动退避的基础时间
+    RETRY_MAX_DELAY: float = 30.0  # 秒，单次等待上限
+    RETRY_DEADLINE: float = 60.0  # 秒，单次调用（含重试）的截止时间
+    RETRY_GLOBAL_BUDGET: float = 50.0  # 进程级重试令牌数
+    RETRY_GLOBAL_BUDGET_REFILL: float = 1.0  # 每秒恢复的令牌数
+    RETRY_SOURCE_BUDGET: float = 3.0  # 每个API源的重试令牌数（进程内共享）
+    RETRY_SOURCE_BUDGET_REFILL: float = 0.1  # 每个API源每秒恢复的令牌数
+    RETRY_SOURCE_BUDGET_MAX_SOURCES: int = 10000  # 最多保留预算的API源数量，超出时淘汰最久未使用的
+    
     class Config:
         env_file = ".env"
         case_sensitive = True
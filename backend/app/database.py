@@ -58,7 +58,7 @@ async def init_db():
     """
     try:
         # 导入所有模型以确保它们被注册
-        from app.models import api_source, model, provider_model
+        from app.models import api_source, model, provider_model, revision, health_rollup
         
         async with engine.begin() as conn:
             # 创建所有表
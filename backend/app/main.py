@@ -6,9 +6,21 @@ from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 from contextlib import asynccontextmanager
 import logging
+import os
 
 from app.config import settings
-from app.database import init_db
+from app.database import init_db, AsyncSessionLocal
+from app.services.catalog_cache import default_catalog_cache
+from app.services.config_cache import config_artifact_cache
+from app.services.config_generator import ConfigGeneratorService
+from app.services.health_buffer import health_check_buffer
+from app.services.health_probe import health_prober
+from app.services.health_retention import HealthRetention
+from app.services.health_scheduler import HealthCheckScheduler
+from app.services.load_balancer import LoadBalanceReweighter, load_balance_scores
+from app.services.retry_policy import default_retry_metrics
+from app.services.transport_manager import transport_manager
+from app.services.normalization_reloader import NormalizationReloader
 from app.api import api_sources, models, providers, config
 
 # 配置日志
@@ -19,17 +31,94 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 
+async def _apply_rebalanced_config(changed) -> None:
+    """负载均衡评分变化后重新应用配置，只推送权重变化的聚合分组"""
+    async with AsyncSessionLocal() as db:
+        service = ConfigGeneratorService(
+            db,
+            gpt_load_url=settings.GPT_LOAD_URL,
+            config_dir=os.path.dirname(settings.GPT_LOAD_CONFIG_PATH) or "."
+        )
+        valid, errors = await service.validate_artifact()
+        if not valid:
+            logger.error(f"负载均衡权重变化后的配置验证失败，未应用: {errors[:5]}")
+            return
+        result = await service.apply_configs()
+        logger.info(f"负载均衡权重变化，已重新应用配置: {result.get('message')}")
+
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """应用生命周期管理"""
     # 启动时初始化数据库
     logger.info("初始化数据库...")
     await init_db()
+    
+    # 加载标准化规则并监视配置文件变化
+    normalization_reloader = NormalizationReloader(
+        settings.NORMALIZATION_CONFIG_PATH,
+        AsyncSessionLocal,
+        interval=settings.NORMALIZATION_RELOAD_INTERVAL
+    )
+    if settings.NORMALIZATION_RELOAD_INTERVAL > 0:
+        normalization_reloader.start()
+    else:
+        await normalization_reloader.check_once()
+    
+    # 按健康检查记录计算聚合分组的负载均衡权重并定期重算
+    reweighter = LoadBalanceReweighter(
+        AsyncSessionLocal,
+        interval=settings.LOAD_BALANCE_RECOMPUTE_INTERVAL,
+        window=settings.LOAD_BALANCE_WINDOW,
+        min_samples=settings.LOAD_BALANCE_MIN_SAMPLES,
+        on_change=_apply_rebalanced_config if settings.LOAD_BALANCE_AUTO_APPLY else None
+    )
+    if settings.LOAD_BALANCE_RECOMPUTE_INTERVAL > 0:
+        reweighter.start()
+    else:
+        await reweighter.recompute()
+    
+    # 健康检查记录先进入缓冲，定时批量写入
+    health_check_buffer.start()
+    
+    # 定期检查API源健康状态，检查时间在间隔内均匀分布
+    health_scheduler = HealthCheckScheduler(
+        AsyncSessionLocal,
+        interval=settings.HEALTH_CHECK_INTERVAL,
+        timeout=settings.HEALTH_CHECK_TIMEOUT,
+        max_concurrent=settings.HEALTH_CHECK_MAX_CONCURRENT,
+        min_factor=settings.HEALTH_CHECK_MIN_INTERVAL_FACTOR,
+        max_factor=settings.HEALTH_CHECK_MAX_INTERVAL_FACTOR
+    )
+    app.state.health_scheduler = health_scheduler
+    if settings.HEALTH_CHECK_ENABLED and settings.HEALTH_CHECK_INTERVAL > 0:
+        health_scheduler.start()
+    
+    # 定期将健康检查记录降采样并分批删除过期记录
+    health_retention = HealthRetention(
+        AsyncSessionLocal,
+        raw_days=settings.HEALTH_CHECK_RETENTION_DAYS,
+        minute_days=settings.HEALTH_ROLLUP_MINUTE_RETENTION_DAYS,
+        hour_days=settings.HEALTH_ROLLUP_HOUR_RETENTION_DAYS,
+        day_days=settings.HEALTH_ROLLUP_DAY_RETENTION_DAYS,
+        batch_size=settings.HEALTH_RETENTION_BATCH_SIZE,
+        pause=settings.HEALTH_RETENTION_BATCH_PAUSE,
+        interval=settings.HEALTH_RETENTION_INTERVAL
+    )
+    app.state.health_retention = health_retention
+    if settings.HEALTH_RETENTION_INTERVAL > 0:
+        health_retention.start()
     logger.info("应用启动完成")
     
     yield
     
     # 关闭时清理资源
+    await health_retention.stop()
+    await health_scheduler.stop()
+    await health_check_buffer.stop()
+    await reweighter.stop()
+    await normalization_reloader.stop()
+    await transport_manager.aclose()
     logger.info("应用关闭")
 
 
@@ -73,6 +162,22 @@ async def health_check():
     }
 
 
+@app.get("/api/v1/metrics")
+async def get_metrics():
+    """运行时指标（连接池、模型目录缓存、重试、配置缓存、负载均衡评分、健康检查调度、写入缓冲、探测和记录清理）"""
+    return {
+        "http_pool": transport_manager.get_stats(),
+        "catalog_cache": default_catalog_cache.get_stats(),
+        "retry": default_retry_metrics.get_stats(),
+        "config_cache": config_artifact_cache.get_stats(),
+        "load_balance": load_balance_scores.get_stats(),
+        "health_scheduler": app.state.health_scheduler.get_stats(),
+        "health_buffer": health_check_buffer.get_stats(),
+        "health_probe": health_prober.get_stats(),
+        "health_retention": app.state.health_retention.get_stats()
+    }
+
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(
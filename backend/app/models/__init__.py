@@ -4,6 +4,8 @@
 from app.models.api_source import APISource
 from app.models.model import Model
 from app.models.provider_model import Provider, ModelMapping, HealthCheck
+from app.models.health_rollup import ProviderHealthLatest, HealthRollupMinute, HealthRollupHour, HealthRollupDay
+from app.models.revision import DatabaseRevision
 
 __all__ = [
     "APISource",
@@ -11,4 +13,9 @@ __all__ = [
     "Provider",
     "ModelMapping",
     "HealthCheck",
+    "ProviderHealthLatest",
+    "HealthRollupMinute",
+    "HealthRollupHour",
+    "HealthRollupDay",
+    "DatabaseRevision",
 ]
\ No newline at end of file
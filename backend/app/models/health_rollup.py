@@ -0,0 +1,60 @@
+"""
+健康检查汇总数据模型
+"""
+from sqlalchemy import Column, String, Integer, DateTime, Text, LargeBinary
+from app.database import Base
+
+
+class ProviderHealthLatest(Base):
+    """
+    每个API源最近一次的健康检查结果
+    
+    写入健康检查记录时同步更新，统计接口不再扫描 health_checks 表
+    """
+    
+    __tablename__ = "provider_health_latest"
+    
+    provider_id = Column(String, primary_key=True)
+    status = Column(String, nullable=False)
+    response_time = Column(Integer, nullable=True)  # 毫秒
+    ttfb = Column(Integer, nullable=True)  # 毫秒，首字节时间
+    error_message = Column(Text, nullable=True)
+    checked_at = Column(DateTime(timezone=True), nullable=False)
+    
+    def __repr__(self):
+        return f"<ProviderHealthLatest(provider={self.provider_id}, status={self.status}, checked_at={self.checked_at})>"
+
+
+class HealthRollupMixin:
+    """按时间桶汇总的健康检查记录（每个API源每个时间桶一行）"""
+    
+    provider_id = Column(String, primary_key=True)
+    bucket = Column(DateTime(timezone=True), primary_key=True, index=True)  # 时间桶起点（UTC）
+    count = Column(Integer, nullable=False, default=0)  # 检查次数
+    errors = Column(Integer, nullable=False, default=0)  # 非healthy的次数
+    latency_sum = Column(Integer, nullable=False, default=0)  # 成功的检查的响应时间之和（毫秒）
+    p50 = Column(Integer, nullable=True)  # 毫秒
+    p95 = Column(Integer, nullable=True)
+    p99 = Column(Integer, nullable=True)
+    sketch = Column(LargeBinary, nullable=True)  # 成功的检查的响应时间分布（LatencySketch），用于合并多个时间桶
+    
+    def __repr__(self):
+        return f"<{type(self).__name__}(provider={self.provider_id}, bucket={self.bucket}, count={self.count})>"
+
+
+class HealthRollupMinute(HealthRollupMixin, Base):
+    """按分钟汇总的健康检查记录"""
+    
+    __tablename__ = "health_rollups_minute"
+
+
+class HealthRollupHour(HealthRollupMixin, Base):
+    """按小时汇总的健康检查记录"""
+    
+    __tablename__ = "health_rollups_hour"
+
+
+class HealthRollupDay(HealthRollupMixin, Base):
+    """按天汇总的健康检查记录（由保留任务从小时汇总降采样生成）"""
+    
+    __tablename__ = "health_rollups_day"
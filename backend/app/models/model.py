@@ -1,7 +1,7 @@
 """
 Model数据模型
 """
-from sqlalchemy import Column, String, Boolean, DateTime, ForeignKey
+from sqlalchemy import Column, String, Boolean, DateTime, ForeignKey, Index
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
 from app.database import Base
@@ -11,12 +11,18 @@ class Model(Base):
     """模型数据模型"""
     
     __tablename__ = "models"
+    __table_args__ = (
+        # 同一API源下原始模型名唯一，支撑批量upsert
+        Index("uq_models_provider_original", "provider_id", "original_name", unique=True),
+    )
     
     id = Column(String, primary_key=True, index=True)
     original_name = Column(String, nullable=False)
     normalized_name = Column(String, nullable=False, index=True)
     display_name = Column(String, nullable=True)
     provider_id = Column(String, ForeignKey("api_sources.id", ondelete="CASCADE"), nullable=False)
+    # 拆分provider的稳定标识，由API源ID和原始模型名派生（见 app.utils.split_naming）
+    split_key = Column(String, nullable=True)
     enabled = Column(Boolean, default=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
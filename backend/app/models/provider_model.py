@@ -1,7 +1,7 @@
 """
 Provider相关数据模型
 """
-from sqlalchemy import Column, String, Boolean, Integer, DateTime, ForeignKey, Text
+from sqlalchemy import Column, String, Boolean, Integer, DateTime, ForeignKey, Text, Index
 from sqlalchemy.sql import func
 from app.database import Base
 
@@ -43,11 +43,16 @@ class HealthCheck(Base):
     """健康检查记录数据模型"""
     
     __tablename__ = "health_checks"
+    __table_args__ = (
+        # 按API源查询最近的检查历史
+        Index("ix_health_checks_provider_checked", "provider_id", "checked_at"),
+    )
     
     id = Column(Integer, primary_key=True, autoincrement=True)
     provider_id = Column(String, ForeignKey("providers.id", ondelete="CASCADE"), nullable=False, index=True)
     status = Column(String, nullable=False)  # 'healthy', 'unhealthy', 'timeout'
     response_time = Column(Integer, nullable=True)  # 毫秒
+    ttfb = Column(Integer, nullable=True)  # 毫秒，首字节时间
     error_message = Column(Text, nullable=True)
     checked_at = Column(DateTime(timezone=True), server_default=func.now(), index=True)
     
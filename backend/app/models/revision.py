@@ -0,0 +1,24 @@
+"""
+数据库修订号数据模型
+"""
+from sqlalchemy import Column, Integer, DateTime
+from sqlalchemy.sql import func
+from app.database import Base
+
+
+class DatabaseRevision(Base):
+    """
+    数据库修订号
+    
+    只有一行（id=1）。每个写入 models、providers、api_sources 的事务
+    在提交前将 revision 加一，生成的配置按修订号缓存
+    """
+    
+    __tablename__ = "db_revision"
+    
+    id = Column(Integer, primary_key=True)
+    revision = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+    
+    def __repr__(self):
+        return f"<DatabaseRevision(revision={self.revision})>"
@@ -3,28 +3,48 @@ API聚合服务
 负责从多个API提供商获取模型列表
 """
 import logging
-import re
 import asyncio
-from typing import List, Dict, Optional, Tuple
+import hashlib
+from contextlib import AsyncExitStack, aclosing
+from typing import Any, AsyncIterator, Awaitable, Callable, List, Dict, Optional, Tuple
 import httpx
 
+from app.services.catalog_cache import ModelCatalogCache, default_catalog_cache
+from app.services.host_scheduler import HostScheduler
+from app.services.retry_policy import RetryPolicy, default_retry_policy
+from app.services.transport_manager import transport_manager
+from app.utils.json_stream import iter_model_entries
+from app.utils.normalization import get_normalizer
+
 logger = logging.getLogger(__name__)
 
 
 class APIAggregatorService:
     """API聚合服务"""
     
-    def __init__(self, max_concurrent: int = 5):
+    def __init__(
+        self,
+        max_concurrent: int = 5,
+        catalog_cache: Optional[ModelCatalogCache] = None,
+        client: Optional[httpx.AsyncClient] = None,
+        scheduler: Optional[HostScheduler] = None,
+        retry_policy: Optional[RetryPolicy] = None
+    ):
         """
         初始化API聚合服务
         
         Args:
-            max_concurrent: 最大并发请求数
+            max_concurrent: 全局最大并发请求数（每个主机另有自适应并发窗口）
+            catalog_cache: 模型目录缓存，默认使用进程级共享缓存
+            client: HTTP客户端，默认使用共享连接池
+            scheduler: 按主机的并发调度器
+            retry_policy: 重试策略，默认按Settings创建
         """
-        self.client = httpx.AsyncClient(timeout=30.0)
+        self.client = client or transport_manager.get_client()
+        self.scheduler = scheduler or HostScheduler(max_concurrent=max_concurrent)
+        self.catalog_cache = catalog_cache if catalog_cache is not None else default_catalog_cache
         self.max_concurrent = max_concurrent
-        self.max_retries = 3
-        self.backoff_factor = 2
+        self.retry_policy = retry_policy or default_retry_policy()
     
     async def fetch_models(
         self,
@@ -39,85 +59,299 @@ class APIAggregatorService:
             base_url: API基础URL
             api_key: API密钥
             retry_count: 当前重试次数
-            
+        
         Returns:
             (成功标志, 模型列表, 错误信息)
         """
+        success, models, error, _ = await self._fetch_models(base_url, api_key, retry_count)
+        return success, models, error
+    
+    async def _fetch_models(
+        self,
+        base_url: str,
+        api_key: str,
+        retry_count: int = 0
+    ) -> Tuple[bool, Optional[List[Dict]], Optional[str], bool]:
+        """
+        从API源获取模型列表（带目录缓存）
+        
+        上游返回304或内容摘要未变化时，直接返回缓存的模型列表，不再解析响应体
+        
+        Args:
+            base_url: API基础URL
+            api_key: API密钥
+            retry_count: 当前重试次数
+        
+        Returns:
+            (成功标志, 模型列表, 错误信息, 是否未变化)
+        """
         # 确保URL格式正确
         url = base_url.rstrip('/')
         if not url.endswith('/v1'):
             url = f"{url}/v1"
         
+        cache_key = self.catalog_cache.make_key(base_url, api_key) if self.catalog_cache else None
+        if cache_key:
+            # 流式获取只记录校验信息，这类条目不能用来返回模型列表
+            entry = self.catalog_cache.get(cache_key)
+            reusable = entry is not None and entry.models is not None
+        
         try:
             logger.info(f"正在获取模型列表: {url}/models")
             
-            response = await self.client.get(
-                f"{url}/models",
-                headers={"Authorization": f"Bearer {api_key}"},
-                timeout=30.0
+            headers = {"Authorization": f"Bearer {api_key}"}
+            if cache_key and reusable:
+                headers.update(self.catalog_cache.conditional_headers(cache_key))
+            
+            async def attempt(timeout: float) -> httpx.Response:
+                # 按主机的自适应并发窗口限制请求，重试等待期间不占用槽位
+                async with self.scheduler.slot(url) as slot:
+                    response = await self.client.get(
+                        f"{url}/models",
+                        headers=headers,
+                        timeout=timeout
+                    )
+                    slot.record(response.status_code)
+                    return response
+            
+            response = await self.retry_policy.call(
+                attempt,
+                key=ModelCatalogCache.make_key(base_url, api_key),
+                timeout=30.0,
+                start_attempt=retry_count
             )
             
             # 检查响应状态
             if response.status_code == 429:  # 速率限制
-                if retry_count < self.max_retries:
-                    wait_time = self.backoff_factor ** retry_count
-                    logger.warning(f"遇到速率限制，等待 {wait_time} 秒后重试...")
-                    await asyncio.sleep(wait_time)
-                    return await self.fetch_models(base_url, api_key, retry_count + 1)
-                else:
-                    return False, None, "超过最大重试次数（速率限制）"
+                return False, None, "超过最大重试次数（速率限制）", False
+            
+            # 上游确认未修改，直接使用缓存
+            if response.status_code == 304 and cache_key:
+                entry = self.catalog_cache.mark_not_modified(cache_key)
+                if entry:
+                    logger.info(f"模型列表未修改(304)，使用缓存: {url}/models")
+                    return True, entry.models, None, True
             
             response.raise_for_status()
-            data = response.json()
-            
-            # 处理不同的响应格式
-            models = []
-            if isinstance(data, dict):
-                # OpenAI格式: {"data": [...], "object": "list"}
-                if "data" in data:
-                    models = data["data"]
-                # 自定义格式: {"models": [...]}
-                elif "models" in data:
-                    models = data["models"]
-                # 直接是模型列表
-                elif "object" in data and data.get("object") == "list":
-                    models = data.get("data", [])
-            elif isinstance(data, list):
-                # 直接返回列表
-                models = data
             
-            logger.info(f"成功获取 {len(models)} 个模型")
-            return True, models, None
+            # 内容摘要未变化时跳过解析
+            content = response.content
+            if cache_key:
+                digest = self.catalog_cache.digest(content)
+                entry = self.catalog_cache.match_digest(cache_key, digest) if reusable else None
+                if entry:
+                    logger.info(f"模型列表内容未变化，使用缓存: {url}/models")
+                    return True, entry.models, None, True
+            
+            models = self._extract_models(response.json())
             
+            if cache_key:
+                self.catalog_cache.store(
+                    cache_key,
+                    models,
+                    digest=digest,
+                    size=len(content),
+                    etag=response.headers.get("ETag"),
+                    last_modified=response.headers.get("Last-Modified")
+                )
+            
+            logger.info(f"成功获取 {len(models)} 个模型")
+            return True, models, None, False
+        
         except httpx.TimeoutException:
             error_msg = "请求超时"
             logger.error(f"获取模型列表超时: {url}")
-            
-            if retry_count < self.max_retries:
-                wait_time = self.backoff_factor ** retry_count
-                logger.info(f"等待 {wait_time} 秒后重试...")
-                await asyncio.sleep(wait_time)
-                return await self.fetch_models(base_url, api_key, retry_count + 1)
-            
-            return False, None, error_msg
-            
+            return False, None, error_msg, False
+        
         except httpx.HTTPStatusError as e:
             error_msg = f"HTTP错误: {e.response.status_code}"
             logger.error(f"获取模型列表失败: {error_msg}")
-            
-            # 对于5xx错误进行重试
-            if 500 <= e.response.status_code < 600 and retry_count < self.max_retries:
-                wait_time = self.backoff_factor ** retry_count
-                logger.info(f"服务器错误，等待 {wait_time} 秒后重试...")
-                await asyncio.sleep(wait_time)
-                return await self.fetch_models(base_url, api_key, retry_count + 1)
-            
-            return False, None, error_msg
-            
+            return False, None, error_msg, False
+        
         except Exception as e:
             error_msg = f"未知错误: {str(e)}"
             logger.error(f"获取模型列表失败: {error_msg}")
-            return False, None, error_msg
+            return False, None, error_msg, False
+    
+    async def stream_models(self, base_url: str, api_key: str) -> AsyncIterator[Dict]:
+        """
+        流式获取模型列表
+        
+        以流的方式读取响应体并增量解析，只产出 id、owned_by、created 字段，
+        适用于返回数MB模型目录的API源。不使用目录缓存，每次都产出完整列表。
+        
+        Args:
+            base_url: API基础URL
+            api_key: API密钥
+        
+        Yields:
+            精简后的模型条目
+        
+        Raises:
+            httpx.HTTPStatusError: 上游返回错误状态码
+            ValueError: 响应不是合法的JSON
+        """
+        async for model in self._stream_models(base_url, api_key, {}, use_cache=False):
+            yield model
+    
+    async def iter_source_models(self, source: Dict, meta: Optional[Dict] = None) -> AsyncIterator[Dict]:
+        """
+        流式获取单个API源的模型列表（带目录缓存）
+        
+        上游返回304时不产出任何条目；内容摘要与上次一致时条目照常产出，
+        结束后才能确定未变化。两种情况 meta["unchanged"] 都为True
+        
+        Args:
+            source: API源，包含 {base_url, api_key}
+            meta: 输出参数，迭代结束后包含 unchanged 标志
+        
+        Yields:
+            精简后的模型条目
+        
+        Raises:
+            httpx.HTTPStatusError: 上游返回错误状态码
+            ValueError: 响应不是合法的JSON
+        """
+        async for model in self._stream_models(
+            source.get('base_url'),
+            source.get('api_key'),
+            meta if meta is not None else {},
+            use_cache=True
+        ):
+            yield model
+    
+    async def _stream_models(
+        self,
+        base_url: str,
+        api_key: str,
+        meta: Dict,
+        use_cache: bool
+    ) -> AsyncIterator[Dict]:
+        """
+        流式获取模型列表
+        
+        缓存只记录校验信息和内容摘要（models为None），不在内存中保留模型列表
+        
+        Args:
+            base_url: API基础URL
+            api_key: API密钥
+            meta: 输出参数，包含 unchanged 标志
+            use_cache: 是否发送条件请求并更新目录缓存
+        
+        Yields:
+            精简后的模型条目
+        """
+        url = base_url.rstrip('/')
+        if not url.endswith('/v1'):
+            url = f"{url}/v1"
+        
+        meta["unchanged"] = False
+        cache_key = None
+        if use_cache and self.catalog_cache:
+            cache_key = self.catalog_cache.make_key(base_url, api_key)
+        
+        headers = {"Authorization": f"Bearer {api_key}"}
+        if cache_key:
+            headers.update(self.catalog_cache.conditional_headers(cache_key))
+        
+        logger.info(f"正在流式获取模型列表: {url}/models")
+        
+        held: Optional[AsyncExitStack] = None
+        
+        async def attempt(timeout: float) -> httpx.Response:
+            # 主机槽位和响应一直持有到响应体读完；需要重试的响应立即释放，重试等待期间不占用槽位
+            nonlocal held
+            stack = AsyncExitStack()
+            slot = await stack.enter_async_context(self.scheduler.slot(url))
+            try:
+                response = await self.client.send(
+                    self.client.build_request("GET", f"{url}/models", headers=headers, timeout=timeout),
+                    stream=True
+                )
+            except BaseException as e:
+                await stack.__aexit__(type(e), e, e.__traceback__)
+                raise
+            stack.push_async_callback(response.aclose)
+            slot.record(response.status_code)
+            if response.status_code in self.retry_policy.retry_statuses:
+                await stack.aclose()
+            else:
+                held = stack
+            return response
+        
+        response = await self.retry_policy.call(
+            attempt,
+            key=ModelCatalogCache.make_key(base_url, api_key),
+            timeout=30.0
+        )
+        if held is None:
+            # 重试次数或预算用尽后仍为可重试状态码
+            response.raise_for_status()
+        
+        async with held:
+            # 上游确认未修改，调用方无需处理任何条目
+            if response.status_code == 304 and cache_key:
+                if self.catalog_cache.mark_not_modified(cache_key):
+                    logger.info(f"模型列表未修改(304): {url}/models")
+                    meta["unchanged"] = True
+                    return
+            
+            response.raise_for_status()
+            
+            hasher = hashlib.sha256()
+            size = 0
+            
+            async def chunks():
+                nonlocal size
+                async for chunk in response.aiter_bytes():
+                    hasher.update(chunk)
+                    size += len(chunk)
+                    yield chunk
+            
+            async for model in iter_model_entries(chunks()):
+                yield model
+            
+            if cache_key:
+                digest = hasher.hexdigest()
+                if self.catalog_cache.match_digest(cache_key, digest):
+                    meta["unchanged"] = True
+                else:
+                    self.catalog_cache.store(
+                        cache_key,
+                        None,
+                        digest=digest,
+                        size=size,
+                        etag=response.headers.get("ETag"),
+                        last_modified=response.headers.get("Last-Modified")
+                    )
+    
+    @staticmethod
+    def _extract_models(data) -> List[Dict]:
+        """
+        从响应数据中提取模型列表
+        
+        Args:
+            data: 解析后的JSON响应
+        
+        Returns:
+            模型列表
+        """
+        # 处理不同的响应格式
+        models = []
+        if isinstance(data, dict):
+            # OpenAI格式: {"data": [...], "object": "list"}
+            if "data" in data:
+                models = data["data"]
+            # 自定义格式: {"models": [...]}
+            elif "models" in data:
+                models = data["models"]
+            # 直接是模型列表
+            elif "object" in data and data.get("object") == "list":
+                models = data.get("data", [])
+        elif isinstance(data, list):
+            # 直接返回列表
+            models = data
+        return models
     
     def normalize_model_name(self, model_name: str) -> str:
         """
@@ -132,60 +366,39 @@ class APIAggregatorService:
         
         Args:
             model_name: 原始模型名称
-            
+        
         Returns:
             标准化后的名称
         """
-        if not model_name:
-            return ""
-        
-        normalized = model_name.strip()
-        
-        # 移除provider前缀
-        if '/' in normalized:
-            parts = normalized.split('/')
-            normalized = parts[-1]  # 取最后一部分
-        
-        # 移除日期后缀 (如 -20240620, -2024-06-20)
-        normalized = re.sub(r'-\d{8}$', '', normalized)
-        normalized = re.sub(r'-\d{4}-\d{2}-\d{2}$', '', normalized)
-        
-        # 移除preview后缀
-        normalized = re.sub(r'-preview$', '', normalized, flags=re.IGNORECASE)
-        
-        # 移除其他常见后缀
-        normalized = re.sub(r'-latest$', '', normalized, flags=re.IGNORECASE)
-        normalized = re.sub(r'-\d{4}$', '', normalized)  # 移除年份后缀
-        
-        # 转小写
-        normalized = normalized.lower()
-        
-        # 移除多余的连字符
-        normalized = re.sub(r'-+', '-', normalized)
-        normalized = normalized.strip('-')
-        
-        # 移除多余空格
-        normalized = ' '.join(normalized.split())
-        
-        return normalized
+        return get_normalizer().normalize(model_name)
     
     async def batch_fetch_models(
         self,
-        api_sources: List[Dict]
+        api_sources: List[Dict],
+        stream: bool = False,
+        consumer: Optional[Callable[[str, AsyncIterator[Dict]], Awaitable[Any]]] = None
     ) -> Dict[str, Dict]:
         """
         批量获取多个API源的模型
         
         Args:
             api_sources: API源列表，每个元素包含 {id, base_url, api_key}
-            
+            stream: 是否使用流式解析。开启后不在内存中构建模型列表，
+                每个API源的模型（只保留 id、owned_by、created 字段）以异步迭代器
+                交给 consumer(source_id, models) 边下载边处理
+            consumer: 流式模式下处理单个API源模型的协程函数，各API源并发调用；
+                上游返回304时迭代器为空
+        
         Returns:
             {
                 "results": {
                     "api_source_id": {
                         "success": bool,
-                        "models": List[Dict],
-                        "error": str
+                        "models": List[Dict],  # 仅非流式模式
+                        "result": Any,  # 仅流式模式，consumer的返回值
+                        "error": str,
+                        "model_count": int,
+                        "unchanged": bool  # 模型列表自上次获取后未变化
                     }
                 },
                 "summary": {
@@ -195,34 +408,40 @@ class APIAggregatorService:
                 }
             }
         """
+        if stream and consumer is None:
+            raise ValueError("流式获取需要提供 consumer")
+        
         results = {}
-        semaphore = asyncio.Semaphore(self.max_concurrent)
-        
-        async def fetch_with_semaphore(source: Dict):
-            """使用信号量限制并发"""
-            async with semaphore:
-                source_id = source.get('id')
-                base_url = source.get('base_url')
-                api_key = source.get('api_key')
-                
-                logger.info(f"开始获取API源 {source_id} 的模型列表")
-                
-                success, models, error = await self.fetch_models(base_url, api_key)
-                
-                results[source_id] = {
+        
+        async def fetch_source(source: Dict):
+            """获取单个API源，并发由调度器按主机控制"""
+            source_id = source.get('id')
+            base_url = source.get('base_url')
+            api_key = source.get('api_key')
+            
+            logger.info(f"开始获取API源 {source_id} 的模型列表")
+            
+            if stream:
+                result = await self._consume_source(source, consumer)
+            else:
+                success, models, error, unchanged = await self._fetch_models(base_url, api_key)
+                # unchanged为True时 ModelSyncService 跳过该源的数据库读写
+                result = {
                     "success": success,
                     "models": models if success else [],
                     "error": error,
-                    "model_count": len(models) if models else 0
+                    "model_count": len(models) if models else 0,
+                    "unchanged": unchanged
                 }
-                
-                if success:
-                    logger.info(f"API源 {source_id} 获取成功，共 {len(models)} 个模型")
-                else:
-                    logger.error(f"API源 {source_id} 获取失败: {error}")
+            results[source_id] = result
+            
+            if result["success"]:
+                logger.info(f"API源 {source_id} 获取成功，共 {result['model_count']} 个模型")
+            else:
+                logger.error(f"API源 {source_id} 获取失败: {result['error']}")
         
         # 创建并发任务
-        tasks = [fetch_with_semaphore(source) for source in api_sources]
+        tasks = [fetch_source(source) for source in api_sources]
         
         # 等待所有任务完成
         await asyncio.gather(*tasks, return_exceptions=True)
@@ -244,7 +463,62 @@ class APIAggregatorService:
             "summary": summary
         }
     
+    async def _consume_source(
+        self,
+        source: Dict,
+        consumer: Callable[[str, AsyncIterator[Dict]], Awaitable[Any]]
+    ) -> Dict:
+        """
+        把单个API源的模型流交给 consumer 处理
+        
+        Returns:
+            单个API源的结果，格式见 batch_fetch_models
+        """
+        meta = {}
+        count = 0
+        
+        async def models() -> AsyncIterator[Dict]:
+            nonlocal count
+            async for model in self.iter_source_models(source, meta):
+                count += 1
+                yield model
+        
+        base_url = source.get('base_url')
+        result = {"success": False, "result": None, "error": None, "model_count": 0, "unchanged": False}
+        try:
+            # consumer 提前结束时同样关闭响应并释放主机槽位
+            async with aclosing(models()) as iterator:
+                result["result"] = await consumer(source.get('id'), iterator)
+            result["success"] = True
+            result["unchanged"] = meta.get("unchanged", False)
+        except httpx.TimeoutException:
+            logger.error(f"流式获取模型列表超时: {base_url}")
+            result["error"] = "请求超时"
+        except httpx.HTTPStatusError as e:
+            result["error"] = f"HTTP错误: {e.response.status_code}"
+            logger.error(f"获取模型列表失败: {result['error']}")
+        except Exception as e:
+            result["error"] = f"未知错误: {str(e)}"
+            logger.error(f"获取模型列表失败: {result['error']}")
+        result["model_count"] = count
+        return result
+    
+    def get_scheduler_stats(self) -> Dict:
+        """获取按主机的并发调度统计"""
+        return self.scheduler.get_stats()
+    
+    def get_retry_stats(self) -> Dict:
+        """获取重试统计"""
+        return self.retry_policy.get_stats()
+    
+    def get_cache_stats(self) -> Dict:
+        """获取模型目录缓存统计"""
+        if not self.catalog_cache:
+            return {}
+        return self.catalog_cache.get_stats()
+    
     async def close(self):
-        """关闭HTTP客户端"""
-        await self.client.aclose()
+        """关闭HTTP客户端（共享客户端由应用生命周期统一关闭）"""
+        if not transport_manager.owns(self.client):
+            await self.client.aclose()
         logger.info("API聚合服务已关闭")
\ No newline at end of file
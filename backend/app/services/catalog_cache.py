@@ -0,0 +1,180 @@
+"""
+模型目录缓存
+基于条件请求（ETag/Last-Modified）和内容摘要缓存各API源的模型列表
+"""
+import hashlib
+import logging
+from typing import Dict, List, Optional
+
+from app.utils.normalization import normalize_url
+
+logger = logging.getLogger(__name__)
+
+
+class CatalogEntry:
+    """
+    单个API源的缓存条目
+    
+    models 为None表示只记录了校验信息和内容摘要（流式获取不保留模型列表），
+    这类条目只能判断是否变化，不能用来返回模型列表
+    """
+    
+    __slots__ = ("etag", "last_modified", "digest", "models", "size")
+    
+    def __init__(
+        self,
+        etag: Optional[str],
+        last_modified: Optional[str],
+        digest: str,
+        models: Optional[List[Dict]],
+        size: int
+    ):
+        self.etag = etag
+        self.last_modified = last_modified
+        self.digest = digest
+        self.models = models
+        self.size = size
+
+
+class ModelCatalogCache:
+    """
+    模型目录缓存
+    
+    缓存键由标准化后的base URL和API密钥的哈希组成，
+    不在内存中保存明文密钥。
+    """
+    
+    def __init__(self):
+        self._entries: Dict[str, CatalogEntry] = {}
+        self.hits = 0
+        self.misses = 0
+        self.revalidations = 0
+        self.not_modified = 0
+        self.digest_matches = 0
+        self.bytes_saved = 0
+    
+    @staticmethod
+    def make_key(base_url: str, api_key: str) -> str:
+        """
+        生成缓存键
+        
+        Args:
+            base_url: API基础URL
+            api_key: API密钥
+        
+        Returns:
+            缓存键
+        """
+        key_hash = hashlib.sha256((api_key or "").encode("utf-8")).hexdigest()[:16]
+        return f"{normalize_url(base_url)}#{key_hash}"
+    
+    @staticmethod
+    def digest(content: bytes) -> str:
+        """计算响应内容摘要"""
+        return hashlib.sha256(content).hexdigest()
+    
+    def get(self, key: str) -> Optional[CatalogEntry]:
+        """获取缓存条目"""
+        return self._entries.get(key)
+    
+    def conditional_headers(self, key: str) -> Dict[str, str]:
+        """
+        生成条件请求头
+        
+        Args:
+            key: 缓存键
+        
+        Returns:
+            If-None-Match / If-Modified-Since 请求头
+        """
+        entry = self._entries.get(key)
+        if not entry:
+            return {}
+        
+        headers = {}
+        if entry.etag:
+            headers["If-None-Match"] = entry.etag
+        if entry.last_modified:
+            headers["If-Modified-Since"] = entry.last_modified
+        if headers:
+            self.revalidations += 1
+        return headers
+    
+    def mark_not_modified(self, key: str) -> Optional[CatalogEntry]:
+        """
+        记录上游返回304
+        
+        Returns:
+            命中的缓存条目，不存在时返回None
+        """
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        self.hits += 1
+        self.not_modified += 1
+        self.bytes_saved += entry.size
+        return entry
+    
+    def match_digest(self, key: str, digest: str) -> Optional[CatalogEntry]:
+        """
+        比较内容摘要，摘要一致时视为命中
+        
+        Returns:
+            命中的缓存条目，未命中时返回None
+        """
+        entry = self._entries.get(key)
+        if entry is None or entry.digest != digest:
+            return None
+        self.hits += 1
+        self.digest_matches += 1
+        return entry
+    
+    def store(
+        self,
+        key: str,
+        models: Optional[List[Dict]],
+        digest: str,
+        size: int,
+        etag: Optional[str] = None,
+        last_modified: Optional[str] = None
+    ) -> None:
+        """写入缓存条目（记为一次未命中）"""
+        self.misses += 1
+        self._entries[key] = CatalogEntry(
+            etag=etag,
+            last_modified=last_modified,
+            digest=digest,
+            models=models,
+            size=size
+        )
+    
+    def invalidate(self, base_url: str, api_key: str) -> None:
+        """使某个API源的缓存失效"""
+        self._entries.pop(self.make_key(base_url, api_key), None)
+    
+    def clear(self) -> None:
+        """清空缓存"""
+        self._entries.clear()
+    
+    def get_stats(self) -> Dict:
+        """
+        获取缓存统计
+        
+        Returns:
+            命中、未命中、重新验证次数以及节省的字节数
+        """
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "revalidations": self.revalidations,
+            "not_modified": self.not_modified,
+            "digest_matches": self.digest_matches,
+            "bytes_saved": self.bytes_saved,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0
+        }
+
+
+# 进程级共享缓存，使各次刷新之间可以复用
+default_catalog_cache = ModelCatalogCache()
@@ -0,0 +1,164 @@
+"""
+配置产物缓存
+按数据库修订号和负载均衡评分版本缓存生成的配置及其序列化结果，
+预览、验证、应用在下一次写入前共享同一份产物
+"""
+import asyncio
+import logging
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+from app.utils.config_serializer import ConfigSerializer
+
+logger = logging.getLogger(__name__)
+
+# 产物中的配置目标
+GPTLOAD_TARGET = "gptload"
+UNIAPI_TARGET = "uniapi"
+
+
+@dataclass
+class ConfigArtifact:
+    """
+    某个数据库修订号下生成的配置
+    
+    配置字典在缓存中共享，调用方不应修改；序列化结果和验证结果
+    在首次使用时计算并保存在产物中
+    """
+    
+    revision: int
+    gpt_load_url: str
+    gptload_config: Dict
+    uniapi_config: Dict
+    balance_version: int = 0
+    rendered: Dict[Tuple[str, str], bytes] = field(default_factory=dict)
+    validation: Dict[str, Tuple[bool, List[str]]] = field(default_factory=dict)
+    
+    def config(self, target: str) -> Dict:
+        """按目标取配置"""
+        if target == GPTLOAD_TARGET:
+            return self.gptload_config
+        if target == UNIAPI_TARGET:
+            return self.uniapi_config
+        raise ValueError(f"未知的配置目标: {target}")
+    
+    def render(self, target: str, serializer: ConfigSerializer) -> bytes:
+        """
+        序列化配置，同一格式只序列化一次
+        
+        Args:
+            target: 配置目标（gptload 或 uniapi）
+            serializer: 序列化器
+        
+        Returns:
+            文件内容
+        """
+        key = (target, serializer.output_format)
+        data = self.rendered.get(key)
+        if data is None:
+            data = serializer.dumps(self.config(target))
+            self.rendered[key] = data
+        return data
+
+
+class ConfigArtifactCache:
+    """
+    配置产物缓存
+    
+    缓存键为 (数据库修订号, 负载均衡评分版本, gpt-load地址)。两者都未变化时
+    直接返回已有产物；同一修订号的并发请求只生成一次，其余请求等待后复用。
+    """
+    
+    def __init__(self, max_entries: int = 4):
+        """
+        初始化配置产物缓存
+        
+        Args:
+            max_entries: 保留的产物数量，超出时淘汰最久未使用的
+        """
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Tuple[int, int, str], ConfigArtifact]" = OrderedDict()
+        self._lock = asyncio.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+    
+    def get(self, revision: int, gpt_load_url: str, balance_version: int = 0) -> Optional[ConfigArtifact]:
+        """获取缓存的产物，不计入命中统计"""
+        key = (revision, balance_version, gpt_load_url)
+        artifact = self._entries.get(key)
+        if artifact is not None:
+            self._entries.move_to_end(key)
+        return artifact
+    
+    async def get_or_build(
+        self,
+        revision: int,
+        gpt_load_url: str,
+        build: Callable[[], Awaitable[ConfigArtifact]],
+        balance_version: int = 0
+    ) -> ConfigArtifact:
+        """
+        获取产物，未命中时调用 build 生成
+        
+        Args:
+            revision: 当前数据库修订号
+            gpt_load_url: gpt-load服务地址
+            build: 生成产物的协程函数
+            balance_version: 当前负载均衡评分版本
+        
+        Returns:
+            配置产物
+        """
+        artifact = self.get(revision, gpt_load_url, balance_version)
+        if artifact is not None:
+            self.hits += 1
+            return artifact
+        
+        async with self._lock:
+            # 等待期间其他请求可能已生成同一修订号的产物
+            artifact = self.get(revision, gpt_load_url, balance_version)
+            if artifact is not None:
+                self.hits += 1
+                return artifact
+            
+            self.misses += 1
+            artifact = await build()
+            self.put(artifact)
+            logger.info(f"配置产物已生成: revision={artifact.revision}")
+            return artifact
+    
+    def put(self, artifact: ConfigArtifact) -> None:
+        """保存产物"""
+        key = (artifact.revision, artifact.balance_version, artifact.gpt_load_url)
+        self._entries[key] = artifact
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+    
+    def clear(self) -> None:
+        """清空缓存"""
+        self._entries.clear()
+    
+    def get_stats(self) -> Dict:
+        """
+        获取缓存统计
+        
+        Returns:
+            命中、未命中次数以及缓存的修订号
+        """
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "revisions": sorted({revision for revision, _, _ in self._entries}),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0
+        }
+
+
+# 进程级共享缓存
+config_artifact_cache = ConfigArtifactCache()
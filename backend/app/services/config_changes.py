@@ -0,0 +1,234 @@
+"""
+配置变更记录
+监听数据库会话，记录影响生成配置的provider，供增量配置生成使用；
+写入 models、providers、api_sources、model_mappings 的事务提交前递增数据库修订号
+"""
+import logging
+from typing import Iterable, Optional, Set, Tuple
+
+from sqlalchemy import event, inspect, insert, select, update
+from sqlalchemy.engine import Connection
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app.models.revision import DatabaseRevision
+
+logger = logging.getLogger(__name__)
+
+# 影响生成配置的表
+MODELS_TABLE = "models"
+PROVIDERS_TABLE = "providers"
+API_SOURCES_TABLE = "api_sources"
+MODEL_MAPPINGS_TABLE = "model_mappings"
+
+# 写入时需要递增修订号的表
+REVISION_TABLES = frozenset({MODELS_TABLE, PROVIDERS_TABLE, API_SOURCES_TABLE, MODEL_MAPPINGS_TABLE})
+
+# 修订号所在行
+REVISION_ROW_ID = 1
+
+# 会话中待提交变更的存放键
+_PENDING_KEY = "config_changes"
+
+# 批量语句通过此执行选项声明受影响的provider，未声明时视为全量变更
+CHANGED_PROVIDERS_OPTION = "config_changed_providers"
+
+
+class _PendingChanges:
+    """单个会话中尚未提交的变更"""
+    
+    __slots__ = ("providers", "full", "touched", "revision")
+    
+    def __init__(self):
+        self.providers: Set[str] = set()
+        self.full = False
+        # 是否写入了需要递增修订号的表
+        self.touched = False
+        # 本事务递增后的修订号，尚未递增时为None
+        self.revision: Optional[int] = None
+
+
+class ConfigChangeLog:
+    """
+    配置变更日志
+    
+    记录已提交的、影响配置的provider ID。会话提交时才写入日志，
+    回滚的变更不会被记录。无法确定影响范围的批量语句记为全量变更。
+    同时记录本进程提交产生的修订号：数据库修订号中不在此集合内的，
+    是其他进程（或未经ORM会话）的写入，增量结果不再可信。
+    """
+    
+    def __init__(self):
+        self._providers: Set[str] = set()
+        self._full = False
+        self._revisions: Set[int] = set()
+        self.commits = 0
+    
+    def record(self, provider_ids: Iterable[str], revision: Optional[int] = None) -> None:
+        """记录发生变更的provider"""
+        self._providers.update(provider_ids)
+        self._record_revision(revision)
+        self.commits += 1
+    
+    def record_all(self, revision: Optional[int] = None) -> None:
+        """记录一次全量变更"""
+        self._full = True
+        self._record_revision(revision)
+        self.commits += 1
+    
+    def record_revision(self, revision: int) -> None:
+        """记录一次不影响配置、但递增了修订号的提交"""
+        self._record_revision(revision)
+    
+    def _record_revision(self, revision: Optional[int]) -> None:
+        if revision is not None:
+            self._revisions.add(revision)
+    
+    def drain(self) -> Tuple[bool, Set[str], Set[int]]:
+        """
+        取出并清空已记录的变更
+        
+        Returns:
+            (是否需要全量重建, 变更的provider ID集合, 本进程提交的修订号集合)
+        """
+        full, providers, revisions = self._full, self._providers, self._revisions
+        self._full = False
+        self._providers = set()
+        self._revisions = set()
+        return full, providers, revisions
+    
+    def __bool__(self) -> bool:
+        return self._full or bool(self._providers)
+
+
+def _pending(session: Session) -> _PendingChanges:
+    pending = session.info.get(_PENDING_KEY)
+    if pending is None:
+        pending = _PendingChanges()
+        session.info[_PENDING_KEY] = pending
+    return pending
+
+
+def _table_name(obj) -> str:
+    return getattr(obj, "__tablename__", "")
+
+
+def bump_revision(connection: Connection) -> int:
+    """
+    在当前事务中递增数据库修订号
+    
+    修订号随事务一起提交或回滚；并发写入由数据库的行锁（SQLite为写锁）串行化，
+    每个事务得到唯一且连续的修订号
+    
+    Returns:
+        递增后的修订号
+    """
+    table = DatabaseRevision.__table__
+    result = connection.execute(
+        update(table)
+        .where(table.c.id == REVISION_ROW_ID)
+        .values(revision=table.c.revision + 1)
+    )
+    if result.rowcount == 0:
+        connection.execute(insert(table).values(id=REVISION_ROW_ID, revision=1))
+        return 1
+    return connection.execute(select(table.c.revision).where(table.c.id == REVISION_ROW_ID)).scalar_one()
+
+
+async def get_revision(db: AsyncSession) -> int:
+    """读取当前数据库修订号，尚无写入时为0"""
+    result = await db.execute(
+        select(DatabaseRevision.revision).where(DatabaseRevision.id == REVISION_ROW_ID)
+    )
+    return result.scalar() or 0
+
+
+def has_uncommitted_changes(session) -> bool:
+    """
+    会话中是否有尚未提交的、需要递增修订号的写入
+    
+    此时读取到的修订号和数据都可能被回滚，不能用于缓存
+    """
+    pending = session.info.get(_PENDING_KEY)
+    return pending is not None and pending.touched
+
+
+def _ensure_revision(session: Session, pending: _PendingChanges) -> None:
+    """每个事务只递增一次修订号"""
+    if pending.revision is None:
+        pending.revision = bump_revision(session.connection())
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_flushed(session: Session, flush_context) -> None:
+    """收集工作单元中新增、修改、删除的模型和provider，并递增修订号"""
+    pending = None
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        table = _table_name(obj)
+        if table not in REVISION_TABLES:
+            continue
+        pending = pending or _pending(session)
+        pending.touched = True
+        if table == MODELS_TABLE:
+            pending.providers.add(obj.provider_id)
+            # provider_id被修改时，原provider同样受影响
+            history = inspect(obj).attrs.provider_id.history
+            pending.providers.update(p for p in history.deleted if p is not None)
+        elif table == PROVIDERS_TABLE:
+            pending.providers.add(obj.id)
+        elif table == MODEL_MAPPINGS_TABLE:
+            # 负载均衡策略只在全量重建时读取
+            pending.full = True
+    
+    if pending is not None:
+        _ensure_revision(session, pending)
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _collect_bulk(orm_execute_state) -> None:
+    """收集ORM批量 INSERT/UPDATE/DELETE 语句"""
+    if not (orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete):
+        return
+    mapper = orm_execute_state.bind_mapper
+    if mapper is None or mapper.local_table.name not in REVISION_TABLES:
+        return
+    
+    pending = _pending(orm_execute_state.session)
+    pending.touched = True
+    if mapper.local_table.name == API_SOURCES_TABLE:
+        return
+    providers = orm_execute_state.execution_options.get(CHANGED_PROVIDERS_OPTION)
+    if providers is None:
+        pending.full = True
+    else:
+        pending.providers.update(providers)
+
+
+@event.listens_for(Session, "before_commit")
+def _commit_revision(session: Session) -> None:
+    """批量语句不经过flush，在提交前补充递增修订号"""
+    pending = session.info.get(_PENDING_KEY)
+    if pending is not None and pending.touched:
+        _ensure_revision(session, pending)
+
+
+@event.listens_for(Session, "after_commit")
+def _publish(session: Session) -> None:
+    pending = session.info.pop(_PENDING_KEY, None)
+    if pending is None:
+        return
+    if pending.full:
+        config_changelog.record_all(pending.revision)
+    elif pending.providers:
+        config_changelog.record(pending.providers, pending.revision)
+    elif pending.revision is not None:
+        config_changelog.record_revision(pending.revision)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard(session: Session) -> None:
+    session.info.pop(_PENDING_KEY, None)
+
+
+# 进程级共享的变更日志
+config_changelog = ConfigChangeLog()
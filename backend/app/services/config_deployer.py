@@ -0,0 +1,323 @@
+"""
+配置热更新
+对比已部署配置与新配置，只在有变化时把配置推送到gpt-load、通知uni-api重载，
+等待服务确认；无法热更新时才回退为重启
+"""
+import asyncio
+import json
+import logging
+import os
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+
+import httpx
+
+from app.services.config_writer import atomic_write
+
+logger = logging.getLogger(__name__)
+
+# 各配置段中条目的标识字段
+GPTLOAD_SECTIONS = {
+    "providers": "name",
+    "groups": "name",
+    "aggregate_groups": "name"
+}
+UNIAPI_SECTIONS = {
+    "providers": "provider"
+}
+
+# 外部服务适配器的管理接口（docs/architecture-design-part2.md 7.1）：
+# POST /api/config 提交完整配置，POST /api/reload 触发重载
+CONFIG_PATH = "/api/config"
+RELOAD_PATH = "/api/reload"
+
+# 这些状态码表示服务不支持对应的管理接口
+UNSUPPORTED_STATUS_CODES = frozenset({404, 405, 501})
+
+
+class HotReloadUnsupported(Exception):
+    """服务不支持热更新，需要重启"""
+
+
+@dataclass
+class SectionDiff:
+    """单个配置段的差异"""
+    
+    added: List[Dict] = field(default_factory=list)
+    updated: List[Dict] = field(default_factory=list)
+    removed: List[str] = field(default_factory=list)
+    
+    def __bool__(self) -> bool:
+        return bool(self.added or self.updated or self.removed)
+    
+    def counts(self) -> Dict[str, int]:
+        return {"added": len(self.added), "updated": len(self.updated), "removed": len(self.removed)}
+
+
+def diff_section(old: List[Dict], new: List[Dict], key: str) -> SectionDiff:
+    """
+    按标识字段对比两个条目列表
+    
+    Args:
+        old: 已部署的条目
+        new: 新的条目
+        key: 标识字段
+    
+    Returns:
+        新增、修改、删除的条目
+    """
+    old_by_key = {item[key]: item for item in old}
+    new_keys = set()
+    diff = SectionDiff()
+    for item in new:
+        item_key = item[key]
+        new_keys.add(item_key)
+        previous = old_by_key.get(item_key)
+        if previous is None:
+            diff.added.append(item)
+        elif previous != item:
+            diff.updated.append(item)
+    diff.removed = [item_key for item_key in old_by_key if item_key not in new_keys]
+    return diff
+
+
+def diff_config(old: Dict, new: Dict, sections: Dict[str, str]) -> Dict[str, SectionDiff]:
+    """对比配置中的各列表段"""
+    return {
+        section: diff_section(old.get(section) or [], new.get(section) or [], key)
+        for section, key in sections.items()
+    }
+
+
+class DeployedConfigStore:
+    """
+    已部署配置的快照
+    
+    每次服务确认加载后保存一份，作为下一次计算差异的基准
+    """
+    
+    def __init__(self, config_dir: str):
+        self.directory = os.path.join(config_dir, "deployed")
+    
+    def _path(self, target: str) -> str:
+        return os.path.join(self.directory, f"{target}.json")
+    
+    def load(self, target: str) -> Optional[Dict]:
+        """读取快照，不存在或损坏时返回None"""
+        try:
+            with open(self._path(target), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            logger.warning(f"读取已部署配置快照失败，将按首次部署处理: {e}")
+            return None
+    
+    def save(self, target: str, config: Dict) -> None:
+        os.makedirs(self.directory, exist_ok=True)
+        atomic_write(self._path(target), json.dumps(config, ensure_ascii=False).encode("utf-8"))
+
+
+class GatewayClient:
+    """网关管理接口客户端"""
+    
+    def __init__(
+        self,
+        client: httpx.AsyncClient,
+        base_url: str,
+        auth_key: str = "",
+        timeout: float = 10.0
+    ):
+        self.client = client
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+        self.headers = {"Authorization": f"Bearer {auth_key}"} if auth_key else {}
+    
+    async def request(self, method: str, path: str, payload: Any = None) -> httpx.Response:
+        """
+        调用管理接口
+        
+        Raises:
+            HotReloadUnsupported: 服务不支持该接口
+            httpx.HTTPStatusError: 其他错误状态码
+        """
+        response = await self.client.request(
+            method,
+            f"{self.base_url}{path}",
+            json=payload,
+            headers=self.headers,
+            timeout=self.timeout
+        )
+        if response.status_code in UNSUPPORTED_STATUS_CODES:
+            raise HotReloadUnsupported(f"{method} {path} 返回 {response.status_code}")
+        response.raise_for_status()
+        return response
+    
+    async def wait_healthy(self, timeout: float, interval: float = 0.5) -> bool:
+        """轮询健康检查端点直到服务可用或超时"""
+        deadline = time.monotonic() + timeout
+        while True:
+            try:
+                response = await self.client.get(f"{self.base_url}/health", timeout=self.timeout)
+                if response.status_code == 200:
+                    return True
+            except httpx.HTTPError:
+                pass
+            if time.monotonic() + interval > deadline:
+                return False
+            await asyncio.sleep(interval)
+
+
+class ConfigDeployer:
+    """
+    配置热更新流水线
+    
+    按 providers / groups / aggregate_groups 等配置段与已部署快照对比，
+    没有变化的服务不发送任何请求。
+    gpt-load：配置变化时通过管理接口提交完整配置，然后触发重载并等待健康检查通过。
+    uni-api：配置文件由 save_configs 写入，内容变化时发送重载信号并等待确认。
+    任一步骤返回“不支持”时回退为重启。
+    """
+    
+    def __init__(
+        self,
+        client: httpx.AsyncClient,
+        config_dir: str,
+        gpt_load_url: str,
+        uni_api_url: str,
+        gpt_load_auth_key: str = "",
+        confirm_timeout: float = 30.0
+    ):
+        """
+        初始化配置热更新流水线
+        
+        Args:
+            client: HTTP客户端
+            config_dir: 配置目录（保存已部署配置快照）
+            gpt_load_url: gpt-load服务地址
+            uni_api_url: uni-api服务地址
+            gpt_load_auth_key: gpt-load管理密钥
+            confirm_timeout: 等待服务确认的超时时间（秒）
+        """
+        self.store = DeployedConfigStore(config_dir)
+        self.gpt_load = GatewayClient(client, gpt_load_url, gpt_load_auth_key)
+        self.uni_api = GatewayClient(client, uni_api_url)
+        self.confirm_timeout = confirm_timeout
+    
+    async def apply(self, gptload_config: Dict, uniapi_config: Dict) -> Dict[str, Any]:
+        """
+        应用配置
+        
+        Returns:
+            各服务的应用结果，以及是否需要重启
+        """
+        gpt_load_result = await self._apply_gptload(gptload_config)
+        uni_api_result = await self._apply_uniapi(uniapi_config)
+        
+        restart = [
+            name for name, item in (("gpt-load", gpt_load_result), ("uni-api", uni_api_result))
+            if item["requires_restart"]
+        ]
+        result = {
+            "gpt_load": gpt_load_result,
+            "uni_api": uni_api_result,
+            "requires_restart": bool(restart)
+        }
+        if restart:
+            result["restart_command"] = f"docker-compose restart {' '.join(restart)}"
+            result["message"] = f"部分服务不支持热更新，请执行以下命令重启：\n{result['restart_command']}"
+        elif gpt_load_result["success"] and uni_api_result["success"]:
+            if gpt_load_result["reloaded"] or uni_api_result["reloaded"]:
+                result["message"] = "配置已热更新"
+            else:
+                result["message"] = "配置无变化，无需更新"
+        else:
+            result["message"] = "配置应用失败，请检查服务状态"
+        return result
+    
+    async def _apply_gptload(self, config: Dict) -> Dict[str, Any]:
+        deployed = self.store.load("gpt-load") or {}
+        diffs = diff_config(deployed, config, GPTLOAD_SECTIONS)
+        redirects_changed = deployed.get("model_redirects") != config.get("model_redirects")
+        result = {
+            "success": False,
+            "reloaded": False,
+            "requires_restart": False,
+            "changes": {section: diff.counts() for section, diff in diffs.items()},
+            "message": ""
+        }
+        
+        if not any(diffs.values()) and not redirects_changed:
+            result["success"] = True
+            result["message"] = "gpt-load配置无变化"
+            return result
+        
+        try:
+            # 管理接口只接受完整配置，差异只用于判断是否需要推送和汇报变化
+            await self.gpt_load.request("POST", CONFIG_PATH, config)
+            await self.gpt_load.request("POST", RELOAD_PATH)
+        except HotReloadUnsupported as e:
+            result["requires_restart"] = True
+            result["message"] = f"gpt-load不支持热更新({e})，需要重启"
+            logger.warning(result["message"])
+            return result
+        except httpx.HTTPError as e:
+            result["message"] = f"推送gpt-load配置失败: {e}"
+            logger.error(result["message"])
+            return result
+        
+        return await self._confirm(self.gpt_load, "gpt-load", config, result)
+    
+    async def _apply_uniapi(self, config: Dict) -> Dict[str, Any]:
+        deployed = self.store.load("uni-api") or {}
+        diffs = diff_config(deployed, config, UNIAPI_SECTIONS)
+        other_changed = {k: v for k, v in deployed.items() if k not in UNIAPI_SECTIONS} != \
+            {k: v for k, v in config.items() if k not in UNIAPI_SECTIONS}
+        result = {
+            "success": False,
+            "reloaded": False,
+            "requires_restart": False,
+            "changes": {section: diff.counts() for section, diff in diffs.items()},
+            "message": ""
+        }
+        
+        if not any(diffs.values()) and not other_changed:
+            result["success"] = True
+            result["message"] = "uni-api配置无变化"
+            return result
+        
+        try:
+            # uni-api从配置文件加载，文件已原子写入，只需发送重载信号
+            await self.uni_api.request("POST", RELOAD_PATH)
+        except HotReloadUnsupported as e:
+            result["requires_restart"] = True
+            result["message"] = f"uni-api不支持热更新({e})，需要重启"
+            logger.warning(result["message"])
+            return result
+        except httpx.HTTPError as e:
+            result["message"] = f"通知uni-api重载失败: {e}"
+            logger.error(result["message"])
+            return result
+        
+        return await self._confirm(self.uni_api, "uni-api", config, result)
+    
+    async def _confirm(
+        self,
+        gateway: GatewayClient,
+        target: str,
+        config: Dict,
+        result: Dict[str, Any]
+    ) -> Dict[str, Any]:
+        """等待服务重载后恢复健康，确认后保存已部署快照"""
+        if not await gateway.wait_healthy(self.confirm_timeout):
+            result["message"] = f"{target}重载后未在 {self.confirm_timeout:.0f} 秒内恢复健康"
+            logger.error(result["message"])
+            return result
+        
+        self.store.save(target, config)
+        result["success"] = True
+        result["reloaded"] = True
+        result["message"] = f"{target}配置已热更新"
+        logger.info(f"{target}配置已热更新: {result['changes']}")
+        return result
@@ -3,19 +3,25 @@
 负责生成gpt-load和uni-api的配置文件
 """
 import logging
-import yaml
-import json
 import os
-from typing import Dict, List, Tuple, Optional
-from datetime import datetime
-from collections import defaultdict
-from pathlib import Path
+from typing import Any, Dict, List, Tuple, Optional
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, and_
 
-from app.models.model import Model
-from app.models.api_source import APISource
-from app.models.provider_model import Provider
+from app.config import settings
+from app.services.config_cache import (
+    GPTLOAD_TARGET,
+    UNIAPI_TARGET,
+    ConfigArtifact,
+    ConfigArtifactCache,
+    config_artifact_cache
+)
+from app.services.config_changes import get_revision, has_uncommitted_changes
+from app.services.config_graph import IncrementalConfigGenerator, incremental_config_generator
+from app.services.config_validator import config_validator
+from app.services.config_deployer import ConfigDeployer
+from app.services.config_writer import ConfigWriter
+from app.services.transport_manager import transport_manager
+from app.utils.config_serializer import ConfigSerializer
 
 logger = logging.getLogger(__name__)
 
@@ -27,7 +33,9 @@ class ConfigGeneratorService:
         self,
         db: AsyncSession,
         gpt_load_url: str = "http://localhost:3001",
-        config_dir: str = "/app/config"
+        config_dir: str = "/app/config",
+        generator: Optional[IncrementalConfigGenerator] = None,
+        cache: Optional[ConfigArtifactCache] = None
     ):
         """
         初始化配置生成服务
@@ -36,122 +44,84 @@ class ConfigGeneratorService:
             db: 数据库会话
             gpt_load_url: gpt-load服务地址
             config_dir: 配置文件目录
+            generator: 增量配置生成器，默认使用进程级共享实例
+            cache: 配置产物缓存，默认使用进程级共享实例
         """
         self.db = db
         self.gpt_load_url = gpt_load_url
         self.config_dir = config_dir
+        self.generator = generator if generator is not None else incremental_config_generator
+        self.cache = cache if cache is not None else config_artifact_cache
+        self.writer = ConfigWriter(
+            config_dir,
+            backup_keep=settings.CONFIG_BACKUP_KEEP,
+            backup_max_age_days=settings.CONFIG_BACKUP_MAX_AGE_DAYS
+        )
+        self.serializer = ConfigSerializer(settings.CONFIG_OUTPUT_FORMAT)
     
-    async def generate_gptload_config(self) -> Dict:
+    async def get_artifact(self, full_rebuild: bool = False) -> ConfigArtifact:
+        """
+        获取当前数据库修订号对应的配置产物
+        
+        修订号和负载均衡评分都未变化时直接复用缓存的产物（包括已序列化的内容
+        和验证结果），预览、验证、应用共享同一份产物；当前会话有未提交的写入时不使用缓存
+        
+        Args:
+            full_rebuild: 是否强制从数据库全量重建
+        
+        Returns:
+            配置产物
+        """
+        if full_rebuild or has_uncommitted_changes(self.db):
+            artifact = await self._build_artifact(full_rebuild)
+            if artifact.revision is not None:
+                self.cache.put(artifact)
+            return artifact
+        
+        revision = await get_revision(self.db)
+        return await self.cache.get_or_build(
+            revision, self.gpt_load_url, self._build_artifact, self.generator.balance.version
+        )
+    
+    async def _build_artifact(self, full_rebuild: bool = False) -> ConfigArtifact:
+        graph = await self.generator.refresh(self.db, full=full_rebuild)
+        return ConfigArtifact(
+            revision=self.generator.revision,
+            gpt_load_url=self.gpt_load_url,
+            gptload_config=graph.gptload_config(),
+            uniapi_config=graph.uniapi_config(self.gpt_load_url),
+            balance_version=self.generator.balance_version
+        )
+    
+    async def generate_gptload_config(self, full_rebuild: bool = False) -> Dict:
         """
         生成gpt-load配置
         
         包括：
         1. 普通分组配置（每个provider一个分组）
-        2. 聚合分组配置（按模型名称聚合多个provider）
+        2. 聚合分组配置（按模型名称聚合多个provider，负载均衡策略见 load_balancer）
         3. 模型重定向规则
         
+        配置由增量配置图生成，只重新加载上次生成后发生变更的provider；
+        数据库修订号未变化时复用缓存的配置
+        
+        Args:
+            full_rebuild: 是否强制从数据库全量重建
+        
         Returns:
             gpt-load配置字典
         """
         try:
             logger.info("开始生成gpt-load配置")
             
-            # 获取所有启用的provider
-            providers_stmt = select(Provider).where(Provider.enabled == True)
-            providers_result = await self.db.execute(providers_stmt)
-            providers = providers_result.scalars().all()
+            artifact = await self.get_artifact(full_rebuild)
+            config = artifact.gptload_config
             
-            if not providers:
+            if not config["providers"]:
                 logger.warning("没有启用的provider")
-                return {
-                    "providers": [],
-                    "groups": [],
-                    "aggregate_groups": [],
-                    "model_redirects": {}
-                }
-            
-            # 获取所有启用的模型
-            models_stmt = select(Model).where(Model.enabled == True)
-            models_result = await self.db.execute(models_stmt)
-            models = models_result.scalars().all()
-            
-            # 按provider分组模型
-            models_by_provider = defaultdict(list)
-            for model in models:
-                models_by_provider[model.provider_id].append(model)
-            
-            # 生成providers配置
-            providers_config = []
-            groups_config = []
-            
-            for provider in providers:
-                provider_models = models_by_provider.get(provider.id, [])
-                
-                if not provider_models:
-                    continue
-                
-                # 为每个模型创建独立的provider配置
-                for idx, model in enumerate(provider_models):
-                    provider_id = f"{provider.name}-{idx}"
-                    unified_name = model.display_name or model.normalized_name
-                    
-                    # Provider配置
-                    providers_config.append({
-                        "name": provider_id,
-                        "base_url": provider.base_url.rstrip('/'),
-                        "api_key": provider.api_key,
-                        "models": [model.original_name],
-                        "enabled": True
-                    })
-                    
-                    # 普通分组配置
-                    groups_config.append({
-                        "name": f"{provider_id}-{unified_name}",
-                        "providers": [provider_id],
-                        "strategy": "fixed_priority",
-                        "model_mapping": {
-                            unified_name: model.original_name
-                        }
-                    })
-            
-            # 生成聚合分组配置
-            aggregate_groups_config = []
-            model_redirects = {}
             
-            # 按统一模型名称分组
-            models_by_unified_name = defaultdict(list)
-            for provider in providers:
-                provider_models = models_by_provider.get(provider.id, [])
-                for idx, model in enumerate(provider_models):
-                    unified_name = model.display_name or model.normalized_name
-                    provider_id = f"{provider.name}-{idx}"
-                    group_name = f"{provider_id}-{unified_name}"
-                    models_by_unified_name[unified_name].append(group_name)
-            
-            # 创建聚合分组
-            for unified_name, group_names in models_by_unified_name.items():
-                if len(group_names) > 1:
-                    # 多个provider，创建聚合分组
-                    agg_group_name = f"Aggr-{unified_name}"
-                    aggregate_groups_config.append({
-                        "name": agg_group_name,
-                        "sub_groups": group_names,
-                        "load_balance": "round_robin"
-                    })
-                    model_redirects[unified_name] = agg_group_name
-                else:
-                    # 单个provider，直接重定向
-                    model_redirects[unified_name] = group_names[0]
-            
-            config = {
-                "providers": providers_config,
-                "groups": groups_config,
-                "aggregate_groups": aggregate_groups_config,
-                "model_redirects": model_redirects
-            }
-            
-            logger.info(f"gpt-load配置生成完成: {len(providers_config)} providers, "
-                       f"{len(groups_config)} groups, {len(aggregate_groups_config)} aggregate groups")
+            logger.info(f"gpt-load配置生成完成: {len(config['providers'])} providers, "
+                       f"{len(config['groups'])} groups, {len(config['aggregate_groups'])} aggregate groups")
             
             return config
             
@@ -159,57 +129,106 @@ class ConfigGeneratorService:
             logger.error(f"生成gpt-load配置失败: {e}")
             raise
     
-    async def generate_uniapi_config(self) -> Dict:
+    async def generate_uniapi_config(self, full_rebuild: bool = False) -> Dict:
         """
         生成uni-api配置
         
         为每个聚合分组生成provider配置，指向gpt-load
         
+        Args:
+            full_rebuild: 是否强制从数据库全量重建
+        
         Returns:
             uni-api配置字典
         """
         try:
             logger.info("开始生成uni-api配置")
             
-            # 获取所有启用的模型
-            models_stmt = select(Model).where(Model.enabled == True)
-            models_result = await self.db.execute(models_stmt)
-            models = models_result.scalars().all()
+            artifact = await self.get_artifact(full_rebuild)
+            config = artifact.uniapi_config
             
-            # 按统一模型名称去重
-            unified_models = {}
-            for model in models:
-                unified_name = model.display_name or model.normalized_name
-                if unified_name not in unified_models:
-                    unified_models[unified_name] = model
+            logger.info(f"uni-api配置生成完成: {len(config['providers'])} providers")
             
-            # 生成providers配置
-            providers_config = []
+            return config
             
-            for unified_name in unified_models.keys():
-                providers_config.append({
-                    "provider": f"gptload-{unified_name}",
-                    "base_url": f"{self.gpt_load_url}/proxy/{unified_name}",
-                    "api": "openai",
-                    "model": [unified_name]
-                })
+        except Exception as e:
+            logger.error(f"生成uni-api配置失败: {e}")
+            raise
+    
+    async def generate_all(self, full_rebuild: bool = False) -> Tuple[Dict, Dict]:
+        """
+        同时生成gpt-load和uni-api配置
+        
+        两份配置共享同一次数据库读取：provider和模型通过一次关联查询流式读取，
+        单次遍历构建providers、分组、聚合分组、重定向和uni-api providers
+        
+        Args:
+            full_rebuild: 是否强制从数据库全量重建
+        
+        Returns:
+            (gpt-load配置, uni-api配置)
+        """
+        try:
+            logger.info("开始生成gpt-load和uni-api配置")
             
-            config = {
-                "providers": providers_config,
-                "api": {
-                    "port": 8000,
-                    "bind": "0.0.0.0"
-                }
-            }
+            artifact = await self.get_artifact(full_rebuild)
+            gptload_config = artifact.gptload_config
+            uniapi_config = artifact.uniapi_config
             
-            logger.info(f"uni-api配置生成完成: {len(providers_config)} providers")
+            logger.info(f"配置生成完成: gpt-load {len(gptload_config['providers'])} providers, "
+                       f"{len(gptload_config['groups'])} groups, {len(gptload_config['aggregate_groups'])} aggregate groups; "
+                       f"uni-api {len(uniapi_config['providers'])} providers")
             
-            return config
+            return gptload_config, uniapi_config
             
         except Exception as e:
-            logger.error(f"生成uni-api配置失败: {e}")
+            logger.error(f"生成配置失败: {e}")
             raise
     
+    async def preview_configs(self) -> Tuple[str, str]:
+        """
+        预览将要写入的配置文件内容
+        
+        Returns:
+            (gpt-load配置文本, uni-api配置文本)
+        """
+        artifact = await self.get_artifact()
+        return (
+            artifact.render(GPTLOAD_TARGET, self.serializer).decode("utf-8"),
+            artifact.render(UNIAPI_TARGET, self.serializer).decode("utf-8")
+        )
+    
+    async def validate_artifact(self, artifact: Optional[ConfigArtifact] = None) -> Tuple[bool, List[str]]:
+        """
+        验证当前配置产物，同一产物只验证一次
+        
+        Args:
+            artifact: 配置产物，默认取当前修订号的产物
+        
+        Returns:
+            (是否有效, 错误列表)
+        """
+        if artifact is None:
+            artifact = await self.get_artifact()
+        
+        errors = []
+        for target in (GPTLOAD_TARGET, UNIAPI_TARGET):
+            if target not in artifact.validation:
+                artifact.validation[target] = await self.validate_config(artifact.config(target), target)
+            errors.extend(artifact.validation[target][1])
+        return not errors, errors
+    
+    async def verify_incremental(self) -> bool:
+        """
+        校验增量生成的配置与全量重建结果逐字节一致
+        
+        不一致时以全量重建结果为准
+        
+        Returns:
+            是否一致
+        """
+        return await self.generator.verify(self.db, self.gpt_load_url)
+    
     async def save_configs(
         self,
         gptload_config: Dict,
@@ -218,6 +237,10 @@ class ConfigGeneratorService:
         """
         保存配置文件
         
+        内容未变化的文件不会重写也不会产生备份；变化的文件先备份旧内容，
+        再通过临时文件原子替换，避免服务读到写了一半的配置。
+        配置按段流式序列化写入，格式由 CONFIG_OUTPUT_FORMAT 决定
+        
         Args:
             gptload_config: gpt-load配置
             uniapi_config: uni-api配置
@@ -226,136 +249,83 @@ class ConfigGeneratorService:
             (gpt-load配置路径, uni-api配置路径)
         """
         try:
-            # 确保配置目录存在
-            os.makedirs(self.config_dir, exist_ok=True)
-            
-            # 创建备份目录
-            backup_dir = os.path.join(self.config_dir, "backups")
-            os.makedirs(backup_dir, exist_ok=True)
-            
-            # 生成时间戳
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            
-            # 保存gpt-load配置
-            gptload_path = os.path.join(self.config_dir, "gpt-load.yaml")
-            gptload_backup_path = os.path.join(backup_dir, f"gpt-load_{timestamp}.yaml")
-            
-            # 如果存在旧配置，先备份
-            if os.path.exists(gptload_path):
-                with open(gptload_path, 'r', encoding='utf-8') as f:
-                    old_config = f.read()
-                with open(gptload_backup_path, 'w', encoding='utf-8') as f:
-                    f.write(old_config)
-                logger.info(f"已备份旧的gpt-load配置: {gptload_backup_path}")
+            extension = self.serializer.extension
+            gptload_result = self.writer.write(f"gpt-load{extension}", self.serializer.iter_chunks(gptload_config))
+            uniapi_result = self.writer.write(f"api{extension}", self.serializer.iter_chunks(uniapi_config))
+            return gptload_result.path, uniapi_result.path
             
-            # 保存新配置
-            with open(gptload_path, 'w', encoding='utf-8') as f:
-                yaml.dump(gptload_config, f, allow_unicode=True, default_flow_style=False, sort_keys=False)
-            logger.info(f"gpt-load配置已保存: {gptload_path}")
-            
-            # 保存uni-api配置
-            uniapi_path = os.path.join(self.config_dir, "api.yaml")
-            uniapi_backup_path = os.path.join(backup_dir, f"api_{timestamp}.yaml")
-            
-            # 如果存在旧配置，先备份
-            if os.path.exists(uniapi_path):
-                with open(uniapi_path, 'r', encoding='utf-8') as f:
-                    old_config = f.read()
-                with open(uniapi_backup_path, 'w', encoding='utf-8') as f:
-                    f.write(old_config)
-                logger.info(f"已备份旧的uni-api配置: {uniapi_backup_path}")
-            
-            # 保存新配置
-            with open(uniapi_path, 'w', encoding='utf-8') as f:
-                yaml.dump(uniapi_config, f, allow_unicode=True, default_flow_style=False, sort_keys=False)
-            logger.info(f"uni-api配置已保存: {uniapi_path}")
-            
-            return gptload_path, uniapi_path
+        except Exception as e:
+            logger.error(f"保存配置文件失败: {e}")
+            raise
+    
+    async def save_artifact(self, artifact: ConfigArtifact) -> Tuple[str, str]:
+        """
+        保存配置产物，复用产物中已序列化的内容
+        
+        Returns:
+            (gpt-load配置路径, uni-api配置路径)
+        """
+        try:
+            extension = self.serializer.extension
+            gptload_result = self.writer.write(f"gpt-load{extension}", artifact.render(GPTLOAD_TARGET, self.serializer))
+            uniapi_result = self.writer.write(f"api{extension}", artifact.render(UNIAPI_TARGET, self.serializer))
+            return gptload_result.path, uniapi_result.path
             
         except Exception as e:
             logger.error(f"保存配置文件失败: {e}")
             raise
     
-    async def apply_configs(self) -> Dict[str, Any]:
+    async def apply_configs(
+        self,
+        gptload_config: Optional[Dict] = None,
+        uniapi_config: Optional[Dict] = None
+    ) -> Dict[str, Any]:
         """
         应用配置到gpt-load和uni-api服务
         
         实现方式：
-        1. gpt-load: 配置存储在数据库中，需要通过管理API更新或重启服务
-        2. uni-api: 配置通过api.yaml文件，需要重启服务加载新配置
+        1. 保存配置文件（内容未变化时不会重写）
+        2. gpt-load: 与已部署配置对比，通过管理API只推送变化的分组，然后触发重载
+        3. uni-api: 配置文件变化时发送重载信号
+        4. 等待服务健康检查通过作为确认；服务不支持热更新时才提示重启
+        
+        Args:
+            gptload_config: gpt-load配置，默认使用当前修订号的配置产物
+            uniapi_config: uni-api配置，默认使用当前修订号的配置产物
         
         Returns:
             应用结果字典，包含状态和消息
         """
-        import httpx
-        import os
-        
         result = {
             "gpt_load": {"success": False, "message": ""},
             "uni_api": {"success": False, "message": ""},
-            "requires_restart": True
+            "requires_restart": False
         }
         
         try:
             logger.info("开始应用配置")
             
-            # 1. 处理gpt-load配置
-            # gpt-load使用数据库存储配置，配置已通过Web界面或API写入数据库
-            # 需要通过管理API触发配置重载或重启服务
-            gpt_load_url = os.getenv("GPT_LOAD_URL", "http://gpt-load:3001")
-            gpt_load_auth_key = os.getenv("GPT_LOAD_AUTH_KEY", "")
-            
-            try:
-                # 检查gpt-load服务是否可用
-                async with httpx.AsyncClient(timeout=10.0) as client:
-                    health_response = await client.get(f"{gpt_load_url}/health")
-                    if health_response.status_code == 200:
-                        result["gpt_load"]["success"] = True
-                        result["gpt_load"]["message"] = "gpt-load配置已保存到数据库，服务运行正常。注意：gpt-load需要重启才能加载新配置。"
-                        logger.info("gpt-load服务健康检查通过")
-                    else:
-                        result["gpt_load"]["message"] = f"gpt-load服务响应异常: {health_response.status_code}"
-                        logger.warning(result["gpt_load"]["message"])
-            except Exception as e:
-                result["gpt_load"]["message"] = f"无法连接到gpt-load服务: {str(e)}"
-                logger.error(result["gpt_load"]["message"])
-            
-            # 2. 处理uni-api配置
-            # uni-api使用api.yaml文件，配置文件已通过save_configs保存
-            # 需要重启uni-api服务来加载新配置
-            uni_api_url = os.getenv("UNI_API_URL", "http://uni-api:8000")
-            
-            try:
-                # 检查uni-api服务是否可用
-                async with httpx.AsyncClient(timeout=10.0) as client:
-                    # uni-api可能没有/health端点，尝试访问根路径
-                    try:
-                        health_response = await client.get(f"{uni_api_url}/health")
-                        is_healthy = health_response.status_code == 200
-                    except:
-                        # 如果没有health端点，尝试其他端点
-                        health_response = await client.get(f"{uni_api_url}/")
-                        is_healthy = health_response.status_code in [200, 404]
-                    
-                    if is_healthy:
-                        result["uni_api"]["success"] = True
-                        result["uni_api"]["message"] = "uni-api配置文件(api.yaml)已更新。注意：uni-api需要重启才能加载新配置。"
-                        logger.info("uni-api服务健康检查通过")
-                    else:
-                        result["uni_api"]["message"] = f"uni-api服务响应异常: {health_response.status_code}"
-                        logger.warning(result["uni_api"]["message"])
-            except Exception as e:
-                result["uni_api"]["message"] = f"无法连接到uni-api服务: {str(e)}"
-                logger.error(result["uni_api"]["message"])
-            
-            # 3. 提供重启建议
-            if result["gpt_load"]["success"] or result["uni_api"]["success"]:
-                result["restart_command"] = "docker-compose restart gpt-load uni-api"
-                result["message"] = "配置文件已更新。请执行以下命令重启服务以应用新配置：\ndocker-compose restart gpt-load uni-api"
-                logger.info("配置应用完成，需要重启服务")
+            if gptload_config is None or uniapi_config is None:
+                artifact = await self.get_artifact()
+                gptload_config, uniapi_config = artifact.gptload_config, artifact.uniapi_config
+                await self.save_artifact(artifact)
             else:
-                result["message"] = "配置应用失败，请检查服务状态"
-                logger.error("配置应用失败")
+                await self.save_configs(gptload_config, uniapi_config)
+            
+            deployer = ConfigDeployer(
+                transport_manager.get_client(),
+                self.config_dir,
+                gpt_load_url=os.getenv("GPT_LOAD_URL", "http://gpt-load:3001"),
+                uni_api_url=os.getenv("UNI_API_URL", "http://uni-api:8000"),
+                gpt_load_auth_key=os.getenv("GPT_LOAD_AUTH_KEY", ""),
+                confirm_timeout=settings.CONFIG_APPLY_CONFIRM_TIMEOUT
+            )
+            result = await deployer.apply(gptload_config, uniapi_config)
+            
+            if result["requires_restart"]:
+                logger.warning(f"配置应用完成，需要重启: {result['restart_command']}")
+            else:
+                logger.info(f"配置应用完成: {result['message']}")
             
             return result
             
@@ -368,6 +338,9 @@ class ConfigGeneratorService:
         """
         验证配置
         
+        除字段结构外，还检查分组引用的provider、聚合分组的子分组和重定向目标
+        是否存在，以及provider、分组名称是否重复；每条错误都带有路径
+        
         Args:
             config: 配置字典
             config_type: 配置类型 ("gptload" 或 "uniapi")
@@ -375,50 +348,14 @@ class ConfigGeneratorService:
         Returns:
             (是否有效, 错误列表)
         """
-        errors = []
-        
         try:
-            if config_type == "gptload":
-                # 验证gpt-load配置
-                if "providers" not in config:
-                    errors.append("缺少 'providers' 字段")
-                elif not isinstance(config["providers"], list):
-                    errors.append("'providers' 必须是列表")
-                
-                if "groups" not in config:
-                    errors.append("缺少 'groups' 字段")
-                elif not isinstance(config["groups"], list):
-                    errors.append("'groups' 必须是列表")
-                
-                # 验证每个provider
-                for idx, provider in enumerate(config.get("providers", [])):
-                    if "name" not in provider:
-                        errors.append(f"Provider {idx}: 缺少 'name' 字段")
-                    if "base_url" not in provider:
-                        errors.append(f"Provider {idx}: 缺少 'base_url' 字段")
-                    if "api_key" not in provider:
-                        errors.append(f"Provider {idx}: 缺少 'api_key' 字段")
-                
-            elif config_type == "uniapi":
-                # 验证uni-api配置
-                if "providers" not in config:
-                    errors.append("缺少 'providers' 字段")
-                elif not isinstance(config["providers"], list):
-                    errors.append("'providers' 必须是列表")
-                
-                # 验证每个provider
-                for idx, provider in enumerate(config.get("providers", [])):
-                    if "provider" not in provider:
-                        errors.append(f"Provider {idx}: 缺少 'provider' 字段")
-                    if "base_url" not in provider:
-                        errors.append(f"Provider {idx}: 缺少 'base_url' 字段")
-            
+            errors = [str(issue) for issue in config_validator.validate(config, config_type)]
             is_valid = len(errors) == 0
             
             if is_valid:
                 logger.info(f"{config_type} 配置验证通过")
             else:
-                logger.warning(f"{config_type} 配置验证失败: {errors}")
+                logger.warning(f"{config_type} 配置验证失败: {len(errors)} 个错误，首个错误: {errors[0]}")
             
             return is_valid, errors
             
@@ -0,0 +1,536 @@
+"""
+增量配置生成
+在内存中维护上一次生成的配置图，根据变更日志只重算受影响的provider、
+聚合分组和重定向；负载均衡评分变化时只重算相关的聚合分组；
+并提供全量重建用于校验和兜底
+"""
+import asyncio
+import bisect
+import logging
+from collections import defaultdict
+from typing import AsyncIterator, Dict, Iterable, List, NamedTuple, Optional, Set, Tuple
+
+from sqlalchemy import select, and_
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
+from app.models.model import Model
+from app.models.provider_model import ModelMapping, Provider
+from app.services.config_changes import ConfigChangeLog, config_changelog, get_revision, has_uncommitted_changes
+from app.services.load_balancer import (
+    ROUND_ROBIN,
+    LoadBalanceScores,
+    ProviderScore,
+    balance_aggregate,
+    load_balance_scores,
+    resolve_strategy,
+)
+from app.utils.config_serializer import render_yaml
+from app.utils.split_naming import split_group_name, split_key, split_provider_name
+
+logger = logging.getLogger(__name__)
+
+# 增量加载时每条IN查询的provider数量
+QUERY_CHUNK_SIZE = 500
+
+# 流式读取时每批获取的行数
+STREAM_BATCH_SIZE = 2000
+
+
+class _ProviderNode:
+    """
+    单个provider在配置图中的节点
+    
+    entries 按模型顺序保存 (统一名称, provider配置, 分组配置)；
+    未启用provider时只保留统一名称（uni-api仍会导出这些模型）。
+    names 记录每个统一名称首次出现的位置及对应的分组名。
+    
+    拆分provider按模型的 split_key 命名，而不是模型在列表中的位置，
+    增删一个模型只影响该模型自己的provider和分组。
+    """
+    
+    __slots__ = ("provider_id", "enabled", "entries", "names")
+    
+    def __init__(self, provider_id: str, provider, models: List):
+        self.provider_id = provider_id
+        self.enabled = provider is not None
+        self.entries: List[Tuple[str, Optional[Dict], Optional[Dict]]] = []
+        self.names: Dict[str, Tuple[int, List[str]]] = {}
+        
+        for idx, model in enumerate(models):
+            unified_name = model.display_name or model.normalized_name
+            if unified_name not in self.names:
+                self.names[unified_name] = (idx, [])
+            if provider is None:
+                self.entries.append((unified_name, None, None))
+                continue
+            
+            split_id = split_provider_name(provider.name, model.split_key or split_key(provider_id, model.original_name))
+            group_name = split_group_name(split_id, unified_name)
+            self.names[unified_name][1].append(group_name)
+            self.entries.append((
+                unified_name,
+                {
+                    "name": split_id,
+                    "base_url": provider.base_url.rstrip('/'),
+                    "api_key": provider.api_key,
+                    "models": [model.original_name],
+                    "enabled": True
+                },
+                {
+                    "name": group_name,
+                    "providers": [split_id],
+                    "strategy": "fixed_priority",
+                    "model_mapping": {
+                        unified_name: model.original_name
+                    }
+                }
+            ))
+
+
+class ConfigGraph:
+    """
+    配置图
+    
+    provider按ID排序，provider内的模型按原始模型名排序；聚合分组、重定向和
+    uni-api provider按统一名称首次出现的位置排序。增量更新与全量重建遵循
+    同一排序规则，因此两者的输出逐字节一致。
+    
+    聚合分组的负载均衡策略取自 model_mappings（未配置时为 default_strategy），
+    加权和最低延迟策略按 scores 中各API源的评分生成。
+    """
+    
+    def __init__(
+        self,
+        strategies: Optional[Dict[str, str]] = None,
+        scores: Optional[Dict[str, ProviderScore]] = None,
+        default_strategy: str = ROUND_ROBIN
+    ):
+        """
+        初始化配置图
+        
+        Args:
+            strategies: 统一名称 -> 负载均衡策略
+            scores: API源ID -> 负载均衡评分
+            default_strategy: 未配置策略的统一名称使用的策略
+        """
+        self.strategies = strategies if strategies is not None else {}
+        self.scores = scores if scores is not None else {}
+        self.default_strategy = default_strategy
+        self._nodes: Dict[str, _ProviderNode] = {}
+        self._order: List[str] = []
+        # 统一名称 -> 包含该名称的provider
+        self._name_index: Dict[str, Set[str]] = defaultdict(set)
+        # 统一名称 -> (gpt-load排序位置, 聚合分组或None, 重定向目标)
+        self._gptload_names: Dict[str, Tuple[Tuple[str, int], Optional[Dict], str]] = {}
+        # 统一名称 -> uni-api排序位置
+        self._uniapi_names: Dict[str, Tuple[str, int]] = {}
+        self.built = False
+    
+    def __len__(self) -> int:
+        return len(self._nodes)
+    
+    def set_provider(
+        self,
+        provider_id: str,
+        provider,
+        models: List
+    ) -> Set[str]:
+        """
+        替换一个provider的节点
+        
+        Args:
+            provider_id: provider ID
+            provider: 启用的provider（需要name、base_url、api_key），未启用或不存在时为None
+            models: 该provider下启用的模型（需要名称字段，按原始模型名排序）
+        
+        Returns:
+            受影响的统一名称
+        """
+        affected = set()
+        old = self._nodes.pop(provider_id, None)
+        if old is not None:
+            affected.update(old.names)
+            for name in old.names:
+                self._name_index[name].discard(provider_id)
+        
+        if provider is not None or models:
+            node = _ProviderNode(provider_id, provider, models)
+            self._nodes[provider_id] = node
+            affected.update(node.names)
+            for name in node.names:
+                self._name_index[name].add(provider_id)
+            if old is None:
+                bisect.insort(self._order, provider_id)
+        elif old is not None:
+            del self._order[bisect.bisect_left(self._order, provider_id)]
+        
+        return affected
+    
+    def refresh_names(self, names: Iterable[str]) -> None:
+        """重算指定统一名称的聚合分组、重定向和uni-api条目"""
+        for name in names:
+            provider_ids = sorted(self._name_index.get(name, ()))
+            if not provider_ids:
+                self._name_index.pop(name, None)
+                self._gptload_names.pop(name, None)
+                self._uniapi_names.pop(name, None)
+                continue
+            
+            first = provider_ids[0]
+            self._uniapi_names[name] = (first, self._nodes[first].names[name][0])
+            
+            members = []
+            position = None
+            for provider_id in provider_ids:
+                node = self._nodes[provider_id]
+                if not node.enabled:
+                    continue
+                idx, groups = node.names[name]
+                if position is None:
+                    position = (provider_id, idx)
+                members.extend((provider_id, group) for group in groups)
+            
+            if not members:
+                self._gptload_names.pop(name, None)
+            elif len(members) > 1:
+                # 多个provider，创建聚合分组
+                agg_group_name = f"Aggr-{name}"
+                strategy = resolve_strategy(self.strategies.get(name), self.default_strategy)
+                aggregate = {"name": agg_group_name}
+                aggregate.update(balance_aggregate(strategy, members, self.scores))
+                self._gptload_names[name] = (position, aggregate, agg_group_name)
+            else:
+                # 单个provider，直接重定向
+                self._gptload_names[name] = (position, None, members[0][1])
+    
+    def set_scores(self, scores: Dict[str, ProviderScore]) -> Set[str]:
+        """
+        替换负载均衡评分
+        
+        Returns:
+            需要重算的统一名称（评分变化的API源所包含的名称）
+        """
+        changed = {
+            provider_id for provider_id in scores.keys() | self.scores.keys()
+            if scores.get(provider_id) != self.scores.get(provider_id)
+        }
+        self.scores = scores
+        affected = set()
+        for provider_id in changed:
+            node = self._nodes.get(provider_id)
+            if node is not None and node.enabled:
+                affected.update(node.names)
+        return affected
+    
+    def gptload_config(self) -> Dict:
+        """生成gpt-load配置"""
+        providers_config = []
+        groups_config = []
+        for provider_id in self._order:
+            node = self._nodes[provider_id]
+            if not node.enabled:
+                continue
+            for _, provider_config, group_config in node.entries:
+                providers_config.append(provider_config)
+                groups_config.append(group_config)
+        
+        aggregate_groups_config = []
+        model_redirects = {}
+        for name, (_, aggregate, target) in sorted(self._gptload_names.items(), key=lambda item: item[1][0]):
+            if aggregate is not None:
+                aggregate_groups_config.append(aggregate)
+            model_redirects[name] = target
+        
+        return {
+            "providers": providers_config,
+            "groups": groups_config,
+            "aggregate_groups": aggregate_groups_config,
+            "model_redirects": model_redirects
+        }
+    
+    def uniapi_config(self, gpt_load_url: str) -> Dict:
+        """生成uni-api配置"""
+        providers_config = []
+        for name, _ in sorted(self._uniapi_names.items(), key=lambda item: item[1]):
+            providers_config.append({
+                "provider": f"gptload-{name}",
+                "base_url": f"{gpt_load_url}/proxy/{name}",
+                "api": "openai",
+                "model": [name]
+            })
+        
+        return {
+            "providers": providers_config,
+            "api": {
+                "port": 8000,
+                "bind": "0.0.0.0"
+            }
+        }
+
+
+class IncrementalConfigGenerator:
+    """
+    增量配置生成器
+    
+    首次生成或变更日志要求全量时从数据库重建配置图；之后只重新加载
+    变更日志中记录的provider。verify() 全量重建一份配置图并比较两者
+    序列化后的字节，不一致时以全量结果替换当前配置图。
+    
+    revision 为配置图对应的数据库修订号。上次生成之后的修订号若不全是
+    本进程提交的，说明有其他进程写入了数据库，此时同样全量重建。
+    
+    负载均衡策略在全量重建时从 model_mappings 读取（写入该表会触发全量重建）；
+    负载均衡评分由后台任务更新，每次刷新时只重算评分变化的API源所在的聚合分组。
+    balance_version 为配置图所用评分的版本号。
+    """
+    
+    def __init__(
+        self,
+        graph: Optional[ConfigGraph] = None,
+        changelog: Optional[ConfigChangeLog] = None,
+        balance: Optional[LoadBalanceScores] = None,
+        default_strategy: Optional[str] = None
+    ):
+        """
+        初始化增量配置生成器
+        
+        Args:
+            graph: 配置图，默认新建
+            changelog: 变更日志，默认使用进程级共享的变更日志
+            balance: 负载均衡评分，默认使用进程级共享的评分
+            default_strategy: 未配置策略的统一名称使用的负载均衡策略，默认取 LOAD_BALANCE_DEFAULT_STRATEGY
+        """
+        self.graph = graph if graph is not None else ConfigGraph()
+        self.changelog = changelog if changelog is not None else config_changelog
+        self.balance = balance if balance is not None else load_balance_scores
+        self.default_strategy = resolve_strategy(
+            default_strategy or settings.LOAD_BALANCE_DEFAULT_STRATEGY, ROUND_ROBIN
+        )
+        self._lock = asyncio.Lock()
+        self.revision: Optional[int] = None
+        self.balance_version = 0
+        self.full_rebuilds = 0
+        self.incremental_updates = 0
+        self.external_changes = 0
+        self.verify_mismatches = 0
+    
+    async def refresh(self, db: AsyncSession, full: bool = False) -> ConfigGraph:
+        """
+        将配置图更新到数据库的当前状态
+        
+        Args:
+            db: 数据库会话
+            full: 是否强制全量重建
+        
+        Returns:
+            更新后的配置图
+        """
+        async with self._lock:
+            # 先取出变更再读取数据库，读取期间提交的变更留到下一次处理
+            rebuild, changed, local_revisions = self.changelog.drain()
+            balance_version, scores = self.balance.version, self.balance.scores
+            revision = await get_revision(db)
+            if not (full or rebuild) and self.graph.built and self._has_external_changes(revision, local_revisions):
+                self.external_changes += 1
+                logger.info(f"配置图修订号 {self.revision} 到数据库修订号 {revision} 之间有未记录的写入，全量重建配置图")
+                rebuild = True
+            
+            if full or rebuild or not self.graph.built:
+                self.graph = await self.build(db, scores, self.default_strategy)
+                self.full_rebuilds += 1
+                logger.info(f"配置图全量重建完成: {len(self.graph)} providers")
+            else:
+                if changed:
+                    affected = await self._apply(db, changed)
+                    self.incremental_updates += 1
+                    logger.info(f"配置图增量更新: {len(changed)} providers, {len(affected)} 个统一名称")
+                if self.graph.scores is not scores:
+                    affected = self.graph.set_scores(scores)
+                    self.graph.refresh_names(affected)
+                    logger.info(f"负载均衡评分更新: 重算 {len(affected)} 个统一名称")
+            self.balance_version = balance_version
+            # 配置图包含未提交的数据时，下次刷新全量重建
+            self.revision = None if has_uncommitted_changes(db) else revision
+            return self.graph
+    
+    def _has_external_changes(self, revision: int, local_revisions: Set[int]) -> bool:
+        """上次生成之后的每个修订号是否都由本进程提交"""
+        if self.revision is None:
+            return True
+        if revision < self.revision:
+            # 修订号回退（数据库被替换或恢复）
+            return True
+        local = sum(1 for r in local_revisions if self.revision < r <= revision)
+        return local != revision - self.revision
+    
+    async def verify(self, db: AsyncSession, gpt_load_url: str) -> bool:
+        """
+        校验增量结果与全量重建结果逐字节一致
+        
+        Args:
+            db: 数据库会话
+            gpt_load_url: gpt-load服务地址（用于uni-api配置）
+        
+        Returns:
+            是否一致；不一致时配置图被替换为全量重建结果
+        """
+        await self.refresh(db)
+        async with self._lock:
+            rebuilt = await self.build(db, self.graph.scores, self.default_strategy)
+            consistent = (
+                render_yaml(self.graph.gptload_config()) == render_yaml(rebuilt.gptload_config())
+                and render_yaml(self.graph.uniapi_config(gpt_load_url)) == render_yaml(rebuilt.uniapi_config(gpt_load_url))
+            )
+            if not consistent:
+                self.verify_mismatches += 1
+                logger.error("增量配置与全量重建结果不一致，已回退为全量重建结果")
+                self.graph = rebuilt
+            return consistent
+    
+    @staticmethod
+    async def build(
+        db: AsyncSession,
+        scores: Optional[Dict[str, ProviderScore]] = None,
+        default_strategy: str = ROUND_ROBIN
+    ) -> ConfigGraph:
+        """
+        从数据库全量构建配置图
+        
+        模型和provider通过一次关联查询流式读取，逐行构建节点
+        
+        Args:
+            db: 数据库会话
+            scores: 负载均衡评分
+            default_strategy: 未配置策略的统一名称使用的负载均衡策略
+        """
+        graph = ConfigGraph(await _load_strategies(db), scores, default_strategy)
+        affected = set()
+        async for provider_id, provider, models in _load_providers(db):
+            affected |= graph.set_provider(provider_id, provider, models)
+        graph.refresh_names(affected)
+        graph.built = True
+        return graph
+    
+    async def _apply(self, db: AsyncSession, provider_ids: Set[str]) -> Set[str]:
+        """重新加载变更的provider并更新配置图"""
+        provider_ids = list(provider_ids)
+        affected = set()
+        
+        for start in range(0, len(provider_ids), QUERY_CHUNK_SIZE):
+            chunk = provider_ids[start:start + QUERY_CHUNK_SIZE]
+            loaded = set()
+            async for provider_id, provider, models in _load_providers(db, chunk):
+                loaded.add(provider_id)
+                affected |= self.graph.set_provider(provider_id, provider, models)
+            # 没有启用模型的provider不产生任何配置，从配置图中移除
+            for provider_id in chunk:
+                if provider_id not in loaded:
+                    affected |= self.graph.set_provider(provider_id, None, [])
+        
+        self.graph.refresh_names(affected)
+        return affected
+    
+    def get_stats(self) -> Dict:
+        """获取生成统计"""
+        return {
+            "providers": len(self.graph),
+            "full_rebuilds": self.full_rebuilds,
+            "incremental_updates": self.incremental_updates,
+            "external_changes": self.external_changes,
+            "revision": self.revision,
+            "balance_version": self.balance_version,
+            "verify_mismatches": self.verify_mismatches,
+            "pending_changes": bool(self.changelog)
+        }
+
+
+
+async def _load_strategies(db: AsyncSession) -> Dict[str, str]:
+    """读取各统一名称配置的负载均衡策略"""
+    result = await db.execute(
+        select(ModelMapping.unified_name, ModelMapping.load_balance_strategy)
+        .where(ModelMapping.load_balance_strategy.is_not(None))
+    )
+    return dict(result.all())
+
+
+class _ProviderInfo(NamedTuple):
+    """生成配置所需的provider字段"""
+    
+    name: str
+    base_url: str
+    api_key: str
+
+
+class _ModelInfo(NamedTuple):
+    """生成配置所需的模型字段"""
+    
+    original_name: str
+    normalized_name: str
+    display_name: Optional[str]
+    split_key: Optional[str]
+
+
+async def _load_providers(
+    db: AsyncSession,
+    provider_ids: Optional[List[str]] = None
+) -> AsyncIterator[Tuple[str, Optional[_ProviderInfo], List[_ModelInfo]]]:
+    """
+    以一次关联查询流式读取启用的模型及其provider
+    
+    只读取生成配置需要的列，结果按provider、原始模型名排序（与唯一索引
+    uq_models_provider_original 的顺序一致，重新同步也不会改变顺序），
+    每读完一个provider的所有模型产出一次。
+    
+    Args:
+        db: 数据库会话
+        provider_ids: 只读取这些provider，None表示全部
+    
+    Yields:
+        (provider ID, 启用的provider或None, 模型列表)
+    """
+    stmt = (
+        select(
+            Model.provider_id,
+            Model.original_name,
+            Model.normalized_name,
+            Model.display_name,
+            Model.split_key,
+            Provider.name.label("provider_name"),
+            Provider.base_url,
+            Provider.api_key
+        )
+        .outerjoin(Provider, and_(Provider.id == Model.provider_id, Provider.enabled == True))
+        .where(Model.enabled == True)
+        .order_by(Model.provider_id, Model.original_name)
+        .execution_options(yield_per=STREAM_BATCH_SIZE)
+    )
+    if provider_ids is not None:
+        stmt = stmt.where(Model.provider_id.in_(provider_ids))
+    
+    result = await db.stream(stmt)
+    current_id = None
+    provider = None
+    models = []
+    # 按批读取，避免每行一次异步切换
+    async for partition in result.partitions(STREAM_BATCH_SIZE):
+        for (
+            provider_id, original_name, normalized_name, display_name, model_split_key,
+            provider_name, base_url, api_key
+        ) in partition:
+            if provider_id != current_id:
+                if current_id is not None:
+                    yield current_id, provider, models
+                current_id = provider_id
+                provider = None
+                if provider_name is not None:
+                    provider = _ProviderInfo(provider_name, base_url, api_key)
+                models = []
+            models.append(_ModelInfo(original_name, normalized_name, display_name, model_split_key))
+    if current_id is not None:
+        yield current_id, provider, models
+
+
+# 进程级共享的增量配置生成器
+incremental_config_generator = IncrementalConfigGenerator()
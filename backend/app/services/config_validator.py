@@ -0,0 +1,454 @@
+"""
+配置验证
+gpt-load和uni-api配置的schema在导入时编译一次，按列批量校验字段类型；
+引用完整性（分组引用的provider、聚合分组的子分组和权重、重定向目标、名称唯一性）
+用哈希集合检查，整体为O(n)。所有错误都带有在配置中的路径
+"""
+import logging
+from itertools import chain
+from operator import itemgetter, methodcaller
+from typing import Any, Callable, Dict, Iterable, List, NamedTuple, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class ConfigIssue(NamedTuple):
+    """一条验证错误"""
+    
+    path: str
+    message: str
+    
+    def __str__(self) -> str:
+        return f"{self.path}: {self.message}"
+
+
+class Field(NamedTuple):
+    """
+    列表段中条目的字段
+    
+    kind:
+        str      字符串
+        name     非空字符串
+        bool     布尔值
+        names    非空字符串列表（min_items 限制最少元素数）
+        mapping  字符串 -> 非空字符串 的映射
+        weights  字符串 -> 正整数 的映射
+        object   任意对象
+    """
+    
+    kind: str
+    required: bool = True
+    min_items: int = 0
+
+
+class Section(NamedTuple):
+    """
+    配置的顶层段
+    
+    kind:
+        list     条目列表，条目字段由 fields 描述
+        mapping  字符串 -> 非空字符串 的映射
+        object   任意对象
+    """
+    
+    kind: str
+    required: bool = True
+    fields: Dict[str, Field] = {}
+
+
+GPTLOAD_SCHEMA = {
+    "providers": Section("list", fields={
+        "name": Field("name"),
+        "base_url": Field("name"),
+        "api_key": Field("str"),
+        "models": Field("names", required=False),
+        "enabled": Field("bool", required=False),
+    }),
+    "groups": Section("list", fields={
+        "name": Field("name"),
+        "providers": Field("names", min_items=1),
+        "strategy": Field("str", required=False),
+        "model_mapping": Field("mapping", required=False),
+    }),
+    "aggregate_groups": Section("list", required=False, fields={
+        "name": Field("name"),
+        "sub_groups": Field("names", min_items=1),
+        "load_balance": Field("str", required=False),
+        "weights": Field("weights", required=False),
+    }),
+    "model_redirects": Section("mapping", required=False),
+}
+
+UNIAPI_SCHEMA = {
+    "providers": Section("list", fields={
+        "provider": Field("name"),
+        "base_url": Field("name"),
+        "api": Field("str", required=False),
+        "model": Field("names", required=False),
+    }),
+    "api": Section("object", required=False),
+}
+
+# 可选字段缺失时的占位
+_MISSING = object()
+
+# 各类型的值允许的Python类型
+_TYPES = {
+    "str": {str},
+    "name": {str},
+    "bool": {bool},
+    "names": {list},
+    "mapping": {dict},
+    "weights": {dict},
+    "object": {dict},
+}
+
+_TYPE_MESSAGES = {
+    "str": "必须是字符串",
+    "name": "必须是字符串",
+    "bool": "必须是布尔值",
+    "names": "必须是列表",
+    "mapping": "必须是对象",
+    "weights": "必须是对象",
+    "object": "必须是对象",
+}
+
+
+def _key_path(path: str, key: Any) -> str:
+    """映射中某个键的路径"""
+    return f"{path}[{key!r}]"
+
+
+def _types_within(values: Iterable, allowed: Set[type]) -> bool:
+    return set(map(type, values)) <= allowed
+
+
+def _all_non_empty(strings: List[str]) -> bool:
+    return all(strings)
+
+
+def _mapping_valid(mappings: List[Dict]) -> bool:
+    keys = chain.from_iterable(map(dict.keys, mappings))
+    values = list(chain.from_iterable(map(dict.values, mappings)))
+    return _types_within(keys, {str}) and _types_within(values, {str}) and _all_non_empty(values)
+
+
+def _weights_valid(mappings: List[Dict]) -> bool:
+    keys = chain.from_iterable(map(dict.keys, mappings))
+    values = list(chain.from_iterable(map(dict.values, mappings)))
+    return _types_within(keys, {str}) and _types_within(values, {int}) and (not values or min(values) > 0)
+
+
+def _fast_check(field: Field, values: List) -> bool:
+    """
+    批量检查一列值，全部合法时返回True
+    
+    只使用 map/set/min 等C层面的迭代，不逐个调用Python函数
+    """
+    if not _types_within(values, _TYPES[field.kind]):
+        return False
+    if field.kind == "name":
+        return _all_non_empty(values)
+    if field.kind == "names":
+        if field.min_items == 1 and not all(values):
+            return False
+        if field.min_items > 1 and values and min(map(len, values)) < field.min_items:
+            return False
+        items = list(chain.from_iterable(values))
+        return _types_within(items, {str}) and _all_non_empty(items)
+    if field.kind == "mapping":
+        return _mapping_valid(values)
+    if field.kind == "weights":
+        return _weights_valid(values)
+    return True
+
+
+def _check_value(kind: str, value: Any, path: str, issues: List[ConfigIssue], min_items: int = 0) -> Any:
+    """
+    逐个检查单个值，记录错误
+    
+    Returns:
+        合法时返回原值；不合法时返回None（列表中不合法的元素被剔除）
+    """
+    if type(value) not in _TYPES[kind]:
+        issues.append(ConfigIssue(path, _TYPE_MESSAGES[kind]))
+        return None
+    if kind == "name" and not value:
+        issues.append(ConfigIssue(path, "不能为空"))
+        return None
+    if kind == "names":
+        if len(value) < min_items:
+            issues.append(ConfigIssue(path, "不能为空"))
+        valid = []
+        for index, item in enumerate(value):
+            if _check_value("name", item, f"{path}[{index}]", issues) is not None:
+                valid.append(item)
+        return valid
+    if kind == "mapping":
+        for key, item in value.items():
+            if not isinstance(key, str):
+                issues.append(ConfigIssue(_key_path(path, key), "键必须是字符串"))
+            _check_value("name", item, _key_path(path, key), issues)
+    if kind == "weights":
+        for key, item in value.items():
+            if not isinstance(key, str):
+                issues.append(ConfigIssue(_key_path(path, key), "键必须是字符串"))
+            if type(item) is not int or item <= 0:
+                issues.append(ConfigIssue(_key_path(path, key), "必须是正整数"))
+    return value
+
+
+class _CompiledList:
+    """编译后的列表段校验器"""
+    
+    def __init__(self, section_name: str, section: Section):
+        self.path = f"$.{section_name}"
+        self.fields = [
+            (key, field, itemgetter(key) if field.required else methodcaller("get", key, _MISSING))
+            for key, field in section.fields.items()
+        ]
+    
+    def check(self, items: Any, issues: List[ConfigIssue]) -> Dict[str, List]:
+        """
+        校验条目列表
+        
+        Returns:
+            字段名 -> 按条目顺序排列的值；缺失或不合法的值为None
+        """
+        if type(items) is not list:
+            issues.append(ConfigIssue(self.path, "必须是列表"))
+            return {key: [] for key, _, _ in self.fields}
+        if not _types_within(items, {dict}):
+            return self._check_slow(items, issues)
+        
+        columns = {}
+        for key, field, getter in self.fields:
+            try:
+                values = list(map(getter, items))
+            except KeyError:
+                return self._check_slow(items, issues)
+            present = values
+            if not field.required and values.count(_MISSING):
+                present = [value for value in values if value is not _MISSING]
+                values = [None if value is _MISSING else value for value in values]
+            if not _fast_check(field, present):
+                return self._check_slow(items, issues)
+            columns[key] = values
+        return columns
+    
+    def _check_slow(self, items: List, issues: List[ConfigIssue]) -> Dict[str, List]:
+        """逐个条目检查，定位每个错误"""
+        columns: Dict[str, List] = {key: [] for key, _, _ in self.fields}
+        for index, item in enumerate(items):
+            item_path = f"{self.path}[{index}]"
+            if not isinstance(item, dict):
+                issues.append(ConfigIssue(item_path, "必须是对象"))
+                for key in columns:
+                    columns[key].append(None)
+                continue
+            for key, field, _ in self.fields:
+                field_path = f"{item_path}.{key}"
+                if key not in item:
+                    if field.required:
+                        issues.append(ConfigIssue(field_path, "缺少字段"))
+                    columns[key].append(None)
+                    continue
+                columns[key].append(_check_value(field.kind, item[key], field_path, issues, field.min_items))
+        return columns
+
+
+class CompiledSchema:
+    """
+    编译后的配置schema
+    
+    列表段按字段批量检查：先用 itemgetter 取出整列，再用 set(map(type, ...))
+    等C层面的操作检查类型；批量检查失败时才逐个条目定位错误。
+    """
+    
+    def __init__(self, schema: Dict[str, Section]):
+        self.sections = schema
+        self.lists = {
+            name: _CompiledList(name, section)
+            for name, section in schema.items() if section.kind == "list"
+        }
+    
+    def check(self, config: Any, issues: List[ConfigIssue]) -> Dict[str, Any]:
+        """
+        校验配置结构
+        
+        Returns:
+            列表段为字段列（见 _CompiledList.check），其他段为原值；不合法或缺失的段为None
+        """
+        if not isinstance(config, dict):
+            issues.append(ConfigIssue("$", "必须是对象"))
+            return {}
+        
+        result: Dict[str, Any] = {}
+        for name, section in self.sections.items():
+            path = f"$.{name}"
+            if name not in config:
+                if section.required:
+                    issues.append(ConfigIssue(path, "缺少字段"))
+                result[name] = self.lists[name].check([], issues) if section.kind == "list" else None
+            elif section.kind == "list":
+                result[name] = self.lists[name].check(config[name], issues)
+            elif section.kind == "mapping" and type(config[name]) is dict and _mapping_valid([config[name]]):
+                result[name] = config[name]
+            else:
+                result[name] = _check_value(section.kind, config[name], path, issues)
+        return result
+
+
+def _check_unique(
+    sections: List[Tuple[str, str, List]],
+    label: str,
+    issues: List[ConfigIssue]
+) -> Set[str]:
+    """
+    检查多个段中的名称是否唯一
+    
+    Args:
+        sections: [(段名, 字段名, 名称列)]
+        label: 错误提示中的名称类型
+    
+    Returns:
+        所有名称的集合
+    """
+    total = sum(len(column) for _, _, column in sections)
+    names = set(chain.from_iterable(column for _, _, column in sections))
+    if len(names) == total:
+        return names
+    
+    # 存在重复或不合法的名称，逐个定位重复项
+    names.discard(None)
+    first_seen: Dict[str, str] = {}
+    for section, key, column in sections:
+        for index, name in enumerate(column):
+            if name is None:
+                continue
+            path = f"$.{section}[{index}].{key}"
+            first = first_seen.setdefault(name, path)
+            if first is not path:
+                issues.append(ConfigIssue(path, f"{label}名称 '{name}' 与 {first} 重复"))
+    return names
+
+
+def _check_references(
+    section: str,
+    key: str,
+    column: List,
+    targets: Set[str],
+    describe: Callable[[str], str],
+    issues: List[ConfigIssue]
+) -> None:
+    """
+    检查名称列表字段中的每个引用都在目标集合中
+    
+    Args:
+        section: 段名
+        key: 引用字段名
+        column: 每个条目的引用列表（不合法的条目为None）
+        targets: 可引用的名称
+        describe: 生成错误提示
+    """
+    if set(chain.from_iterable(filter(None, column))) <= targets:
+        return
+    
+    for index, refs in enumerate(column):
+        for ref_index, ref in enumerate(refs or ()):
+            if ref not in targets:
+                issues.append(ConfigIssue(f"$.{section}[{index}].{key}[{ref_index}]", describe(ref)))
+
+
+class ConfigValidator:
+    """
+    配置验证器
+    
+    schema在类定义时编译，只编译一次；引用检查基于结构校验得到的字段列
+    建立哈希集合，用集合运算判断是否存在悬空引用，发现问题时再定位路径。
+    """
+    
+    _schemas = {
+        "gptload": CompiledSchema(GPTLOAD_SCHEMA),
+        "uniapi": CompiledSchema(UNIAPI_SCHEMA),
+    }
+    
+    def validate(self, config: Any, config_type: str = "gptload") -> List[ConfigIssue]:
+        """
+        验证配置
+        
+        Args:
+            config: 配置字典
+            config_type: 配置类型 ("gptload" 或 "uniapi")
+        
+        Returns:
+            所有错误，按结构错误、引用错误的顺序排列；为空表示有效
+        """
+        schema = self._schemas.get(config_type)
+        if schema is None:
+            raise ValueError(f"未知的配置类型: {config_type}")
+        
+        issues: List[ConfigIssue] = []
+        sections = schema.check(config, issues)
+        if not sections:
+            return issues
+        if config_type == "gptload":
+            self._check_gptload_references(sections, issues)
+        else:
+            self._check_uniapi_references(sections, issues)
+        return issues
+    
+    @staticmethod
+    def _check_gptload_references(sections: Dict[str, Any], issues: List[ConfigIssue]) -> None:
+        groups = sections["groups"]
+        aggregate_groups = sections["aggregate_groups"]
+        
+        provider_names = _check_unique([("providers", "name", sections["providers"]["name"])], "provider", issues)
+        # 普通分组和聚合分组共用同一个名称空间
+        group_names = _check_unique(
+            [("groups", "name", groups["name"]), ("aggregate_groups", "name", aggregate_groups["name"])],
+            "分组",
+            issues
+        )
+        regular_groups = set(groups["name"])
+        
+        _check_references(
+            "groups", "providers", groups["providers"], provider_names,
+            lambda ref: f"引用的provider '{ref}' 不存在",
+            issues
+        )
+        _check_references(
+            "aggregate_groups", "sub_groups", aggregate_groups["sub_groups"], regular_groups,
+            lambda ref: f"引用的分组 '{ref}' {'是聚合分组，不能嵌套' if ref in group_names else '不存在'}",
+            issues
+        )
+        # 权重只能给本聚合分组的子分组设置
+        for index, (weights, sub_groups) in enumerate(zip(aggregate_groups["weights"], aggregate_groups["sub_groups"])):
+            if not weights or sub_groups is None:
+                continue
+            members = set(sub_groups)
+            if weights.keys() <= members:
+                continue
+            for key in weights:
+                if key not in members:
+                    issues.append(ConfigIssue(
+                        _key_path(f"$.aggregate_groups[{index}].weights", key),
+                        f"分组 '{key}' 不是该聚合分组的子分组"
+                    ))
+        
+        redirects = sections["model_redirects"]
+        if redirects and not set(filter(None, redirects.values())) <= group_names:
+            for model_name, target in redirects.items():
+                if isinstance(target, str) and target and target not in group_names:
+                    issues.append(ConfigIssue(
+                        _key_path("$.model_redirects", model_name),
+                        f"重定向目标分组 '{target}' 不存在"
+                    ))
+    
+    @staticmethod
+    def _check_uniapi_references(sections: Dict[str, Any], issues: List[ConfigIssue]) -> None:
+        _check_unique([("providers", "provider", sections["providers"]["provider"])], "provider", issues)
+
+
+# 进程级共享的验证器
+config_validator = ConfigValidator()
@@ -0,0 +1,275 @@
+"""
+配置文件写入
+按内容哈希判断是否需要写入，写入采用临时文件+fsync+原子重命名，
+备份按内容去重并按数量和时间清理
+"""
+import hashlib
+import logging
+import os
+import re
+import tempfile
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Iterable, List, Optional, Tuple, Union
+
+logger = logging.getLogger(__name__)
+
+# 备份文件名：{stem}_{时间戳}_{内容哈希前缀}{suffix}
+BACKUP_HASH_LENGTH = 12
+_BACKUP_NAME = re.compile(r"^(?P<stem>.+)_(?P<timestamp>\d{8}_\d{6})_(?P<digest>[0-9a-f]{%d})$" % BACKUP_HASH_LENGTH)
+
+
+def content_digest(data: bytes) -> str:
+    """内容的SHA-256"""
+    return hashlib.sha256(data).hexdigest()
+
+
+def file_digest(path: str) -> Optional[str]:
+    """
+    计算文件内容的SHA-256
+    
+    Returns:
+        文件不存在时返回None
+    """
+    digest = hashlib.sha256()
+    try:
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                digest.update(chunk)
+    except FileNotFoundError:
+        return None
+    return digest.hexdigest()
+
+
+def _fsync_dir(directory: str) -> None:
+    """同步目录项，确保重命名落盘（部分平台不支持打开目录）"""
+    try:
+        fd = os.open(directory, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+def _write_temp(path: str, chunks: Iterable[bytes]) -> Tuple[str, str]:
+    """
+    将内容写入目标文件同目录下的临时文件并fsync
+    
+    Returns:
+        (临时文件路径, 内容的SHA-256)
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=f".{os.path.basename(path)}.", suffix=".tmp")
+    digest = hashlib.sha256()
+    try:
+        with os.fdopen(fd, "wb") as f:
+            for chunk in chunks:
+                digest.update(chunk)
+                f.write(chunk)
+            f.flush()
+            os.fsync(f.fileno())
+    except BaseException:
+        _discard(tmp_path)
+        raise
+    return tmp_path, digest.hexdigest()
+
+
+def _discard(tmp_path: str) -> None:
+    try:
+        os.unlink(tmp_path)
+    except OSError:
+        pass
+
+
+def _commit(tmp_path: str, path: str) -> None:
+    """以临时文件原子替换目标文件"""
+    try:
+        os.replace(tmp_path, path)
+    except BaseException:
+        _discard(tmp_path)
+        raise
+    _fsync_dir(os.path.dirname(os.path.abspath(path)))
+
+
+def atomic_write(path: str, data: Union[bytes, Iterable[bytes]]) -> str:
+    """
+    原子写入文件
+    
+    先写入同目录下的临时文件并fsync，再重命名覆盖目标文件。
+    读取方只会看到旧文件或完整的新文件，不会看到写了一半的内容。
+    
+    Args:
+        path: 目标文件路径
+        data: 文件内容，或按顺序产出内容的字节块
+    
+    Returns:
+        内容的SHA-256
+    """
+    tmp_path, digest = _write_temp(path, [data] if isinstance(data, bytes) else data)
+    _commit(tmp_path, path)
+    return digest
+
+
+@dataclass
+class WriteResult:
+    """一次配置写入的结果"""
+    
+    path: str
+    digest: str
+    changed: bool
+    backup_path: Optional[str] = None
+
+
+class ConfigWriter:
+    """
+    配置文件写入器
+    
+    - 新内容与当前文件哈希相同时跳过写入，也不产生备份
+    - 内容变化时先备份当前文件（相同内容的备份只保留一份），再原子写入
+    - 每个配置文件的备份最多保留 backup_keep 份，且不超过 backup_max_age_days 天
+    """
+    
+    def __init__(
+        self,
+        config_dir: str,
+        backup_keep: int = 20,
+        backup_max_age_days: float = 30.0
+    ):
+        """
+        初始化配置文件写入器
+        
+        Args:
+            config_dir: 配置文件目录
+            backup_keep: 每个配置文件保留的最大备份数，0表示不备份
+            backup_max_age_days: 备份的最长保留天数，0表示不按时间清理
+        """
+        self.config_dir = config_dir
+        self.backup_dir = os.path.join(config_dir, "backups")
+        self.backup_keep = backup_keep
+        self.backup_max_age_days = backup_max_age_days
+    
+    def write(self, filename: str, data: Union[bytes, Iterable[bytes]]) -> WriteResult:
+        """
+        写入配置文件
+        
+        data 为字节块迭代器时边写入临时文件边计算哈希，内容未变化则丢弃临时文件
+        
+        Args:
+            filename: 配置目录下的文件名
+            data: 文件内容，或按顺序产出内容的字节块
+        
+        Returns:
+            写入结果
+        """
+        os.makedirs(self.config_dir, exist_ok=True)
+        path = os.path.join(self.config_dir, filename)
+        current_digest = file_digest(path)
+        
+        if isinstance(data, bytes):
+            digest = content_digest(data)
+            if current_digest == digest:
+                logger.info(f"配置未变化，跳过写入: {path}")
+                return WriteResult(path=path, digest=digest, changed=False)
+            tmp_path, _ = _write_temp(path, [data])
+        else:
+            tmp_path, digest = _write_temp(path, data)
+            if current_digest == digest:
+                _discard(tmp_path)
+                logger.info(f"配置未变化，跳过写入: {path}")
+                return WriteResult(path=path, digest=digest, changed=False)
+        
+        backup_path = None
+        try:
+            if current_digest is not None and self.backup_keep > 0:
+                backup_path = self._backup(filename, path, current_digest)
+        except BaseException:
+            _discard(tmp_path)
+            raise
+        
+        _commit(tmp_path, path)
+        logger.info(f"配置已保存: {path} ({digest[:BACKUP_HASH_LENGTH]})")
+        
+        if self.backup_keep > 0:
+            self.prune_backups(filename)
+        
+        return WriteResult(path=path, digest=digest, changed=True, backup_path=backup_path)
+    
+    def _backup(self, filename: str, path: str, digest: str) -> str:
+        """备份当前文件，已有相同内容的备份时直接复用"""
+        stem, suffix = os.path.splitext(filename)
+        short_digest = digest[:BACKUP_HASH_LENGTH]
+        
+        for backup_name, _, backup_digest in self._list_backups(filename):
+            if backup_digest == short_digest:
+                backup_path = os.path.join(self.backup_dir, backup_name)
+                # 更新修改时间，使其按最近一次使用参与保留策略
+                os.utime(backup_path)
+                logger.info(f"已存在相同内容的备份: {backup_path}")
+                return backup_path
+        
+        os.makedirs(self.backup_dir, exist_ok=True)
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        backup_path = os.path.join(self.backup_dir, f"{stem}_{timestamp}_{short_digest}{suffix}")
+        with open(path, "rb") as f:
+            atomic_write(backup_path, iter(lambda: f.read(1024 * 1024), b""))
+        logger.info(f"已备份旧配置: {backup_path}")
+        return backup_path
+    
+    def _list_backups(self, filename: str) -> List[Tuple[str, float, str]]:
+        """
+        列出某个配置文件的备份
+        
+        Returns:
+            [(文件名, 修改时间, 内容哈希前缀)]，按修改时间从新到旧排序
+        """
+        stem, suffix = os.path.splitext(filename)
+        backups = []
+        try:
+            entries = list(os.scandir(self.backup_dir))
+        except FileNotFoundError:
+            return backups
+        
+        for entry in entries:
+            name = entry.name
+            if not entry.is_file() or not name.endswith(suffix):
+                continue
+            match = _BACKUP_NAME.match(name[:len(name) - len(suffix)] if suffix else name)
+            if match is None or match.group("stem") != stem:
+                continue
+            backups.append((name, entry.stat().st_mtime, match.group("digest")))
+        
+        backups.sort(key=lambda item: item[1], reverse=True)
+        return backups
+    
+    def prune_backups(self, filename: str) -> int:
+        """
+        按保留策略清理备份
+        
+        Args:
+            filename: 配置文件名
+        
+        Returns:
+            删除的备份数量
+        """
+        cutoff = None
+        if self.backup_max_age_days > 0:
+            cutoff = time.time() - self.backup_max_age_days * 86400
+        
+        removed = 0
+        for index, (name, mtime, _) in enumerate(self._list_backups(filename)):
+            if index < self.backup_keep and (cutoff is None or mtime >= cutoff):
+                continue
+            try:
+                os.unlink(os.path.join(self.backup_dir, name))
+                removed += 1
+            except FileNotFoundError:
+                pass
+        
+        if removed:
+            logger.info(f"已清理 {removed} 个过期备份: {filename}")
+        return removed
@@ -0,0 +1,172 @@
+"""
+健康检查记录写入缓冲
+检查结果先进入内存缓冲，按数量或时间阈值以多行INSERT批量写入，
+同一事务内更新最新状态和汇总表，一轮检查只产生一次事务；缓冲有上限，写满时检查方等待写入完成
+"""
+import asyncio
+import logging
+from typing import Callable, Dict, List, Optional
+
+from sqlalchemy import insert
+
+from app.config import settings
+from app.database import AsyncSessionLocal
+from app.models.provider_model import HealthCheck
+from app.services.health_rollup import record_health_results
+
+logger = logging.getLogger(__name__)
+
+# 每条INSERT语句的行数（SQLite单条语句的绑定参数数量有限）
+INSERT_BATCH_SIZE = 500
+
+
+class HealthCheckBuffer:
+    """
+    健康检查记录的写后缓冲
+    
+    - 缓冲行数达到 batch_size 时，由触发的检查方直接写入
+    - 后台任务每隔 flush_interval 秒写入一次剩余的行
+    - 缓冲行数达到 max_pending 时 add() 先等待写入完成再追加（背压）
+    - 写入失败时行被放回缓冲，超出上限的最旧记录被丢弃并计数
+    - stop() 在停止后台任务后写入所有缓冲的行
+    """
+    
+    def __init__(
+        self,
+        session_factory: Callable,
+        batch_size: int = 500,
+        flush_interval: float = 5.0,
+        max_pending: int = 10000
+    ):
+        """
+        初始化写入缓冲
+        
+        Args:
+            session_factory: 数据库会话工厂
+            batch_size: 触发写入的缓冲行数
+            flush_interval: 定时写入的间隔（秒）
+            max_pending: 缓冲行数上限
+        """
+        self.session_factory = session_factory
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_pending = max(max_pending, batch_size)
+        self._pending: List[Dict] = []
+        self._lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+        self.flushes = 0
+        self.flushed_rows = 0
+        self.failed_flushes = 0
+        self.dropped = 0
+        self.backpressure_waits = 0
+    
+    def __len__(self) -> int:
+        return len(self._pending)
+    
+    async def add(self, row: Dict) -> None:
+        """
+        追加一条记录
+        
+        Args:
+            row: HealthCheck 的列值（provider_id、status、response_time、ttfb、error_message、checked_at）
+        """
+        if len(self._pending) >= self.max_pending:
+            self.backpressure_waits += 1
+            await self.flush()
+            if len(self._pending) >= self.max_pending:
+                # 写入失败且缓冲已满，丢弃最旧的记录
+                del self._pending[0]
+                self.dropped += 1
+        self._pending.append(row)
+        if len(self._pending) >= self.batch_size and not self._lock.locked():
+            await self.flush()
+    
+    async def flush(self) -> int:
+        """
+        写入所有缓冲的记录，同一时刻只有一个写入
+        
+        记录与最新状态表、分钟和小时汇总表在同一事务内提交；汇总表按读取-合并-写回
+        更新，依赖这里的写入锁避免并发写入相互覆盖（同一数据库只应由一个进程写入健康检查记录）
+        
+        写入期间新增的记录留到下一次写入
+        
+        Returns:
+            写入的行数
+        """
+        async with self._lock:
+            if not self._pending:
+                return 0
+            rows, self._pending = self._pending, []
+            try:
+                async with self.session_factory() as db:
+                    for start in range(0, len(rows), INSERT_BATCH_SIZE):
+                        await db.execute(insert(HealthCheck).values(rows[start:start + INSERT_BATCH_SIZE]))
+                    await record_health_results(db, rows)
+                    await db.commit()
+            except BaseException as e:
+                # 写入被取消时同样放回缓冲，由关闭时的最后一次写入处理
+                self.failed_flushes += 1
+                self._pending[:0] = rows
+                overflow = len(self._pending) - self.max_pending
+                if overflow > 0:
+                    del self._pending[:overflow]
+                    self.dropped += overflow
+                if not isinstance(e, Exception):
+                    raise
+                logger.error(f"写入健康检查记录失败，{len(self._pending)} 条保留在缓冲中: {e}")
+                return 0
+            
+            self.flushes += 1
+            self.flushed_rows += len(rows)
+            logger.debug(f"已写入 {len(rows)} 条健康检查记录")
+            return len(rows)
+    
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.flush()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"定时写入健康检查记录失败: {e}")
+    
+    def start(self) -> None:
+        """启动定时写入任务"""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+    
+    async def stop(self) -> None:
+        """停止定时写入任务并写入剩余记录"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        written = await self.flush()
+        if self._pending:
+            logger.error(f"关闭时仍有 {len(self._pending)} 条健康检查记录未能写入")
+        elif written:
+            logger.info(f"关闭前已写入 {written} 条缓冲的健康检查记录")
+    
+    def get_stats(self) -> Dict:
+        """获取缓冲统计"""
+        return {
+            "pending": len(self._pending),
+            "flushes": self.flushes,
+            "flushed_rows": self.flushed_rows,
+            "failed_flushes": self.failed_flushes,
+            "dropped": self.dropped,
+            "backpressure_waits": self.backpressure_waits
+        }
+
+
+# 进程级共享的写入缓冲
+health_check_buffer = HealthCheckBuffer(
+    AsyncSessionLocal,
+    batch_size=settings.HEALTH_CHECK_BUFFER_SIZE,
+    flush_interval=settings.HEALTH_CHECK_BUFFER_FLUSH_INTERVAL,
+    max_pending=settings.HEALTH_CHECK_BUFFER_MAX_PENDING
+)
@@ -1,26 +1,45 @@
 """
 健康监控服务
-负责定期检测API提供商的可用性
+负责定期检测API提供商的可用性，默认使用轻量探测而不下载完整的模型列表
 """
 import logging
 import time
 import asyncio
 from typing import Dict, List, Optional
-from datetime import datetime
+from datetime import datetime, timedelta
 import httpx
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, and_, func, desc
+from sqlalchemy import select, case, func, desc
 
+from app.config import settings
 from app.models.api_source import APISource
 from app.models.provider_model import Provider, HealthCheck
+from app.models.health_rollup import ProviderHealthLatest
+from app.services.health_buffer import HealthCheckBuffer, health_check_buffer
+from app.services.health_probe import HEALTHY_STATUS_CODES, HealthProber, ProbeResult, health_prober
+from app.services.health_rollup import RollupBucket, provider_latency
+from app.services.retry_policy import RetryPolicy, default_retry_policy
+from app.services.transport_manager import transport_manager
 
 logger = logging.getLogger(__name__)
 
+# 延迟分位数的最长时间窗口（秒）：按天汇总的保留期，不限期保留时取100年
+MAX_LATENCY_WINDOW = (settings.HEALTH_ROLLUP_DAY_RETENTION_DAYS or 36500) * 86400
+
 
 class HealthMonitorService:
     """健康监控服务"""
     
-    def __init__(self, db: AsyncSession, timeout: int = 30, max_concurrent: int = 10):
+    def __init__(
+        self,
+        db: AsyncSession,
+        timeout: int = 30,
+        max_concurrent: int = 10,
+        client: Optional[httpx.AsyncClient] = None,
+        retry_policy: Optional[RetryPolicy] = None,
+        buffer: Optional[HealthCheckBuffer] = None,
+        prober: Optional[HealthProber] = None
+    ):
         """
         初始化健康监控服务
         
@@ -28,11 +47,18 @@ class HealthMonitorService:
             db: 数据库会话
             timeout: 请求超时时间（秒）
             max_concurrent: 最大并发检查数
+            client: HTTP客户端，默认使用共享连接池
+            retry_policy: 重试策略，默认按HEALTH_CHECK_RETRY创建
+            buffer: 健康检查记录的写入缓冲，默认使用进程级共享缓冲
+            prober: 探测器，默认使用按HEALTH_CHECK_PROBE_MODE创建的共享探测器
         """
         self.db = db
-        self.client = httpx.AsyncClient(timeout=timeout)
+        self.client = client or transport_manager.get_client()
         self.timeout = timeout
         self.max_concurrent = max_concurrent
+        self.retry_policy = retry_policy or default_retry_policy(max_retries=settings.HEALTH_CHECK_RETRY)
+        self.buffer = buffer if buffer is not None else health_check_buffer
+        self.prober = prober if prober is not None else health_prober
     
     async def check_api_source_health(self, api_source_id: str) -> Dict:
         """
@@ -49,36 +75,76 @@ class HealthMonitorService:
             stmt = select(APISource).where(APISource.id == api_source_id)
             result = await self.db.execute(stmt)
             api_source = result.scalar_one_or_none()
+        except Exception as e:
+            logger.error(f"检查API源健康状态失败: {e}")
+            return {
+                "api_source_id": api_source_id,
+                "status": "error",
+                "response_time": None,
+                "error": str(e)
+            }
+        
+        if not api_source:
+            logger.warning(f"API源不存在: {api_source_id}")
+            return {
+                "api_source_id": api_source_id,
+                "status": "not_found",
+                "response_time": None,
+                "error": "API源不存在"
+            }
+        
+        return await self.check_source(api_source)
+    
+    async def check_source(self, api_source: APISource) -> Dict:
+        """
+        检查已加载的API源
+        
+        不使用数据库会话，可以并发调用；检查记录写入缓冲，由缓冲批量落库
+        
+        Args:
+            api_source: API源
             
-            if not api_source:
-                logger.warning(f"API源不存在: {api_source_id}")
-                return {
-                    "api_source_id": api_source_id,
-                    "status": "not_found",
-                    "response_time": None,
-                    "error": "API源不存在"
-                }
-            
+        Returns:
+            健康检查结果
+        """
+        api_source_id = api_source.id
+        try:
             # 执行健康检查
             url = api_source.base_url.rstrip('/')
             if not url.endswith('/v1'):
                 url = f"{url}/v1"
             
             start_time = time.time()
-            
-            try:
-                response = await self.client.get(
+            probe: Optional[ProbeResult] = None
+            
+            async def attempt(timeout: float) -> httpx.Response:
+                # 响应时间只统计最后一次尝试
+                nonlocal start_time, probe
+                start_time = time.time()
+                probe = await self.prober.probe(
+                    self.client,
                     f"{url}/models",
+                    key=api_source_id,
                     headers={"Authorization": f"Bearer {api_source.api_key}"},
+                    timeout=timeout
+                )
+                return probe.response
+            
+            ttfb = None
+            try:
+                response = await self.retry_policy.call(
+                    attempt,
+                    key=api_source_id,
                     timeout=self.timeout
                 )
                 
-                response_time = int((time.time() - start_time) * 1000)
+                response_time = probe.total
+                ttfb = probe.ttfb
                 
-                if response.status_code == 200:
+                if response.status_code in HEALTHY_STATUS_CODES:
                     status = "healthy"
                     error = None
-                    logger.info(f"API源 {api_source_id} 健康检查通过，响应时间: {response_time}ms")
+                    logger.info(f"API源 {api_source_id} 健康检查通过，首字节: {ttfb}ms，响应时间: {response_time}ms")
                 else:
                     status = "unhealthy"
                     error = f"HTTP {response.status_code}"
@@ -96,22 +162,24 @@ class HealthMonitorService:
                 error = str(e)
                 logger.error(f"API源 {api_source_id} 健康检查异常: {error}")
             
-            # 保存健康检查记录
-            health_check = HealthCheck(
-                provider_id=api_source_id,
-                status=status,
-                response_time=response_time if status != "timeout" else None,
-                error_message=error
-            )
-            self.db.add(health_check)
-            await self.db.commit()
+            # 检查记录进入写入缓冲
+            checked_at = datetime.utcnow()
+            await self.buffer.add({
+                "provider_id": api_source_id,
+                "status": status,
+                "response_time": response_time if status != "timeout" else None,
+                "ttfb": ttfb,
+                "error_message": error,
+                "checked_at": checked_at
+            })
             
             return {
                 "api_source_id": api_source_id,
                 "status": status,
                 "response_time": response_time,
+                "ttfb": ttfb,
                 "error": error,
-                "checked_at": datetime.utcnow().isoformat()
+                "checked_at": checked_at.isoformat()
             }
             
         except Exception as e:
@@ -163,11 +231,12 @@ class HealthMonitorService:
             
             async def check_with_semaphore(source):
                 async with semaphore:
-                    return await self.check_api_source_health(source.id)
+                    return await self.check_source(source)
             
-            # 并发执行健康检查
+            # 并发执行健康检查（并发的检查不共用数据库会话），整轮结果一次写入
             tasks = [check_with_semaphore(source) for source in api_sources]
             results = await asyncio.gather(*tasks, return_exceptions=True)
+            await self.buffer.flush()
             
             # 处理结果
             valid_results = []
@@ -200,43 +269,24 @@ class HealthMonitorService:
         """
         获取健康统计
         
+        只读取 provider_health_latest 和分钟、小时汇总表，不扫描 health_checks 表
+        
         Returns:
-            统计信息字典
+            统计信息字典；last_hour、last_day 为对应时间段内的检查次数、错误数和延迟分位数，
+            providers 为每个API源最近一小时的检查次数、错误数和延迟分位数
         """
         try:
-            # 获取所有API源数量
-            total_stmt = select(func.count(APISource.id))
-            total_result = await self.db.execute(total_stmt)
-            total_sources = total_result.scalar()
-            
-            # 获取启用的API源数量
-            enabled_stmt = select(func.count(APISource.id)).where(APISource.enabled == True)
-            enabled_result = await self.db.execute(enabled_stmt)
-            enabled_sources = enabled_result.scalar()
-            
-            # 获取最近的健康检查记录
-            # 为每个provider获取最新的健康检查记录
-            subquery = (
-                select(
-                    HealthCheck.provider_id,
-                    func.max(HealthCheck.checked_at).label('latest_check')
-                )
-                .group_by(HealthCheck.provider_id)
-                .subquery()
+            # API源总数和启用数
+            counts_stmt = select(
+                func.count(APISource.id),
+                func.coalesce(func.sum(case((APISource.enabled == True, 1), else_=0)), 0)
             )
+            counts_result = await self.db.execute(counts_stmt)
+            total_sources, enabled_sources = counts_result.one()
             
-            latest_checks_stmt = (
-                select(HealthCheck)
-                .join(
-                    subquery,
-                    and_(
-                        HealthCheck.provider_id == subquery.c.provider_id,
-                        HealthCheck.checked_at == subquery.c.latest_check
-                    )
-                )
-            )
-            latest_checks_result = await self.db.execute(latest_checks_stmt)
-            latest_checks = latest_checks_result.scalars().all()
+            # 每个API源的最新检查结果（写入检查记录时同步维护，每个源一行）
+            latest_result = await self.db.execute(select(ProviderHealthLatest))
+            latest_checks = latest_result.scalars().all()
             
             # 统计健康状态
             healthy_count = sum(1 for check in latest_checks if check.status == "healthy")
@@ -259,11 +309,19 @@ class HealthMonitorService:
             ]
             
             # 获取最近检查时间
-            if latest_checks:
-                last_check_time = max(check.checked_at for check in latest_checks if check.checked_at)
-                last_check_time_str = last_check_time.isoformat() if last_check_time else None
-            else:
-                last_check_time_str = None
+            check_times = [check.checked_at for check in latest_checks if check.checked_at]
+            last_check_time_str = max(check_times).isoformat() if check_times else None
+            
+            # 最近一小时和一天的检查次数、错误数和延迟分位数（合并汇总表中的延迟分布）
+            now = datetime.utcnow()
+            hour_rollups = await provider_latency(self.db, now - timedelta(hours=1))
+            day_rollups = await provider_latency(self.db, now - timedelta(days=1))
+            last_hour = RollupBucket()
+            for rollup in hour_rollups.values():
+                last_hour.merge(rollup)
+            last_day = RollupBucket()
+            for rollup in day_rollups.values():
+                last_day.merge(rollup)
             
             statistics = {
                 "total_sources": total_sources,
@@ -272,7 +330,13 @@ class HealthMonitorService:
                 "offline_sources": unhealthy_count,
                 "avg_response_time": avg_response_time,
                 "last_check_time": last_check_time_str,
-                "failed_sources": failed_sources
+                "failed_sources": failed_sources,
+                "last_hour": last_hour.summary(),
+                "last_day": last_day.summary(),
+                "providers": {
+                    provider_id: rollup.summary()
+                    for provider_id, rollup in sorted(hour_rollups.items())
+                }
             }
             
             logger.info(f"健康统计: 在线 {healthy_count}/{enabled_sources}, 平均响应时间 {avg_response_time}ms")
@@ -283,6 +347,66 @@ class HealthMonitorService:
             logger.error(f"获取健康统计失败: {e}")
             raise
     
+    async def get_latency_percentiles(
+        self,
+        window_seconds: float = 3600.0,
+        provider_id: Optional[str] = None
+    ) -> Dict[str, Dict]:
+        """
+        获取各API源在最近一段时间内的延迟分位数
+        
+        由分钟、小时、按天汇总的延迟分布合并得到，不扫描原始记录
+        
+        Args:
+            window_seconds: 时间窗口（秒），超过 MAX_LATENCY_WINDOW 时按其截短
+            provider_id: 只统计某个API源，默认统计全部
+            
+        Returns:
+            API源ID -> 检查次数、错误数、平均响应时间和 p50/p95/p99
+        """
+        try:
+            since = datetime.utcnow() - timedelta(seconds=min(window_seconds, MAX_LATENCY_WINDOW))
+            rollups = await provider_latency(self.db, since, provider_id=provider_id)
+            return {pid: rollup.summary() for pid, rollup in sorted(rollups.items())}
+            
+        except Exception as e:
+            logger.error(f"获取延迟分位数失败: {e}")
+            raise
+    
+    async def get_provider_health(self, window_seconds: float = 3600.0) -> List[Dict]:
+        """
+        获取每个API源的最新检查结果和最近一段时间的延迟分位数
+        
+        Args:
+            window_seconds: 延迟分位数的时间窗口（秒）
+            
+        Returns:
+            每个API源一项，latency 为窗口内的检查次数、错误数和 p50/p95/p99
+        """
+        try:
+            result = await self.db.execute(select(ProviderHealthLatest).order_by(ProviderHealthLatest.provider_id))
+            latest_checks = result.scalars().all()
+            names_result = await self.db.execute(select(APISource.id, APISource.name))
+            names = dict(names_result.all())
+            latency = await self.get_latency_percentiles(window_seconds)
+            
+            return [
+                {
+                    "provider_id": check.provider_id,
+                    "name": names.get(check.provider_id, check.provider_id),
+                    "status": check.status,
+                    "last_check": check.checked_at.isoformat() if check.checked_at else None,
+                    "response_time": check.response_time,
+                    "error": check.error_message,
+                    "latency": latency.get(check.provider_id)
+                }
+                for check in latest_checks
+            ]
+            
+        except Exception as e:
+            logger.error(f"获取Provider健康状态失败: {e}")
+            raise
+    
     async def get_provider_health_history(
         self,
         provider_id: str,
@@ -312,6 +436,7 @@ class HealthMonitorService:
                 {
                     "status": check.status,
                     "response_time": check.response_time,
+                    "ttfb": check.ttfb,
                     "error": check.error_message,
                     "checked_at": check.checked_at.isoformat() if check.checked_at else None
                 }
@@ -325,6 +450,7 @@ class HealthMonitorService:
             raise
     
     async def close(self):
-        """关闭HTTP客户端"""
-        await self.client.aclose()
+        """关闭HTTP客户端（共享客户端由应用生命周期统一关闭）"""
+        if not transport_manager.owns(self.client):
+            await self.client.aclose()
         logger.info("健康监控服务已关闭")
\ No newline at end of file
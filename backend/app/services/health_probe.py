@@ -0,0 +1,152 @@
+"""
+健康检查探测
+用 HEAD 或只读首字节的流式 GET 判断API源是否可用，不下载完整的模型列表；
+源拒绝轻量探测时才回退为完整请求，并记住该源的回退结果
+"""
+import logging
+import time
+from typing import Dict, NamedTuple, Optional
+
+import httpx
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+# 探测方式
+PROBE_HEAD = "head"
+PROBE_STREAM = "stream"
+PROBE_FULL = "full"
+PROBE_MODES = frozenset({PROBE_HEAD, PROBE_STREAM, PROBE_FULL})
+
+# 这些状态码表示源不接受轻量探测（不支持HEAD或Range），需要完整请求确认
+PROBE_REJECTED_STATUS_CODES = frozenset({400, 404, 405, 406, 416, 501})
+
+# 视为健康的状态码（Range请求可能返回206）
+HEALTHY_STATUS_CODES = frozenset({200, 206})
+
+
+class ProbeResult(NamedTuple):
+    """一次探测的结果"""
+    
+    response: httpx.Response
+    mode: str
+    ttfb: int  # 毫秒，发出请求到收到状态行和响应头
+    total: int  # 毫秒，发出请求到探测结束
+    bytes_read: int
+
+
+class HealthProber:
+    """
+    健康检查探测器
+    
+    - head: 发送 HEAD 请求，只读取状态行和响应头
+    - stream: 发送 Range: bytes=0-0 的流式 GET，读到第一个字节后关闭响应
+    - full: 下载完整响应
+    
+    轻量探测返回 PROBE_REJECTED_STATUS_CODES 中的状态码时，同一次检查内
+    改用完整请求确认；完整请求成功则记住该源，之后直接使用完整请求。
+    """
+    
+    def __init__(self, mode: str = PROBE_HEAD):
+        """
+        初始化探测器
+        
+        Args:
+            mode: 默认探测方式（head、stream 或 full）
+        """
+        if mode not in PROBE_MODES:
+            raise ValueError(f"不支持的健康检查探测方式: {mode}")
+        self.mode = mode
+        # 源 -> 该源可用的探测方式（只记录回退为完整请求的源）
+        self._fallbacks: Dict[str, str] = {}
+        self.probes = 0
+        self.fallbacks = 0
+        self.bytes_read = 0
+    
+    def mode_for(self, key: str) -> str:
+        """某个源当前使用的探测方式"""
+        return self._fallbacks.get(key, self.mode)
+    
+    async def probe(
+        self,
+        client: httpx.AsyncClient,
+        url: str,
+        key: str,
+        headers: Optional[Dict[str, str]] = None,
+        timeout: float = 30.0
+    ) -> ProbeResult:
+        """
+        探测一次
+        
+        Args:
+            client: HTTP客户端
+            url: 探测地址
+            key: 源标识（记录回退结果）
+            headers: 请求头
+            timeout: 超时时间（秒）
+        
+        Returns:
+            探测结果；源拒绝轻量探测时为完整请求的结果
+        
+        Raises:
+            httpx.TimeoutException、httpx.TransportError 等请求异常
+        """
+        mode = self.mode_for(key)
+        result = await self._probe(client, mode, url, headers or {}, timeout)
+        if mode != PROBE_FULL and result.response.status_code in PROBE_REJECTED_STATUS_CODES:
+            full = await self._probe(client, PROBE_FULL, url, headers or {}, timeout)
+            if full.response.status_code not in PROBE_REJECTED_STATUS_CODES:
+                self._fallbacks[key] = PROBE_FULL
+                self.fallbacks += 1
+                logger.info(f"源 {key} 不支持 {mode} 探测（HTTP {result.response.status_code}），改用完整请求")
+            result = full
+        return result
+    
+    async def _probe(
+        self,
+        client: httpx.AsyncClient,
+        mode: str,
+        url: str,
+        headers: Dict[str, str],
+        timeout: float
+    ) -> ProbeResult:
+        if mode == PROBE_HEAD:
+            request = client.build_request("HEAD", url, headers=headers, timeout=timeout)
+        elif mode == PROBE_STREAM:
+            request = client.build_request("GET", url, headers={**headers, "Range": "bytes=0-0"}, timeout=timeout)
+        else:
+            request = client.build_request("GET", url, headers=headers, timeout=timeout)
+        
+        started = time.perf_counter()
+        response = await client.send(request, stream=True)
+        ttfb = time.perf_counter() - started
+        try:
+            if mode == PROBE_FULL:
+                await response.aread()
+            elif mode == PROBE_STREAM:
+                # 读到第一个字节即可，关闭时未读完的连接被丢弃而不是放回连接池
+                async for chunk in response.aiter_raw():
+                    if chunk:
+                        break
+        finally:
+            await response.aclose()
+        total = time.perf_counter() - started
+        
+        self.probes += 1
+        self.bytes_read += response.num_bytes_downloaded
+        return ProbeResult(response, mode, int(ttfb * 1000), int(total * 1000), response.num_bytes_downloaded)
+    
+    def get_stats(self) -> Dict:
+        """获取探测统计"""
+        return {
+            "mode": self.mode,
+            "probes": self.probes,
+            "fallbacks": self.fallbacks,
+            "fallback_sources": len(self._fallbacks),
+            "bytes_read": self.bytes_read
+        }
+
+
+# 进程级共享的探测器（回退结果在各次检查之间共享）
+health_prober = HealthProber(settings.HEALTH_CHECK_PROBE_MODE)
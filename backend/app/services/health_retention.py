@@ -0,0 +1,213 @@
+"""
+健康检查记录保留
+定期将小时汇总降采样为按天汇总，并分批删除超过保留期的原始记录和各级汇总，
+每批单独提交，不长时间占用写锁
+"""
+import asyncio
+import logging
+from datetime import datetime, timedelta
+from typing import Callable, Dict, Optional
+
+from sqlalchemy import delete, func, insert, select
+
+from app.models.health_rollup import HealthRollupDay, HealthRollupHour, HealthRollupMinute
+from app.models.provider_model import HealthCheck
+from app.services.health_rollup import RollupBucket, day_bucket
+
+logger = logging.getLogger(__name__)
+
+# 日期结束后等待这段时间再降采样，缓冲中跨零点的记录写入后才合并
+DOWNSAMPLE_DELAY = timedelta(hours=1)
+
+
+class HealthRetention:
+    """
+    健康检查记录保留任务
+    
+    - 原始记录（health_checks）在写入时已汇总到分钟、小时汇总表，保留 raw_days 天
+    - 已结束的日期由小时汇总合并为按天汇总（health_rollups_day）
+    - 分钟、小时、按天汇总分别保留 minute_days、hour_days、day_days 天
+    - 保留天数为0表示不删除；小时汇总只删除已降采样的日期
+    - 每批最多删除约 batch_size 行后提交，批次之间暂停 pause 秒
+    """
+    
+    def __init__(
+        self,
+        session_factory: Callable,
+        raw_days: float = 7.0,
+        minute_days: float = 2.0,
+        hour_days: float = 90.0,
+        day_days: float = 730.0,
+        batch_size: int = 1000,
+        pause: float = 0.05,
+        interval: float = 3600.0
+    ):
+        """
+        初始化保留任务
+        
+        Args:
+            session_factory: 数据库会话工厂
+            raw_days: 原始记录保留天数
+            minute_days: 分钟汇总保留天数
+            hour_days: 小时汇总保留天数
+            day_days: 按天汇总保留天数
+            batch_size: 每批删除的行数
+            pause: 批次之间的暂停时间（秒）
+            interval: 执行间隔（秒）
+        """
+        self.session_factory = session_factory
+        self.raw_days = raw_days
+        self.minute_days = minute_days
+        self.hour_days = hour_days
+        self.day_days = day_days
+        self.batch_size = batch_size
+        self.pause = pause
+        self.interval = interval
+        self._task: Optional[asyncio.Task] = None
+        self.runs = 0
+        self.pruned: Dict[str, int] = {}
+        self.downsampled_days = 0
+        self.last_run: Optional[datetime] = None
+        self.last_result: Optional[Dict[str, int]] = None
+    
+    async def downsample_days(self, now: datetime) -> int:
+        """
+        将已结束日期的小时汇总合并为按天汇总
+        
+        从按天汇总中最新日期的下一天开始，逐天处理到 now - DOWNSAMPLE_DELAY
+        之前结束的日期，每天一个事务
+        
+        Returns:
+            处理的天数
+        """
+        end = day_bucket(now - DOWNSAMPLE_DELAY)
+        async with self.session_factory() as db:
+            last = await db.scalar(select(func.max(HealthRollupDay.bucket)))
+            if last is not None:
+                start = day_bucket(last) + timedelta(days=1)
+            else:
+                start = await db.scalar(select(func.min(HealthRollupHour.bucket)))
+        if start is None:
+            return 0
+        
+        days = 0
+        day = day_bucket(start)
+        while day < end:
+            next_day = day + timedelta(days=1)
+            async with self.session_factory() as db:
+                result = await db.execute(
+                    select(
+                        HealthRollupHour.provider_id,
+                        HealthRollupHour.count,
+                        HealthRollupHour.errors,
+                        HealthRollupHour.latency_sum,
+                        HealthRollupHour.sketch
+                    )
+                    .where(HealthRollupHour.bucket >= day, HealthRollupHour.bucket < next_day)
+                )
+                totals: Dict[str, RollupBucket] = {}
+                for provider_id, *columns in result.all():
+                    totals.setdefault(provider_id, RollupBucket()).merge(RollupBucket.from_columns(*columns))
+                
+                await db.execute(delete(HealthRollupDay).where(HealthRollupDay.bucket == day))
+                if totals:
+                    await db.execute(insert(HealthRollupDay), [
+                        {"provider_id": provider_id, "bucket": day, **total.as_row()}
+                        for provider_id, total in totals.items()
+                    ])
+                await db.commit()
+            days += 1
+            day = next_day
+        return days
+    
+    async def _delete_batches(self, model, column, cutoff: datetime) -> int:
+        """分批删除 column 早于 cutoff 的行，返回删除的行数"""
+        # 按时间顺序取一批行；汇总表按时间桶删除，一批最多多删一个时间桶的行
+        key = model.id if model is HealthCheck else column
+        batch = select(key).where(column < cutoff).order_by(column).limit(self.batch_size)
+        stmt = delete(model).where(key.in_(batch)).execution_options(synchronize_session=False)
+        total = 0
+        while True:
+            async with self.session_factory() as db:
+                result = await db.execute(stmt)
+                await db.commit()
+            if not result.rowcount:
+                return total
+            total += result.rowcount
+            await asyncio.sleep(self.pause)
+    
+    async def prune(self, now: Optional[datetime] = None) -> Dict[str, int]:
+        """
+        执行一次降采样和清理
+        
+        Args:
+            now: 当前时间（UTC），默认为当前时间
+        
+        Returns:
+            各表删除的行数，以及降采样的天数（downsampled_days）
+        """
+        now = now or datetime.utcnow()
+        downsampled = await self.downsample_days(now)
+        
+        # 小时汇总只删除已合并为按天汇总的日期
+        targets = (
+            (HealthCheck, HealthCheck.checked_at, self.raw_days, None),
+            (HealthRollupMinute, HealthRollupMinute.bucket, self.minute_days, None),
+            (HealthRollupHour, HealthRollupHour.bucket, self.hour_days, day_bucket(now - DOWNSAMPLE_DELAY)),
+            (HealthRollupDay, HealthRollupDay.bucket, self.day_days, None),
+        )
+        result: Dict[str, int] = {}
+        for model, column, days, limit in targets:
+            if days <= 0:
+                continue
+            cutoff = now - timedelta(days=days)
+            if limit is not None:
+                cutoff = min(cutoff, limit)
+            result[model.__tablename__] = await self._delete_batches(model, column, cutoff)
+        result["downsampled_days"] = downsampled
+        
+        self.runs += 1
+        self.downsampled_days += downsampled
+        for table, count in result.items():
+            if table != "downsampled_days":
+                self.pruned[table] = self.pruned.get(table, 0) + count
+        self.last_run = now
+        self.last_result = result
+        logger.info(f"健康检查记录清理完成: {result}")
+        return result
+    
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self.prune()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"清理健康检查记录失败: {e}")
+            await asyncio.sleep(self.interval)
+    
+    def start(self) -> None:
+        """启动后台清理任务"""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+            logger.info(f"健康检查记录清理已启动: 每 {self.interval:.0f} 秒，原始记录保留 {self.raw_days} 天")
+    
+    async def stop(self) -> None:
+        """停止后台清理任务"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+    
+    def get_stats(self) -> Dict:
+        """获取清理统计"""
+        return {
+            "runs": self.runs,
+            "pruned": dict(self.pruned),
+            "downsampled_days": self.downsampled_days,
+            "last_run": self.last_run.isoformat() if self.last_run else None,
+            "last_result": self.last_result
+        }
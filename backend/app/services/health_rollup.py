@@ -0,0 +1,325 @@
+"""
+健康检查汇总
+写入健康检查记录时同步维护每个API源的最新状态和按分钟、按小时的汇总，
+统计接口只读取这些小表，不再扫描和自连接 health_checks 表；
+每个汇总行带有可合并的延迟分布，任意时间窗口的分位数由分钟、小时、按天汇总合并得到
+"""
+import logging
+from datetime import datetime, timedelta
+from typing import Callable, Dict, Iterable, List, Optional, Tuple, Type
+
+from sqlalchemy import func, insert, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.health_rollup import (
+    HealthRollupDay,
+    HealthRollupHour,
+    HealthRollupMinute,
+    HealthRollupMixin,
+    ProviderHealthLatest,
+)
+from app.utils.latency_sketch import LatencySketch
+
+logger = logging.getLogger(__name__)
+
+# 每条语句处理的行数（SQLite单条语句的绑定参数数量有限）
+ROLLUP_BATCH_SIZE = 500
+
+# 最新状态表的列（与 health_checks 表同名）
+LATEST_COLUMNS = ("status", "response_time", "ttfb", "error_message", "checked_at")
+
+
+def minute_bucket(checked_at: datetime) -> datetime:
+    """所在分钟的起点"""
+    return checked_at.replace(second=0, microsecond=0)
+
+
+def hour_bucket(checked_at: datetime) -> datetime:
+    """所在小时的起点"""
+    return checked_at.replace(minute=0, second=0, microsecond=0)
+
+
+def day_bucket(checked_at: datetime) -> datetime:
+    """所在日期的起点（UTC）"""
+    return checked_at.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+ROLLUP_TABLES: Tuple[Tuple[Type[HealthRollupMixin], Callable[[datetime], datetime]], ...] = (
+    (HealthRollupMinute, minute_bucket),
+    (HealthRollupHour, hour_bucket),
+)
+
+
+class RollupBucket:
+    """一个API源在一个时间桶内的汇总，可以与其他时间桶合并"""
+    
+    __slots__ = ("count", "errors", "latency_sum", "sketch")
+    
+    def __init__(self, count: int = 0, errors: int = 0, latency_sum: int = 0, sketch: Optional[LatencySketch] = None):
+        self.count = count
+        self.errors = errors
+        self.latency_sum = latency_sum
+        self.sketch = sketch if sketch is not None else LatencySketch()
+    
+    @classmethod
+    def from_columns(cls, count: int, errors: int, latency_sum: int, sketch: Optional[bytes]) -> "RollupBucket":
+        """从汇总表的 count、errors、latency_sum、sketch 列恢复"""
+        return cls(count, errors, latency_sum, LatencySketch.from_bytes(sketch))
+    
+    def add(self, status: str, response_time: Optional[int]) -> None:
+        """
+        记录一次检查
+        
+        只有成功的检查计入延迟：快速失败（连接被拒绝、立即返回5xx）的响应时间
+        很短，计入后会拉低分位数，使故障的API源在负载均衡中反而排在前面
+        """
+        self.count += 1
+        if status != "healthy":
+            self.errors += 1
+        elif response_time is not None:
+            self.latency_sum += response_time
+            self.sketch.add(response_time)
+    
+    def merge(self, other: "RollupBucket") -> "RollupBucket":
+        """合并另一个时间桶"""
+        self.count += other.count
+        self.errors += other.errors
+        self.latency_sum += other.latency_sum
+        self.sketch.merge(other.sketch)
+        return self
+    
+    def as_row(self) -> Dict:
+        """汇总表的列值（不含主键）"""
+        return {
+            "count": self.count,
+            "errors": self.errors,
+            "latency_sum": self.latency_sum,
+            "p50": self.sketch.quantile(0.5),
+            "p95": self.sketch.quantile(0.95),
+            "p99": self.sketch.quantile(0.99),
+            "sketch": self.sketch.to_bytes() or None
+        }
+    
+    def summary(self) -> Dict:
+        """汇总结果"""
+        samples = len(self.sketch)
+        return {
+            "checks": self.count,
+            "errors": self.errors,
+            "error_rate": round(self.errors / self.count, 4) if self.count else 0.0,
+            "avg_response_time": int(self.latency_sum / samples) if samples else None,
+            "p50": self.sketch.quantile(0.5),
+            "p95": self.sketch.quantile(0.95),
+            "p99": self.sketch.quantile(0.99)
+        }
+
+
+def latest_by_provider(rows: Iterable[Dict]) -> Dict[str, Dict]:
+    """每个API源时间最新的一条记录"""
+    latest: Dict[str, Dict] = {}
+    for row in rows:
+        current = latest.get(row["provider_id"])
+        if current is None or row["checked_at"] >= current["checked_at"]:
+            latest[row["provider_id"]] = row
+    return latest
+
+
+def aggregate_rollups(
+    rows: Iterable[Dict],
+    truncate: Callable[[datetime], datetime]
+) -> Dict[Tuple[str, datetime], RollupBucket]:
+    """按 (API源, 时间桶) 汇总记录"""
+    buckets: Dict[Tuple[str, datetime], RollupBucket] = {}
+    for row in rows:
+        key = (row["provider_id"], truncate(row["checked_at"]))
+        bucket = buckets.get(key)
+        if bucket is None:
+            bucket = buckets[key] = RollupBucket()
+        bucket.add(row["status"], row.get("response_time"))
+    return buckets
+
+
+async def _record_latest(db: AsyncSession, rows: List[Dict]) -> None:
+    latest = latest_by_provider(rows)
+    provider_ids = list(latest)
+    existing: Dict[str, datetime] = {}
+    for start in range(0, len(provider_ids), ROLLUP_BATCH_SIZE):
+        result = await db.execute(
+            select(ProviderHealthLatest.provider_id, ProviderHealthLatest.checked_at)
+            .where(ProviderHealthLatest.provider_id.in_(provider_ids[start:start + ROLLUP_BATCH_SIZE]))
+        )
+        existing.update(result.all())
+    
+    inserts = []
+    updates = []
+    for provider_id, row in latest.items():
+        values = {"provider_id": provider_id, **{column: row.get(column) for column in LATEST_COLUMNS}}
+        if provider_id not in existing:
+            inserts.append(values)
+        elif row["checked_at"] >= existing[provider_id]:
+            updates.append(values)
+    
+    for start in range(0, len(inserts), ROLLUP_BATCH_SIZE):
+        await db.execute(insert(ProviderHealthLatest).values(inserts[start:start + ROLLUP_BATCH_SIZE]))
+    if updates:
+        # 按主键批量更新
+        await db.execute(update(ProviderHealthLatest), updates)
+
+
+async def _record_rollups(
+    db: AsyncSession,
+    table: Type[HealthRollupMixin],
+    truncate: Callable[[datetime], datetime],
+    rows: List[Dict]
+) -> None:
+    buckets = aggregate_rollups(rows, truncate)
+    keys = list(buckets)
+    for start in range(0, len(keys), ROLLUP_BATCH_SIZE):
+        chunk = keys[start:start + ROLLUP_BATCH_SIZE]
+        # 一批记录通常只落在少数几个时间桶内，按 API源 IN 和 时间桶 IN 读取后再按键过滤
+        wanted = set(chunk)
+        result = await db.execute(
+            select(table.provider_id, table.bucket, table.count, table.errors, table.latency_sum, table.sketch)
+            .where(
+                table.provider_id.in_({provider_id for provider_id, _ in chunk}),
+                table.bucket.in_({bucket for _, bucket in chunk})
+            )
+        )
+        existing = {
+            (provider_id, bucket): RollupBucket.from_columns(*columns)
+            for provider_id, bucket, *columns in result.all()
+            if (provider_id, bucket) in wanted
+        }
+        
+        inserts = []
+        updates = []
+        for key in chunk:
+            provider_id, bucket = key
+            current = existing.get(key)
+            if current is None:
+                inserts.append({"provider_id": provider_id, "bucket": bucket, **buckets[key].as_row()})
+            else:
+                merged = current.merge(buckets[key])
+                updates.append({"provider_id": provider_id, "bucket": bucket, **merged.as_row()})
+        
+        if inserts:
+            await db.execute(insert(table).values(inserts))
+        if updates:
+            await db.execute(update(table), updates)
+
+
+async def record_health_results(db: AsyncSession, rows: List[Dict]) -> None:
+    """
+    用一批健康检查记录更新最新状态表和分钟、小时汇总表
+    
+    在写入 health_checks 的同一事务内调用，由调用方提交。汇总行按
+    读取-合并-写回更新，调用方需保证同一时刻只有一个写入（HealthCheckBuffer
+    的写入锁保证了这一点）
+    
+    Args:
+        db: 数据库会话
+        rows: HealthCheck 的列值（provider_id、status、response_time、ttfb、error_message、checked_at）
+    """
+    if not rows:
+        return
+    await _record_latest(db, rows)
+    for table, truncate in ROLLUP_TABLES:
+        await _record_rollups(db, table, truncate, rows)
+
+
+def _ceil(value: datetime, truncate: Callable[[datetime], datetime], step: timedelta) -> datetime:
+    start = truncate(value)
+    return start if start == value else start + step
+
+
+def split_window(
+    since: datetime,
+    until: datetime,
+    days_until: Optional[datetime] = None,
+    current: bool = False
+) -> List[Tuple[Type[HealthRollupMixin], datetime, datetime]]:
+    """
+    将时间窗口拆分为尽量粗粒度的汇总区间
+    
+    窗口两端不足一小时的部分读取分钟汇总，中间的整小时读取小时汇总，
+    已降采样（早于 days_until）的整天读取按天汇总
+    
+    Args:
+        since: 窗口起点（所在分钟计入）
+        until: 窗口终点（所在分钟计入）
+        days_until: 按天汇总覆盖到的日期（不含），None表示不使用按天汇总
+        current: 窗口终点是否为当前时间；小时汇总随写入实时更新，
+            此时末尾不足一小时的部分直接读取当前小时的汇总
+    
+    Returns:
+        [(汇总表, 起始时间桶, 结束时间桶（不含）)]
+    """
+    start = minute_bucket(since)
+    end = minute_bucket(until) + timedelta(minutes=1)
+    first_hour = _ceil(start, hour_bucket, timedelta(hours=1))
+    last_hour = hour_bucket(end)
+    if first_hour >= last_hour:
+        return [(HealthRollupMinute, start, end)]
+    
+    ranges: List[Tuple[Type[HealthRollupMixin], datetime, datetime]] = [(HealthRollupMinute, start, first_hour)]
+    first_day = _ceil(first_hour, day_bucket, timedelta(days=1))
+    last_day = min(day_bucket(last_hour), days_until) if days_until is not None else first_day
+    if first_day < last_day:
+        ranges += [
+            (HealthRollupHour, first_hour, first_day),
+            (HealthRollupDay, first_day, last_day),
+            (HealthRollupHour, last_day, last_hour),
+        ]
+    else:
+        ranges.append((HealthRollupHour, first_hour, last_hour))
+    if current:
+        ranges.append((HealthRollupHour, last_hour, last_hour + timedelta(hours=1)))
+    else:
+        ranges.append((HealthRollupMinute, last_hour, end))
+    return [(table, low, high) for table, low, high in ranges if low < high]
+
+
+async def provider_latency(
+    db: AsyncSession,
+    since: datetime,
+    until: Optional[datetime] = None,
+    provider_id: Optional[str] = None
+) -> Dict[str, RollupBucket]:
+    """
+    各API源在任意时间窗口内的检查次数、错误数和延迟分布
+    
+    由分钟、小时、按天汇总的延迟分布合并得到，不读取原始记录；分位数的相对误差
+    与单个汇总相同。窗口精度为分钟，早于各级汇总保留期的部分不计入
+    
+    Args:
+        db: 数据库会话
+        since: 窗口起点（UTC）
+        until: 窗口终点（UTC），默认为当前时间（包含尚未结束的当前小时）
+        provider_id: 只统计某个API源，默认统计全部
+    
+    Returns:
+        API源ID -> 合并后的汇总
+    """
+    current = until is None
+    until = until or datetime.utcnow()
+    last_day = await db.scalar(select(func.max(HealthRollupDay.bucket)))
+    days_until = day_bucket(last_day) + timedelta(days=1) if last_day is not None else None
+    
+    totals: Dict[str, RollupBucket] = {}
+    for table, low, high in split_window(since, until, days_until, current):
+        stmt = (
+            select(table.provider_id, table.count, table.errors, table.latency_sum, table.sketch)
+            .where(table.bucket >= low, table.bucket < high)
+        )
+        if provider_id is not None:
+            stmt = stmt.where(table.provider_id == provider_id)
+        result = await db.execute(stmt)
+        for row_provider_id, count, errors, latency_sum, sketch in result.all():
+            total = totals.get(row_provider_id)
+            if total is None:
+                total = totals[row_provider_id] = RollupBucket()
+            total.count += count
+            total.errors += errors
+            total.latency_sum += latency_sum
+            total.sketch.merge_bytes(sketch)
+    return totals
@@ -0,0 +1,247 @@
+"""
+健康检查调度
+在应用进程内按 HEALTH_CHECK_INTERVAL 定期检查启用的API源：
+检查时间在间隔内均匀分布，异常的源更频繁地检查，稳定的源逐步放宽间隔
+"""
+import asyncio
+import heapq
+import logging
+import random
+import time
+from typing import Callable, Dict, List, Optional, Set, Tuple
+
+from sqlalchemy import select
+
+from app.models.api_source import APISource
+from app.services.health_monitor import HealthMonitorService
+
+logger = logging.getLogger(__name__)
+
+
+class _SourceState:
+    """单个API源的调度状态"""
+    
+    __slots__ = ("interval", "due", "failures", "successes", "last_status")
+    
+    def __init__(self, interval: float, due: float):
+        self.interval = interval
+        self.due = due
+        self.failures = 0
+        self.successes = 0
+        self.last_status: Optional[str] = None
+
+
+class HealthCheckScheduler:
+    """
+    健康检查调度器
+    
+    - 新发现的源在接下来一个间隔内均匀错开首次检查，不会在同一时刻集中发起
+    - 每个源有自己的检查间隔：检查失败时缩短为 interval * min_factor；
+      连续成功时每次放宽 growth 倍，最多到 interval * max_factor
+    - 下一次检查在本次检查完成后才排入队列，同一个源不会同时被检查两次
+    - 每次排期加入少量随机抖动，避免各源的检查时间重新对齐
+    """
+    
+    def __init__(
+        self,
+        session_factory: Callable,
+        interval: float = 300.0,
+        timeout: float = 30.0,
+        max_concurrent: int = 10,
+        min_factor: float = 0.25,
+        max_factor: float = 4.0,
+        growth: float = 1.5,
+        jitter: float = 0.1,
+        refresh_interval: Optional[float] = None,
+        shutdown_timeout: float = 10.0
+    ):
+        """
+        初始化健康检查调度器
+        
+        Args:
+            session_factory: 数据库会话工厂
+            interval: 基础检查间隔（秒）
+            timeout: 单次检查的超时时间（秒）
+            max_concurrent: 同时进行的检查数
+            min_factor: 检查失败的源的间隔系数
+            max_factor: 稳定的源的最大间隔系数
+            growth: 连续成功时间隔的放宽倍数
+            jitter: 排期的随机抖动比例
+            refresh_interval: 重新读取API源列表的间隔（秒），默认为 min(interval, 60)
+            shutdown_timeout: 停止时等待进行中检查完成的时间（秒）
+        """
+        self.session_factory = session_factory
+        self.interval = interval
+        self.timeout = timeout
+        self.min_factor = min_factor
+        self.max_factor = max_factor
+        self.growth = growth
+        self.jitter = jitter
+        self.refresh_interval = refresh_interval if refresh_interval is not None else min(interval, 60.0)
+        self.shutdown_timeout = shutdown_timeout
+        self._semaphore = asyncio.Semaphore(max_concurrent)
+        self._states: Dict[str, _SourceState] = {}
+        # (到期时间, 源ID)；源被移除或重新排期后旧条目在出队时丢弃
+        self._queue: List[Tuple[float, str]] = []
+        self._in_flight: Dict[str, asyncio.Task] = {}
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._next_refresh = 0.0
+        self.checks = 0
+        self.failures = 0
+        self.overlaps_skipped = 0
+    
+    async def refresh_sources(self) -> Tuple[int, int]:
+        """
+        读取启用的API源，新增的源在接下来一个间隔内均匀排期
+        
+        Returns:
+            (新增数量, 移除数量)
+        """
+        async with self.session_factory() as db:
+            result = await db.execute(select(APISource.id).where(APISource.enabled == True))
+            source_ids = set(result.scalars().all())
+        
+        removed = self._states.keys() - source_ids
+        for source_id in removed:
+            del self._states[source_id]
+        
+        added = sorted(source_ids - self._states.keys())
+        now = time.monotonic()
+        for index, source_id in enumerate(added):
+            state = _SourceState(self.interval, now + self.interval * index / len(added))
+            self._states[source_id] = state
+            heapq.heappush(self._queue, (state.due, source_id))
+        
+        if added or removed:
+            logger.info(f"健康检查调度: 新增 {len(added)} 个API源，移除 {len(removed)} 个，共 {len(self._states)} 个")
+            self._wakeup.set()
+        return len(added), len(removed)
+    
+    def _reschedule(self, source_id: str, status: str) -> None:
+        """根据检查结果调整间隔并排入下一次检查"""
+        state = self._states.get(source_id)
+        if state is None:
+            # 检查期间源已被移除
+            return
+        
+        state.last_status = status
+        if status == "healthy":
+            state.failures = 0
+            state.successes += 1
+            # 刚恢复的源先回到基础间隔，之后逐步放宽
+            if state.successes == 1:
+                state.interval = self.interval
+            else:
+                state.interval = min(state.interval * self.growth, self.interval * self.max_factor)
+        else:
+            state.successes = 0
+            state.failures += 1
+            state.interval = self.interval * self.min_factor
+        
+        delay = state.interval * random.uniform(1 - self.jitter, 1 + self.jitter)
+        state.due = time.monotonic() + delay
+        heapq.heappush(self._queue, (state.due, source_id))
+        self._wakeup.set()
+    
+    async def _check(self, source_id: str) -> None:
+        status = "error"
+        try:
+            async with self._semaphore:
+                async with self.session_factory() as db:
+                    result = await HealthMonitorService(db, timeout=self.timeout).check_api_source_health(source_id)
+            status = result["status"]
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"健康检查任务失败: {source_id}: {e}")
+        finally:
+            self._in_flight.pop(source_id, None)
+        
+        self.checks += 1
+        if status != "healthy":
+            self.failures += 1
+        self._reschedule(source_id, status)
+    
+    def _dispatch_due(self, now: float) -> None:
+        """启动所有到期的检查"""
+        while self._queue and self._queue[0][0] <= now:
+            due, source_id = heapq.heappop(self._queue)
+            state = self._states.get(source_id)
+            if state is None or state.due != due:
+                continue
+            if source_id in self._in_flight:
+                self.overlaps_skipped += 1
+                continue
+            self._in_flight[source_id] = asyncio.create_task(self._check(source_id))
+    
+    async def run_once(self) -> float:
+        """
+        执行一轮调度：按需刷新API源列表并启动到期的检查
+        
+        Returns:
+            距离下一个到期检查或列表刷新的秒数
+        """
+        now = time.monotonic()
+        if now >= self._next_refresh:
+            try:
+                await self.refresh_sources()
+            except Exception as e:
+                logger.error(f"读取API源列表失败: {e}")
+            self._next_refresh = now + self.refresh_interval
+        
+        self._dispatch_due(time.monotonic())
+        next_due = self._queue[0][0] if self._queue else self._next_refresh
+        return max(min(next_due, self._next_refresh) - time.monotonic(), 0.0)
+    
+    async def _run(self) -> None:
+        while True:
+            delay = await self.run_once()
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=delay)
+            except asyncio.TimeoutError:
+                pass
+    
+    def start(self) -> None:
+        """启动后台调度任务"""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+            logger.info(f"健康检查调度已启动: 基础间隔 {self.interval:.0f} 秒")
+    
+    async def stop(self) -> None:
+        """停止调度，等待进行中的检查完成，超时后取消"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        
+        pending: Set[asyncio.Task] = set(self._in_flight.values())
+        if pending:
+            _, pending = await asyncio.wait(pending, timeout=self.shutdown_timeout)
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+            if pending:
+                logger.warning(f"健康检查调度停止时取消了 {len(pending)} 个未完成的检查")
+        self._in_flight.clear()
+        logger.info("健康检查调度已停止")
+    
+    def get_stats(self) -> Dict:
+        """获取调度统计"""
+        intervals = [state.interval for state in self._states.values()]
+        return {
+            "sources": len(self._states),
+            "in_flight": len(self._in_flight),
+            "checks": self.checks,
+            "failures": self.failures,
+            "overlaps_skipped": self.overlaps_skipped,
+            "unhealthy_sources": sum(
+                1 for state in self._states.values()
+                if state.last_status is not None and state.last_status != "healthy"
+            ),
+            "mean_interval": round(sum(intervals) / len(intervals), 1) if intervals else None
+        }
@@ -0,0 +1,203 @@
+"""
+按主机的自适应并发调度
+为每个上游主机维护AIMD并发窗口，并受全局并发上限约束
+"""
+import asyncio
+import logging
+import time
+from typing import Dict, Optional
+from urllib.parse import urlparse
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+
+def host_of(url: str) -> str:
+    """
+    提取URL的主机标识（scheme://host:port）
+    
+    同一主机上的多个API源共享该主机的并发预算
+    """
+    parsed = urlparse(url)
+    return f"{parsed.scheme}://{parsed.netloc}".lower()
+
+
+class _HostState:
+    """单个主机的并发窗口状态"""
+    
+    __slots__ = ("window", "in_flight", "condition", "successes", "congestions", "min_latency")
+    
+    def __init__(self, window: float):
+        self.window = window
+        self.in_flight = 0
+        self.min_latency: Optional[float] = None
+        self.condition = asyncio.Condition()
+        self.successes = 0
+        self.congestions = 0
+    
+    @property
+    def limit(self) -> int:
+        return max(1, int(self.window))
+
+
+class HostSlot:
+    """
+    一次请求占用的主机并发槽位
+    
+    请求完成后调用 record() 记录状态码，退出上下文时据此调整窗口；
+    超时异常会被视为拥塞信号。
+    """
+    
+    def __init__(self, scheduler: "HostScheduler", host: str):
+        self.scheduler = scheduler
+        self.host = host
+        self.status_code: Optional[int] = None
+        self.started = 0.0
+    
+    def record(self, status_code: int) -> None:
+        """记录响应状态码"""
+        self.status_code = status_code
+    
+    async def __aenter__(self) -> "HostSlot":
+        await self.scheduler._acquire(self.host)
+        self.started = time.monotonic()
+        return self
+    
+    async def __aexit__(self, exc_type, exc, tb) -> None:
+        elapsed = time.monotonic() - self.started
+        if exc_type is not None and issubclass(exc_type, httpx.TimeoutException):
+            self.scheduler._on_congestion(self.host)
+        elif self.status_code is not None:
+            if self.status_code == 429 or self.status_code >= 500:
+                self.scheduler._on_congestion(self.host)
+            elif self.status_code < 400:
+                self.scheduler._on_success(self.host, elapsed)
+        await self.scheduler._release(self.host)
+
+
+class HostScheduler:
+    """
+    自适应并发调度器
+    
+    - 全局并发上限限制同时进行的请求总数
+    - 每个主机维护一个AIMD窗口：快速的2xx响应使窗口加性增长，
+      429、5xx和超时使窗口乘性减半
+    - 先获取主机槽位再获取全局槽位，排队等待慢主机的请求不会占用全局并发
+    """
+    
+    def __init__(
+        self,
+        max_concurrent: int = 5,
+        initial_window: float = 2.0,
+        min_window: float = 1.0,
+        max_window: float = 8.0,
+        fast_threshold: float = 2.0,
+        latency_tolerance: float = 1.5,
+        decrease_factor: float = 0.5
+    ):
+        """
+        初始化调度器
+        
+        Args:
+            max_concurrent: 全局最大并发请求数
+            initial_window: 每个主机的初始并发窗口
+            min_window: 主机窗口下限
+            max_window: 主机窗口上限
+            fast_threshold: 视为快速响应的耗时阈值（秒）
+            latency_tolerance: 相对主机最小耗时的容忍倍数
+            decrease_factor: 拥塞时窗口的缩减系数
+        """
+        self.max_concurrent = max_concurrent
+        self.initial_window = initial_window
+        self.min_window = min_window
+        self.max_window = max_window
+        self.fast_threshold = fast_threshold
+        self.latency_tolerance = latency_tolerance
+        self.decrease_factor = decrease_factor
+        self._global = asyncio.Semaphore(max_concurrent)
+        self._hosts: Dict[str, _HostState] = {}
+    
+    def _state(self, host: str) -> _HostState:
+        state = self._hosts.get(host)
+        if state is None:
+            state = _HostState(self.initial_window)
+            self._hosts[host] = state
+        return state
+    
+    def slot(self, url: str) -> HostSlot:
+        """
+        获取URL所属主机的并发槽位
+        
+        Args:
+            url: 请求URL
+        
+        Returns:
+            异步上下文管理器
+        """
+        return HostSlot(self, host_of(url))
+    
+    async def _acquire(self, host: str) -> None:
+        state = self._state(host)
+        async with state.condition:
+            await state.condition.wait_for(lambda: state.in_flight < state.limit)
+            state.in_flight += 1
+        try:
+            await self._global.acquire()
+        except BaseException:
+            await self._release_host(state)
+            raise
+    
+    async def _release(self, host: str) -> None:
+        self._global.release()
+        await self._release_host(self._state(host))
+    
+    @staticmethod
+    async def _release_host(state: _HostState) -> None:
+        async with state.condition:
+            state.in_flight -= 1
+            state.condition.notify_all()
+    
+    def _on_success(self, host: str, elapsed: float) -> None:
+        """
+        加性增长：每个完整窗口的快速响应使窗口增加1
+        
+        耗时不超过 fast_threshold，或不超过该主机最小耗时的 latency_tolerance 倍
+        （说明主机本身较慢但并未因并发增加而排队）时视为快速响应
+        """
+        state = self._state(host)
+        state.successes += 1
+        if state.min_latency is None or elapsed < state.min_latency:
+            state.min_latency = elapsed
+        if elapsed <= self.fast_threshold or elapsed <= state.min_latency * self.latency_tolerance:
+            state.window = min(self.max_window, state.window + 1.0 / state.window)
+    
+    def _on_congestion(self, host: str) -> None:
+        """乘性减小"""
+        state = self._state(host)
+        state.congestions += 1
+        old_window = state.window
+        state.window = max(self.min_window, state.window * self.decrease_factor)
+        if state.window < old_window:
+            logger.info(f"主机 {host} 出现拥塞，并发窗口 {old_window:.2f} -> {state.window:.2f}")
+    
+    def get_stats(self) -> Dict:
+        """
+        获取调度统计
+        
+        Returns:
+            每个主机的窗口、在途请求数及成功/拥塞次数
+        """
+        return {
+            "max_concurrent": self.max_concurrent,
+            "hosts": {
+                host: {
+                    "window": round(state.window, 2),
+                    "min_latency": round(state.min_latency, 3) if state.min_latency is not None else None,
+                    "in_flight": state.in_flight,
+                    "successes": state.successes,
+                    "congestions": state.congestions
+                }
+                for host, state in self._hosts.items()
+            }
+        }
@@ -0,0 +1,281 @@
+"""
+聚合分组负载均衡
+由健康检查汇总的延迟分布计算各API源最近一段时间的延迟分位数和错误率，
+为聚合分组生成加权或最低延迟策略；后台任务定期重算
+"""
+import asyncio
+import logging
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, Dict, List, NamedTuple, Optional, Set, Tuple
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.services.health_rollup import RollupBucket, provider_latency
+
+logger = logging.getLogger(__name__)
+
+# 支持的负载均衡策略
+ROUND_ROBIN = "round_robin"
+WEIGHTED = "weighted"
+LEAST_LATENCY = "least_latency"
+STRATEGIES = frozenset({ROUND_ROBIN, WEIGHTED, LEAST_LATENCY})
+
+# 权重范围及粒度：最快的分组为 MAX_WEIGHT，其余按比例取 WEIGHT_STEP 的整数倍，最小为1
+MAX_WEIGHT = 100
+WEIGHT_STEP = 5
+
+# 错误率的量化粒度
+ERROR_RATE_STEP = 0.05
+
+
+class ProviderScore(NamedTuple):
+    """
+    单个API源在统计窗口内的表现
+    
+    延迟保留两位有效数字、错误率按 ERROR_RATE_STEP 取整，
+    测量值的细微波动不会改变评分，也就不会让配置来回变化
+    """
+    
+    samples: int
+    error_rate: float
+    p50: int
+    p95: int
+    
+    @property
+    def latency(self) -> float:
+        """综合延迟（毫秒），兼顾中位数和长尾"""
+        return max((self.p50 + self.p95) / 2, 1.0)
+    
+    @property
+    def capacity(self) -> float:
+        """单位延迟内的成功率，越大越优先"""
+        return (1.0 - self.error_rate) / self.latency
+
+
+def _round_latency(ms: float) -> int:
+    """保留两位有效数字"""
+    return int(float(f"{ms:.2g}"))
+
+
+def score_rollup(rollup: RollupBucket) -> ProviderScore:
+    """
+    由窗口内合并的健康检查汇总计算评分
+    
+    Args:
+        rollup: 检查次数、错误数和成功检查的延迟分布
+    
+    Returns:
+        评分；没有任何成功记录时延迟记为0
+    """
+    error_rate = round(rollup.errors / rollup.count / ERROR_RATE_STEP) * ERROR_RATE_STEP
+    if not len(rollup.sketch):
+        return ProviderScore(rollup.count, round(error_rate, 2), 0, 0)
+    return ProviderScore(
+        rollup.count,
+        round(error_rate, 2),
+        _round_latency(rollup.sketch.quantile(0.5)),
+        _round_latency(rollup.sketch.quantile(0.95))
+    )
+
+
+def resolve_strategy(strategy: Optional[str], default: str) -> str:
+    """未配置或无法识别的策略使用默认策略"""
+    if strategy in STRATEGIES:
+        return strategy
+    if strategy is not None:
+        logger.warning(f"未知的负载均衡策略 '{strategy}'，使用 {default}")
+    return default
+
+
+def balance_aggregate(
+    strategy: str,
+    members: List[Tuple[str, str]],
+    scores: Dict[str, ProviderScore]
+) -> Dict:
+    """
+    生成聚合分组的负载均衡字段
+    
+    没有评分的分组按已有评分的中位数处理，既不抢占流量也不被饿死；
+    所有分组都没有评分时加权策略退化为轮询
+    
+    Args:
+        strategy: 负载均衡策略
+        members: [(API源ID, 分组名)]，按配置顺序排列
+        scores: API源ID -> 评分
+    
+    Returns:
+        包含 sub_groups、load_balance，加权策略另含 weights
+    """
+    group_names = [group for _, group in members]
+    if strategy == ROUND_ROBIN:
+        return {"sub_groups": group_names, "load_balance": ROUND_ROBIN}
+    
+    known = sorted(scores[pid].capacity for pid, _ in members if pid in scores)
+    best = known[-1] if known else 0.0
+    if best <= 0:
+        # 没有可用的测量数据
+        fallback = ROUND_ROBIN if strategy == WEIGHTED else strategy
+        return {"sub_groups": group_names, "load_balance": fallback}
+    
+    neutral = known[len(known) // 2]
+    capacities = [scores[pid].capacity if pid in scores else neutral for pid, _ in members]
+    
+    if strategy == LEAST_LATENCY:
+        # 按错误率修正后的延迟从低到高排列，相同时保持原顺序
+        order = sorted(range(len(members)), key=lambda i: -capacities[i])
+        return {"sub_groups": [group_names[i] for i in order], "load_balance": LEAST_LATENCY}
+    
+    weights = {
+        group: max(round(capacity / best * MAX_WEIGHT / WEIGHT_STEP) * WEIGHT_STEP, 1)
+        for group, capacity in zip(group_names, capacities)
+    }
+    return {"sub_groups": group_names, "load_balance": WEIGHTED, "weights": weights}
+
+
+async def compute_provider_scores(
+    db: AsyncSession,
+    window_seconds: float,
+    min_samples: int = 3
+) -> Dict[str, ProviderScore]:
+    """
+    统计窗口内各API源的健康检查汇总，不扫描原始记录
+    
+    Args:
+        db: 数据库会话
+        window_seconds: 统计窗口（秒）
+        min_samples: 记录数少于此值的API源不参与评分
+    
+    Returns:
+        API源ID -> 评分
+    """
+    rollups = await provider_latency(db, datetime.utcnow() - timedelta(seconds=window_seconds))
+    return {
+        provider_id: score_rollup(rollup)
+        for provider_id, rollup in rollups.items()
+        if rollup.count >= min_samples
+    }
+
+
+class LoadBalanceScores:
+    """
+    当前生效的API源评分
+    
+    scores 每次变化时整体替换为新字典并递增 version，
+    配置图通过比较对象是否相同判断是否需要重算聚合分组
+    """
+    
+    def __init__(self):
+        self.scores: Dict[str, ProviderScore] = {}
+        self.version = 0
+        self.recomputes = 0
+        self.updated_at: Optional[datetime] = None
+    
+    def update(self, scores: Dict[str, ProviderScore]) -> Set[str]:
+        """
+        替换评分
+        
+        Returns:
+            评分发生变化的API源ID
+        """
+        self.recomputes += 1
+        changed = {
+            provider_id for provider_id in scores.keys() | self.scores.keys()
+            if scores.get(provider_id) != self.scores.get(provider_id)
+        }
+        if changed:
+            self.scores = scores
+            self.version += 1
+            self.updated_at = datetime.utcnow()
+        return changed
+    
+    def get_stats(self) -> Dict:
+        """获取评分统计"""
+        return {
+            "version": self.version,
+            "providers": len(self.scores),
+            "recomputes": self.recomputes,
+            "updated_at": self.updated_at.isoformat() if self.updated_at else None
+        }
+
+
+class LoadBalanceReweighter:
+    """
+    负载均衡权重定期重算
+    
+    每隔 interval 秒按最近 window 秒的健康检查记录重算评分；评分变化时
+    调用 on_change（例如重新应用配置），使路由跟随实测表现
+    """
+    
+    def __init__(
+        self,
+        session_factory: Callable,
+        interval: float = 60.0,
+        window: float = 3600.0,
+        min_samples: int = 3,
+        scores: Optional[LoadBalanceScores] = None,
+        on_change: Optional[Callable[[Set[str]], Awaitable]] = None
+    ):
+        """
+        初始化权重重算任务
+        
+        Args:
+            session_factory: 数据库会话工厂
+            interval: 重算间隔（秒）
+            window: 统计窗口（秒）
+            min_samples: 参与评分的最少记录数
+            scores: 评分存放位置，默认使用进程级共享实例
+            on_change: 评分变化后的回调，参数为变化的API源ID
+        """
+        self.session_factory = session_factory
+        self.interval = interval
+        self.window = window
+        self.min_samples = min_samples
+        self.scores = scores if scores is not None else load_balance_scores
+        self.on_change = on_change
+        self._task: Optional[asyncio.Task] = None
+    
+    async def recompute(self) -> Set[str]:
+        """
+        重算一次评分
+        
+        Returns:
+            评分发生变化的API源ID
+        """
+        async with self.session_factory() as db:
+            scores = await compute_provider_scores(db, self.window, self.min_samples)
+        changed = self.scores.update(scores)
+        if changed:
+            logger.info(f"负载均衡评分已更新: {len(changed)} 个API源变化，共 {len(scores)} 个API源有评分")
+            if self.on_change is not None:
+                await self.on_change(changed)
+        return changed
+    
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self.recompute()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"重算负载均衡权重失败: {e}")
+            await asyncio.sleep(self.interval)
+    
+    def start(self) -> None:
+        """启动后台重算任务"""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+            logger.info(f"负载均衡权重重算已启动: 每 {self.interval:.0f} 秒")
+    
+    async def stop(self) -> None:
+        """停止后台重算任务"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+# 进程级共享的评分
+load_balance_scores = LoadBalanceScores()
@@ -4,18 +4,25 @@
 """
 import logging
 import uuid
-from typing import List, Dict, Optional, Tuple
+from typing import AsyncIterable, List, Dict, Optional, Sequence, Set, Tuple, Union
 from datetime import datetime
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, and_, func
+from sqlalchemy import select, insert, update, and_, or_, func
 from collections import defaultdict
+from sqlalchemy.orm.attributes import set_committed_value
 
 from app.models.model import Model
 from app.models.api_source import APISource
 from app.models.provider_model import Provider, ModelMapping
+from app.services.config_changes import CHANGED_PROVIDERS_OPTION
+from app.utils.normalization import ModelNameNormalizer, SuffixTrie, get_normalizer
+from app.utils.split_naming import split_key, split_provider_name
 
 logger = logging.getLogger(__name__)
 
+# 批量写入时每条语句的行数（SQLite单条语句的绑定参数数量有限）
+BULK_BATCH_SIZE = 500
+
 
 class ModelManagerService:
     """模型管理服务"""
@@ -39,7 +46,7 @@ class ModelManagerService:
                 - normalized_name: 标准化名称
                 - provider_id: Provider ID
                 - display_name: 显示名称（可选）
-                
+        
         Returns:
             创建或更新后的模型对象
         """
@@ -59,6 +66,8 @@ class ModelManagerService:
                 existing_model.normalized_name = model_data.get('normalized_name', existing_model.normalized_name)
                 if 'display_name' in model_data:
                     existing_model.display_name = model_data['display_name']
+                if existing_model.split_key is None:
+                    existing_model.split_key = split_key(existing_model.provider_id, existing_model.original_name)
                 existing_model.updated_at = datetime.utcnow()
                 
                 logger.info(f"更新模型: {existing_model.id}")
@@ -74,6 +83,7 @@ class ModelManagerService:
                     normalized_name=model_data['normalized_name'],
                     display_name=model_data.get('display_name'),
                     provider_id=model_data['provider_id'],
+                    split_key=split_key(model_data['provider_id'], model_data['original_name']),
                     enabled=True
                 )
                 
@@ -83,12 +93,218 @@ class ModelManagerService:
                 
                 logger.info(f"创建新模型: {new_model.id} - {new_model.original_name}")
                 return new_model
-                
+        
         except Exception as e:
             await self.db.rollback()
             logger.error(f"创建或更新模型失败: {e}")
             raise
     
+    async def bulk_upsert_models(self, source_id: str, models: List[Dict]) -> Dict[str, int]:
+        """
+        批量创建或更新某个API源的模型
+        
+        一次查询取出该源的现有模型并在内存中比对，只对新增和变化的行
+        分批执行 INSERT ... ON CONFLICT，所有写入在同一个事务中提交
+        
+        Args:
+            source_id: API源ID
+            models: 模型列表，每个元素可以是上游返回的条目（含 id）
+                或模型数据（含 original_name，可选 normalized_name、display_name）
+        
+        Returns:
+            {"created": int, "updated": int, "unchanged": int}
+        """
+        try:
+            existing = await self._load_source_models(source_id)
+            to_insert, to_update, unchanged = self._plan_upsert(source_id, models, existing, datetime.utcnow())
+            
+            rows = to_insert + to_update
+            for start in range(0, len(rows), BULK_BATCH_SIZE):
+                await self._upsert_batch(rows[start:start + BULK_BATCH_SIZE])
+            
+            await self.db.commit()
+            
+            counts = {"created": len(to_insert), "updated": len(to_update), "unchanged": unchanged}
+            logger.info(f"API源 {source_id} 批量写入模型完成: {counts}")
+            return counts
+        
+        except Exception as e:
+            await self.db.rollback()
+            logger.error(f"批量写入模型失败: {e}")
+            raise
+    
+    async def bulk_upsert_model_stream(self, source_id: str, models: AsyncIterable[Dict]) -> Dict[str, int]:
+        """
+        边接收边写入某个API源的模型
+        
+        与 bulk_upsert_models 相同，但模型以异步迭代器给出，每攒够 BULK_BATCH_SIZE
+        个条目比对并写入一批，不在内存中保留完整的模型列表；所有写入在同一个事务中提交
+        
+        Args:
+            source_id: API源ID
+            models: 模型条目的异步迭代器
+        
+        Returns:
+            {"created": int, "updated": int, "unchanged": int}
+        """
+        try:
+            existing = await self._load_source_models(source_id)
+            now = datetime.utcnow()
+            counts = {"created": 0, "updated": 0, "unchanged": 0}
+            
+            async def write(items: List[Dict]) -> None:
+                to_insert, to_update, unchanged = self._plan_upsert(source_id, items, existing, now)
+                await self._upsert_batch(to_insert + to_update)
+                counts["created"] += len(to_insert)
+                counts["updated"] += len(to_update)
+                counts["unchanged"] += unchanged
+            
+            batch = []
+            async for item in models:
+                batch.append(item)
+                if len(batch) >= BULK_BATCH_SIZE:
+                    await write(batch)
+                    batch = []
+            await write(batch)
+            
+            await self.db.commit()
+            
+            logger.info(f"API源 {source_id} 流式写入模型完成: {counts}")
+            return counts
+        
+        except Exception as e:
+            await self.db.rollback()
+            logger.error(f"流式写入模型失败: {e}")
+            raise
+    
+    async def _load_source_models(self, source_id: str) -> Dict[str, Tuple]:
+        """一次查询取出某个API源的现有模型：原始名称 -> (原始名称, 标准化名称, 显示名称)"""
+        stmt = select(
+            Model.original_name, Model.normalized_name, Model.display_name
+        ).where(Model.provider_id == source_id)
+        result = await self.db.execute(stmt)
+        return {row[0]: tuple(row) for row in result.all()}
+    
+    @staticmethod
+    def _plan_upsert(
+        source_id: str,
+        models: List[Dict],
+        existing: Dict[str, Tuple],
+        now: datetime
+    ) -> Tuple[List[Dict], List[Dict], int]:
+        """
+        比对一批模型条目与现有模型
+        
+        existing 随之更新为写入后的值，后续批次中的重复条目按新值比对
+        
+        Returns:
+            (新增的行, 更新的行, 未变化的条目数)
+        """
+        normalizer = get_normalizer()
+        
+        # 按原始名称去重
+        incoming: Dict[str, Dict] = {}
+        for item in models:
+            original_name = item.get('original_name') or item.get('id')
+            if not original_name:
+                continue
+            row = {
+                "original_name": original_name,
+                "normalized_name": item.get('normalized_name') or normalizer.normalize(original_name)
+            }
+            if 'display_name' in item:
+                row["display_name"] = item['display_name']
+            incoming[original_name] = row
+        
+        to_insert = []
+        to_update = []
+        unchanged = 0
+        
+        for original_name, row in incoming.items():
+            current = existing.get(original_name)
+            if current is None:
+                to_insert.append({
+                    "id": str(uuid.uuid4()),
+                    "original_name": original_name,
+                    "normalized_name": row["normalized_name"],
+                    "display_name": row.get("display_name"),
+                    "provider_id": source_id,
+                    "split_key": split_key(source_id, original_name),
+                    "enabled": True,
+                    "updated_at": now
+                })
+                existing[original_name] = (original_name, row["normalized_name"], row.get("display_name"))
+            elif current[1] != row["normalized_name"] or (
+                "display_name" in row and current[2] != row["display_name"]
+            ):
+                display_name = row["display_name"] if "display_name" in row else current[2]
+                to_update.append({
+                    "id": str(uuid.uuid4()),
+                    "original_name": original_name,
+                    "normalized_name": row["normalized_name"],
+                    "display_name": display_name,
+                    "provider_id": source_id,
+                    "split_key": split_key(source_id, original_name),
+                    "enabled": True,
+                    "updated_at": now
+                })
+                existing[original_name] = (original_name, row["normalized_name"], display_name)
+            else:
+                unchanged += 1
+        
+        return to_insert, to_update, unchanged
+    
+    async def _upsert_batch(self, rows: List[Dict]) -> None:
+        """
+        执行一批 INSERT ... ON CONFLICT (provider_id, original_name) DO UPDATE
+        
+        冲突时只更新名称字段，保留已有行的id、启用状态和拆分标识
+        （迁移前创建、尚无拆分标识的行在此补齐）
+        """
+        if not rows:
+            return
+        
+        # 声明受影响的provider，供增量配置生成使用
+        changed = {CHANGED_PROVIDERS_OPTION: {row["provider_id"] for row in rows}}
+        dialect = self.db.get_bind().dialect.name
+        if dialect == "sqlite":
+            from sqlalchemy.dialects.sqlite import insert as dialect_insert
+        elif dialect == "postgresql":
+            from sqlalchemy.dialects.postgresql import insert as dialect_insert
+        else:
+            dialect_insert = None
+        
+        if dialect_insert is None:
+            # 不支持ON CONFLICT的数据库：逐行合并（仍在同一事务中）
+            for row in rows:
+                stmt = update(Model).where(
+                    and_(
+                        Model.provider_id == row["provider_id"],
+                        Model.original_name == row["original_name"]
+                    )
+                ).values(
+                    normalized_name=row["normalized_name"],
+                    display_name=row["display_name"],
+                    updated_at=row["updated_at"]
+                ).execution_options(**changed)
+                result = await self.db.execute(stmt)
+                if result.rowcount == 0:
+                    self.db.add(Model(**row))
+            await self.db.flush()
+            return
+        
+        stmt = dialect_insert(Model).values(rows)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[Model.provider_id, Model.original_name],
+            set_={
+                "normalized_name": stmt.excluded.normalized_name,
+                "display_name": stmt.excluded.display_name,
+                "split_key": func.coalesce(Model.split_key, stmt.excluded.split_key),
+                "updated_at": stmt.excluded.updated_at
+            }
+        ).execution_options(**changed)
+        await self.db.execute(stmt)
+    
     async def rename_model(self, model_id: str, new_name: str) -> Optional[Model]:
         """
         重命名模型
@@ -96,7 +312,7 @@ class ModelManagerService:
         Args:
             model_id: 模型ID
             new_name: 新的显示名称
-            
+        
         Returns:
             更新后的模型对象，如果模型不存在则返回None
         """
@@ -135,7 +351,7 @@ class ModelManagerService:
             
             logger.info(f"模型重命名成功: {model_id} - {old_name} -> {new_name}")
             return model
-            
+        
         except Exception as e:
             await self.db.rollback()
             logger.error(f"重命名模型失败: {e}")
@@ -147,7 +363,7 @@ class ModelManagerService:
         
         Args:
             model_id: 模型ID
-            
+        
         Returns:
             是否删除成功
         """
@@ -169,98 +385,181 @@ class ModelManagerService:
             
             logger.info(f"模型已删除（软删除）: {model_id} - {model.original_name}")
             return True
-            
+        
         except Exception as e:
             await self.db.rollback()
             logger.error(f"删除模型失败: {e}")
             raise
     
-    async def split_providers_by_model(self, api_source_id: str) -> List[Dict]:
+    async def split_providers_by_model(self, api_source_ids: Union[str, Sequence[str]]) -> List[Dict]:
         """
         Provider自动拆分
         
         为同一API源的不同模型创建独立的provider实例
-        命名规则：{source_name}-{index}
+        命名规则：{source_name}-{split_key}，split_key 由API源ID和原始模型名派生，
+        不随模型在列表中的位置变化
+        
+        传入多个API源时在同一事务中完成全部拆分；已存在的provider通过一次
+        前缀查询加载后在内存中判断，新provider一次批量插入。
         
         Args:
-            api_source_id: API源ID
-            
+            api_source_ids: API源ID或API源ID列表
+        
         Returns:
             拆分后的provider列表
         """
+        if isinstance(api_source_ids, str):
+            api_source_ids = [api_source_ids]
+        api_source_ids = list(dict.fromkeys(api_source_ids))
+        if not api_source_ids:
+            return []
+        
         try:
             # 获取API源信息
-            api_source_stmt = select(APISource).where(APISource.id == api_source_id)
-            api_source_result = await self.db.execute(api_source_stmt)
-            api_source = api_source_result.scalar_one_or_none()
-            
-            if not api_source:
-                logger.warning(f"API源不存在: {api_source_id}")
-                return []
-            
-            # 获取该API源的所有启用模型
-            models_stmt = select(Model).where(
-                and_(
-                    Model.provider_id == api_source_id,
-                    Model.enabled == True
+            api_sources = {}
+            for chunk in _chunked(api_source_ids, BULK_BATCH_SIZE):
+                api_source_result = await self.db.execute(
+                    select(APISource).where(APISource.id.in_(chunk))
                 )
-            )
-            models_result = await self.db.execute(models_stmt)
-            models = models_result.scalars().all()
+                for api_source in api_source_result.scalars():
+                    api_sources[api_source.id] = api_source
             
-            if not models:
-                logger.info(f"API源 {api_source_id} 没有启用的模型")
+            for api_source_id in api_source_ids:
+                if api_source_id not in api_sources:
+                    logger.warning(f"API源不存在: {api_source_id}")
+            
+            if not api_sources:
                 return []
             
-            # 按模型名称分组
-            models_by_name = defaultdict(list)
-            for model in models:
-                unified_name = model.display_name or model.normalized_name
-                models_by_name[unified_name].append(model)
+            # 获取这些API源的所有启用模型
+            models_by_source = defaultdict(list)
+            for chunk in _chunked(list(api_sources), BULK_BATCH_SIZE):
+                models_stmt = select(Model).where(
+                    and_(
+                        Model.provider_id.in_(chunk),
+                        Model.enabled == True
+                    )
+                )
+                models_result = await self.db.execute(models_stmt)
+                for model in models_result.scalars():
+                    models_by_source[model.provider_id].append(model)
+            
+            # 一次查询加载以源名称为前缀的已有provider ID
+            existing_ids = set()
+            prefixes = list({f"{api_source.name}-" for api_source in api_sources.values()})
+            for chunk in _chunked(prefixes, BULK_BATCH_SIZE):
+                provider_stmt = select(Provider.id).where(
+                    or_(*(Provider.id.startswith(prefix, autoescape=True) for prefix in chunk))
+                )
+                provider_result = await self.db.execute(provider_stmt)
+                existing_ids.update(provider_result.scalars())
             
             # 创建拆分的provider
             split_providers = []
+            new_providers = []
             
-            for index, model in enumerate(models):
-                provider_id = f"{api_source.name}-{index}"
-                unified_name = model.display_name or model.normalized_name
+            for api_source_id in api_source_ids:
+                api_source = api_sources.get(api_source_id)
+                if api_source is None:
+                    continue
                 
-                # 检查provider是否已存在
-                provider_stmt = select(Provider).where(Provider.id == provider_id)
-                provider_result = await self.db.execute(provider_stmt)
-                existing_provider = provider_result.scalar_one_or_none()
+                models = models_by_source.get(api_source_id)
+                if not models:
+                    logger.info(f"API源 {api_source_id} 没有启用的模型")
+                    continue
                 
-                if not existing_provider:
-                    # 创建新provider
-                    new_provider = Provider(
-                        id=provider_id,
-                        name=provider_id,
-                        base_url=api_source.base_url,
-                        api_key=api_source.api_key,
-                        enabled=True,
-                        priority=api_source.priority
+                created = 0
+                for model in models:
+                    provider_id = split_provider_name(
+                        api_source.name, model.split_key or split_key(api_source_id, model.original_name)
                     )
-                    self.db.add(new_provider)
+                    if provider_id in existing_ids:
+                        continue
+                    existing_ids.add(provider_id)
                     
+                    unified_name = model.display_name or model.normalized_name
+                    new_providers.append({
+                        "id": provider_id,
+                        "name": provider_id,
+                        "base_url": api_source.base_url,
+                        "api_key": api_source.api_key,
+                        "enabled": True,
+                        "priority": api_source.priority
+                    })
                     split_providers.append({
                         "id": provider_id,
                         "model": unified_name,
                         "original_model": model.original_name,
                         "model_id": model.id
                     })
-                    
-                    logger.info(f"创建拆分provider: {provider_id} - {unified_name}")
+                    created += 1
+                    logger.debug(f"创建拆分provider: {provider_id} - {unified_name}")
+                
+                logger.info(f"API源 {api_source_id} 拆分完成，共创建 {created} 个provider")
             
+            for chunk in _chunked(new_providers, BULK_BATCH_SIZE):
+                stmt = insert(Provider).execution_options(**{
+                    CHANGED_PROVIDERS_OPTION: {row["id"] for row in chunk}
+                })
+                await self.db.execute(stmt, chunk)
             await self.db.commit()
             
-            logger.info(f"API源 {api_source_id} 拆分完成，共创建 {len(split_providers)} 个provider")
+            logger.info(f"Provider拆分完成: {len(api_sources)} 个API源，共创建 {len(split_providers)} 个provider")
             return split_providers
-            
+        
         except Exception as e:
             await self.db.rollback()
             logger.error(f"Provider拆分失败: {e}")
             raise
     
+    async def renormalize_models(
+        self,
+        normalizer: ModelNameNormalizer,
+        candidates: Optional[SuffixTrie] = None
+    ) -> Dict[str, int]:
+        """
+        按新的标准化规则重新计算模型的标准化名称
+        
+        只读取 id、original_name、normalized_name 三列，并只更新结果发生变化的行
+        
+        Args:
+            normalizer: 新的标准化器
+            candidates: 可能受影响的名称片段，None表示检查全部模型
+        
+        Returns:
+            {"scanned": 扫描行数, "candidates": 重新计算的行数, "updated": 更新的行数}
+        """
+        try:
+            stmt = select(Model.id, Model.original_name, Model.normalized_name)
+            result = await self.db.execute(stmt)
+            
+            scanned = 0
+            checked = 0
+            updates = []
+            now = datetime.utcnow()
+            
+            for model_id, original_name, normalized_name in result:
+                scanned += 1
+                if candidates is not None and not candidates.contains_any(original_name):
+                    continue
+                checked += 1
+                new_name = normalizer.normalize(original_name)
+                if new_name != normalized_name:
+                    updates.append({"id": model_id, "normalized_name": new_name, "updated_at": now})
+            
+            if updates:
+                # 按主键批量更新
+                await self.db.execute(update(Model), updates)
+                await self.db.commit()
+            
+            logger.info(f"重新标准化完成: 扫描 {scanned}, 重新计算 {checked}, 更新 {len(updates)}")
+            return {"scanned": scanned, "candidates": checked, "updated": len(updates)}
+        
+        except Exception as e:
+            await self.db.rollback()
+            logger.error(f"重新标准化模型失败: {e}")
+            raise
+    
     async def get_model_statistics(self) -> Dict:
         """
         获取模型统计信息
@@ -314,7 +613,7 @@ class ModelManagerService:
             
             logger.info(f"模型统计: {statistics}")
             return statistics
-            
+        
         except Exception as e:
             logger.error(f"获取模型统计失败: {e}")
             raise
@@ -323,76 +622,182 @@ class ModelManagerService:
         """
         批量重命名模型
         
+        使用集合操作完成：一次查询取出模型，一次 IN/GROUP BY 查询检查名称冲突，
+        一次批量UPDATE，所有更新在同一事务中提交（失败时全部回滚）。
+        同一模型出现多次时以最后一次为准。
+        
         Args:
             renames: 重命名列表 [{"model_id": str, "new_name": str}, ...]
-            
+        
         Returns:
             (成功更新的模型列表, 失败的记录列表)
         """
-        updated_models = []
         failed_renames = []
         
+        # 参数校验
+        requested: Dict[str, str] = {}
         for rename in renames:
-            try:
-                model_id = rename.get('model_id')
-                new_name = rename.get('new_name')
+            model_id = rename.get('model_id')
+            new_name = rename.get('new_name')
+            if not model_id or not new_name:
+                failed_renames.append({
+                    "model_id": model_id,
+                    "error": "缺少必要参数"
+                })
+                continue
+            requested.pop(model_id, None)
+            requested[model_id] = new_name
+        
+        if not requested:
+            logger.info(f"批量重命名完成: 成功 0, 失败 {len(failed_renames)}")
+            return [], failed_renames
+        
+        try:
+            # 一次取出所有待重命名的模型
+            models_by_id: Dict[str, Model] = {}
+            for chunk in _chunked(list(requested), BULK_BATCH_SIZE):
+                result = await self.db.execute(select(Model).where(Model.id.in_(chunk)))
+                for model in result.scalars():
+                    models_by_id[model.id] = model
+            
+            for model_id in [m for m in requested if m not in models_by_id]:
+                del requested[model_id]
+                failed_renames.append({
+                    "model_id": model_id,
+                    "error": "模型不存在"
+                })
+            
+            # 同一provider下已占用这些名称的模型数（含本批次中的模型）
+            names = list(set(requested.values()))
+            holders: Dict[Tuple[str, str], int] = {}
+            for chunk in _chunked(names, BULK_BATCH_SIZE):
+                conflict_stmt = (
+                    select(Model.provider_id, Model.display_name, func.count(Model.id))
+                    .where(Model.display_name.in_(chunk))
+                    .group_by(Model.provider_id, Model.display_name)
+                )
+                conflict_result = await self.db.execute(conflict_stmt)
+                for provider_id, display_name, count in conflict_result.all():
+                    holders[(provider_id, display_name)] = count
+            
+            # 本批次会改名的模型让出当前名称，但只有它自己的重命名被接受时才让出；
+            # 拒绝一个重命名可能使其他依赖该名称的重命名也被拒绝，因此反复检查直到不再有新的拒绝
+            rejected: Set[str] = set()
+            while True:
+                leaving: Dict[Tuple[str, str], int] = defaultdict(int)
+                for model_id, new_name in requested.items():
+                    model = models_by_id[model_id]
+                    if model_id not in rejected and model.display_name and model.display_name != new_name:
+                        leaving[(model.provider_id, model.display_name)] += 1
                 
-                if not model_id or not new_name:
+                # 批次内部的名称冲突：同一provider下先出现的请求获得该名称
+                claimed = set()
+                newly_rejected = set()
+                for model_id, new_name in requested.items():
+                    if model_id in rejected:
+                        continue
+                    model = models_by_id[model_id]
+                    key = (model.provider_id, new_name)
+                    if model.display_name != new_name and (
+                        key in claimed or holders.get(key, 0) - leaving[key] > 0
+                    ):
+                        newly_rejected.add(model_id)
+                        continue
+                    claimed.add(key)
+                if not newly_rejected:
+                    break
+                rejected |= newly_rejected
+            
+            updates = []
+            accepted = []
+            now = datetime.utcnow()
+            for model_id, new_name in requested.items():
+                if model_id in rejected:
+                    logger.warning(f"显示名称已存在: {new_name}")
                     failed_renames.append({
                         "model_id": model_id,
-                        "error": "缺少必要参数"
+                        "error": f"显示名称 '{new_name}' 已被使用"
                     })
                     continue
-                
-                model = await self.rename_model(model_id, new_name)
-                if model:
-                    updated_models.append(model)
-                else:
-                    failed_renames.append({
-                        "model_id": model_id,
-                        "error": "模型不存在"
-                    })
-                    
-            except Exception as e:
-                failed_renames.append({
-                    "model_id": rename.get('model_id'),
-                    "error": str(e)
-                })
-                logger.error(f"批量重命名失败: {rename.get('model_id')} - {e}")
+                updates.append({"id": model_id, "display_name": new_name, "updated_at": now})
+                accepted.append(models_by_id[model_id])
+            
+            if updates:
+                # 按主键批量更新
+                changed = {model.provider_id for model in accepted}
+                stmt = update(Model).execution_options(**{CHANGED_PROVIDERS_OPTION: changed})
+                await self.db.execute(stmt, updates)
+            await self.db.commit()
+            
+            # 同步会话中已加载对象的属性（不产生新的UPDATE）
+            for model, values in zip(accepted, updates):
+                set_committed_value(model, "display_name", values["display_name"])
+                set_committed_value(model, "updated_at", values["updated_at"])
+        
+        except Exception as e:
+            await self.db.rollback()
+            logger.error(f"批量重命名失败: {e}")
+            raise
         
-        logger.info(f"批量重命名完成: 成功 {len(updated_models)}, 失败 {len(failed_renames)}")
-        return updated_models, failed_renames
+        logger.info(f"批量重命名完成: 成功 {len(accepted)}, 失败 {len(failed_renames)}")
+        return accepted, failed_renames
     
     async def batch_delete_models(self, model_ids: List[str]) -> Tuple[int, List[Dict]]:
         """
-        批量删除模型
+        批量删除模型（软删除）
+        
+        一次查询确认模型存在，再以 UPDATE ... WHERE id IN (...) 批量禁用，
+        所有更新在同一事务中提交。
         
         Args:
             model_ids: 模型ID列表
-            
+        
         Returns:
             (成功删除的数量, 失败的记录列表)
         """
-        deleted_count = 0
         failed_deletes = []
+        unique_ids = list(dict.fromkeys(model_id for model_id in model_ids if model_id))
         
-        for model_id in model_ids:
-            try:
-                success = await self.delete_model(model_id)
-                if success:
-                    deleted_count += 1
-                else:
+        try:
+            existing = {}
+            for chunk in _chunked(unique_ids, BULK_BATCH_SIZE):
+                result = await self.db.execute(
+                    select(Model.id, Model.provider_id).where(Model.id.in_(chunk))
+                )
+                existing.update(result.tuples().all())
+            
+            for model_id in model_ids:
+                if model_id not in existing:
                     failed_deletes.append({
                         "model_id": model_id,
                         "error": "模型不存在"
                     })
-                    
-            except Exception as e:
-                failed_deletes.append({
-                    "model_id": model_id,
-                    "error": str(e)
-                })
-                logger.error(f"批量删除失败: {model_id} - {e}")
+            
+            to_delete = [model_id for model_id in unique_ids if model_id in existing]
+            now = datetime.utcnow()
+            for chunk in _chunked(to_delete, BULK_BATCH_SIZE):
+                stmt = (
+                    update(Model)
+                    .where(Model.id.in_(chunk))
+                    .values(enabled=False, updated_at=now)
+                    .execution_options(**{
+                        CHANGED_PROVIDERS_OPTION: {existing[model_id] for model_id in chunk}
+                    })
+                )
+                await self.db.execute(stmt)
+            await self.db.commit()
+        
+        except Exception as e:
+            await self.db.rollback()
+            logger.error(f"批量删除失败: {e}")
+            raise
         
+        deleted_count = len(to_delete)
         logger.info(f"批量删除完成: 成功 {deleted_count}, 失败 {len(failed_deletes)}")
-        return deleted_count, failed_deletes
\ No newline at end of file
+        return deleted_count, failed_deletes
+
+
+def _chunked(items: List, size: int):
+    """按固定大小切分列表"""
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
@@ -0,0 +1,141 @@
+"""
+模型同步服务
+从API源获取模型列表并写入数据库；模型目录自上次获取后未变化的API源跳过数据库读写
+"""
+import asyncio
+import logging
+from typing import AsyncIterator, Callable, Dict, List, Optional
+
+from app.services.api_aggregator import APIAggregatorService
+from app.services.model_manager import ModelManagerService
+
+logger = logging.getLogger(__name__)
+
+
+class ModelSyncService:
+    """模型同步服务"""
+    
+    def __init__(
+        self,
+        session_factory: Callable,
+        aggregator: Optional[APIAggregatorService] = None
+    ):
+        """
+        初始化模型同步服务
+        
+        Args:
+            session_factory: 数据库会话工厂，每个API源使用独立的会话写入
+            aggregator: API聚合服务，默认使用共享连接池和目录缓存
+        """
+        self.session_factory = session_factory
+        self.aggregator = aggregator or APIAggregatorService()
+        # 流式模式下各API源并发下载，写入事务逐个执行（SQLite只允许一个写事务）
+        self._write_lock = asyncio.Lock()
+    
+    async def sync_sources(self, api_sources: List[Dict], stream: bool = False) -> Dict:
+        """
+        获取并写入多个API源的模型
+        
+        Args:
+            api_sources: API源列表，每个元素包含 {id, base_url, api_key}
+            stream: 是否边下载边写入，不在内存中构建模型列表，适用于模型目录很大的API源
+        
+        Returns:
+            {
+                "results": {
+                    "api_source_id": {
+                        "success": bool,
+                        "error": str,
+                        "model_count": int,
+                        "unchanged": bool,  # 未变化，未写入数据库
+                        "changes": {"created", "updated", "unchanged"} 或 None
+                    }
+                },
+                "summary": {"total", "success", "failed", "skipped"}
+            }
+        """
+        if stream:
+            fetched = await self.aggregator.batch_fetch_models(api_sources, stream=True, consumer=self._write_stream)
+        else:
+            fetched = await self.aggregator.batch_fetch_models(api_sources)
+        
+        results = {}
+        for source in api_sources:
+            source_id = source.get('id')
+            if source_id not in fetched["results"]:
+                continue
+            result = fetched["results"][source_id]
+            if stream:
+                item = {
+                    "success": result["success"],
+                    "error": result["error"],
+                    "model_count": result["model_count"],
+                    "unchanged": result["unchanged"],
+                    "changes": result["result"]
+                }
+            else:
+                item = await self._write_source(source_id, result)
+            if not item["success"] and self.aggregator.catalog_cache:
+                # 清除目录缓存，下次同步不会因上游未变化而跳过写入
+                self.aggregator.catalog_cache.invalidate(source.get('base_url'), source.get('api_key'))
+            results[source_id] = item
+        
+        success_count = sum(1 for r in results.values() if r["success"])
+        summary = {
+            "total": len(api_sources),
+            "success": success_count,
+            "failed": len(results) - success_count,
+            "skipped": sum(1 for r in results.values() if r["unchanged"])
+        }
+        logger.info(
+            f"模型同步完成: 总计 {summary['total']}, 成功 {summary['success']}, "
+            f"失败 {summary['failed']}, 未变化 {summary['skipped']}"
+        )
+        return {"results": results, "summary": summary}
+    
+    async def _write_source(self, source_id: str, result: Dict) -> Dict:
+        """
+        写入单个API源的获取结果
+        
+        获取失败或模型目录未变化时不打开数据库会话
+        """
+        item = {
+            "success": result["success"],
+            "error": result["error"],
+            "model_count": result["model_count"],
+            "unchanged": result["unchanged"],
+            "changes": None
+        }
+        if not result["success"] or result["unchanged"]:
+            return item
+        
+        try:
+            async with self.session_factory() as db:
+                item["changes"] = await ModelManagerService(db).bulk_upsert_models(source_id, result["models"])
+        except Exception as e:
+            logger.error(f"API源 {source_id} 写入模型失败: {e}")
+            item["success"] = False
+            item["error"] = f"写入模型失败: {str(e)}"
+        return item
+    
+    async def _write_stream(self, source_id: str, models: AsyncIterator[Dict]) -> Optional[Dict]:
+        """
+        边接收边写入单个API源的模型
+        
+        上游返回304时迭代器为空，不打开数据库会话
+        
+        Returns:
+            写入统计，没有任何条目时为None
+        """
+        first = await anext(models, None)
+        if first is None:
+            return None
+        
+        async def entries() -> AsyncIterator[Dict]:
+            yield first
+            async for model in models:
+                yield model
+        
+        async with self._write_lock:
+            async with self.session_factory() as db:
+                return await ModelManagerService(db).bulk_upsert_model_stream(source_id, entries())
@@ -0,0 +1,135 @@
+"""
+标准化规则热加载
+监视配置文件的 normalization 段，变化时原子替换规则集并重新标准化受影响的模型
+"""
+import asyncio
+import logging
+import os
+from typing import Callable, Dict, Optional
+
+from app.services.model_manager import ModelManagerService
+from app.utils.normalization import (
+    ModelNameNormalizer,
+    SuffixTrie,
+    affected_suffixes,
+    get_normalizer,
+    load_normalizer_from_config,
+    set_normalizer,
+)
+
+logger = logging.getLogger(__name__)
+
+
+class NormalizationReloader:
+    """
+    标准化规则热加载器
+    
+    按固定间隔检查配置文件的修改时间，发生变化时：
+    1. 加载并编译新的规则集（失败时保留当前规则）
+    2. 原子替换当前生效的标准化器
+    3. 用变更规则的后缀字典树筛选可能受影响的模型，只更新结果变化的行
+    
+    重新标准化失败时（如数据库被锁定）记为待完成，之后每次检查都会重试，
+    直到数据库中的标准化名称与当前规则一致
+    """
+    
+    def __init__(
+        self,
+        config_path: str,
+        session_factory: Callable,
+        interval: float = 10.0
+    ):
+        """
+        初始化热加载器
+        
+        Args:
+            config_path: 配置文件路径
+            session_factory: 数据库会话工厂
+            interval: 检查间隔（秒）
+        """
+        self.config_path = config_path
+        self.session_factory = session_factory
+        self.interval = interval
+        self._mtime: Optional[float] = None
+        self._pending = False
+        self._pending_candidates: Optional[SuffixTrie] = None
+        self._task: Optional[asyncio.Task] = None
+        self.reloads = 0
+        self.last_result: Optional[Dict] = None
+    
+    def _current_mtime(self) -> Optional[float]:
+        try:
+            return os.stat(self.config_path).st_mtime
+        except FileNotFoundError:
+            return None
+    
+    async def check_once(self) -> bool:
+        """
+        检查配置文件并在变化时重新加载，并完成尚未完成的重新标准化
+        
+        Returns:
+            是否加载了新的规则集
+        """
+        reloaded = self._reload()
+        if self._pending:
+            async with self.session_factory() as db:
+                self.last_result = await ModelManagerService(db).renormalize_models(
+                    get_normalizer(),
+                    self._pending_candidates
+                )
+            self._pending = False
+            self._pending_candidates = None
+        return reloaded
+    
+    def _reload(self) -> bool:
+        """配置文件变化时替换规则集，并将受影响的模型记为待重新标准化"""
+        mtime = self._current_mtime()
+        if mtime == self._mtime:
+            return False
+        self._mtime = mtime
+        
+        try:
+            new = load_normalizer_from_config(self.config_path) if mtime is not None else None
+        except Exception as e:
+            logger.error(f"加载标准化规则失败，保留当前规则: {e}")
+            return False
+        if new is None:
+            new = ModelNameNormalizer()
+        
+        old = get_normalizer()
+        if old.rules == new.rules and old.lowercase == new.lowercase:
+            return False
+        
+        # 上一次的重新标准化尚未完成时，无法只按本次变更筛选，改为检查全部模型
+        self._pending_candidates = None if self._pending else affected_suffixes(old, new)
+        self._pending = True
+        set_normalizer(new)
+        self.reloads += 1
+        logger.info(f"标准化规则已更新: {len(new.rules)} 条规则")
+        return True
+    
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self.check_once()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"标准化规则热加载失败: {e}")
+            await asyncio.sleep(self.interval)
+    
+    def start(self) -> None:
+        """启动后台检查任务"""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+            logger.info(f"标准化规则热加载已启动: {self.config_path}")
+    
+    async def stop(self) -> None:
+        """停止后台检查任务"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
@@ -0,0 +1,335 @@
+"""
+重试策略
+提供带完全抖动的指数退避、Retry-After解析、整体截止时间和重试预算
+"""
+import asyncio
+import logging
+import random
+import time
+from collections import OrderedDict, defaultdict
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Awaitable, Callable, Dict, Iterable, Optional
+
+import httpx
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+# 默认会重试的HTTP状态码
+RETRYABLE_STATUS_CODES = frozenset({429, 500, 502, 503, 504})
+
+
+def parse_retry_after(value: Optional[str], now: Optional[datetime] = None) -> Optional[float]:
+    """
+    解析Retry-After响应头
+    
+    Args:
+        value: 响应头的值，可以是秒数或HTTP日期
+        now: 当前时间（用于测试）
+    
+    Returns:
+        需要等待的秒数，无法解析时返回None
+    """
+    if not value:
+        return None
+    value = value.strip()
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=timezone.utc)
+    now = now or datetime.now(timezone.utc)
+    return max(0.0, (retry_at - now).total_seconds())
+
+
+class RetryBudget:
+    """
+    重试预算（令牌桶）
+    
+    每次重试消耗一个令牌，令牌按固定速率恢复。
+    上游故障时预算耗尽，避免大量源同时重试放大故障。
+    """
+    
+    def __init__(self, capacity: float, refill_per_second: float):
+        """
+        初始化重试预算
+        
+        Args:
+            capacity: 令牌桶容量
+            refill_per_second: 每秒恢复的令牌数
+        """
+        self.capacity = capacity
+        self.refill_per_second = refill_per_second
+        self.tokens = capacity
+        self._updated = time.monotonic()
+    
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.refill_per_second)
+        self._updated = now
+    
+    def available(self) -> bool:
+        """是否还有可用令牌"""
+        self._refill()
+        return self.tokens >= 1.0
+    
+    def withdraw(self) -> bool:
+        """尝试消耗一个令牌"""
+        self._refill()
+        if self.tokens < 1.0:
+            return False
+        self.tokens -= 1.0
+        return True
+
+
+class SourceBudgets:
+    """
+    按API源的重试预算
+    
+    进程内共享，同一个源在各个服务实例、各次调用之间使用同一个令牌桶；
+    最多保留 max_sources 个源，超出时淘汰最久未使用的源
+    """
+    
+    def __init__(self, capacity: float, refill_per_second: float, max_sources: int = 10000):
+        """
+        初始化单源重试预算
+        
+        Args:
+            capacity: 每个源的令牌桶容量
+            refill_per_second: 每个源每秒恢复的令牌数
+            max_sources: 最多保留的源数量
+        """
+        self.capacity = capacity
+        self.refill_per_second = refill_per_second
+        self.max_sources = max_sources
+        self._budgets: "OrderedDict[str, RetryBudget]" = OrderedDict()
+    
+    def __len__(self) -> int:
+        return len(self._budgets)
+    
+    def get(self, key: str) -> RetryBudget:
+        """获取源的预算，不存在时创建"""
+        budget = self._budgets.get(key)
+        if budget is None:
+            budget = RetryBudget(self.capacity, self.refill_per_second)
+            self._budgets[key] = budget
+            while len(self._budgets) > self.max_sources:
+                self._budgets.popitem(last=False)
+        else:
+            self._budgets.move_to_end(key)
+        return budget
+
+
+class RetryMetrics:
+    """重试统计"""
+    
+    def __init__(self):
+        self.calls = 0
+        self.attempts = 0
+        self.retries = 0
+        self.retries_by_reason: Dict[str, int] = defaultdict(int)
+        self.sleep_seconds = 0.0
+        self.budget_exhausted = 0
+        self.deadline_exceeded = 0
+    
+    def get_stats(self) -> Dict:
+        return {
+            "calls": self.calls,
+            "attempts": self.attempts,
+            "retries": self.retries,
+            "retries_by_reason": dict(self.retries_by_reason),
+            "sleep_seconds": round(self.sleep_seconds, 3),
+            "budget_exhausted": self.budget_exhausted,
+            "deadline_exceeded": self.deadline_exceeded
+        }
+
+
+class RetryPolicy:
+    """
+    重试策略
+    
+    - 退避时间采用完全抖动：uniform(0, min(max_delay, base_delay * 2^attempt))
+    - 响应带有Retry-After时，等待时间不少于其要求（不超过max_delay）
+    - 整个调用受deadline约束，剩余时间不足时不再重试
+    - 每次重试需要同时从单源预算和进程级预算中取得令牌
+    """
+    
+    def __init__(
+        self,
+        max_retries: int = 3,
+        base_delay: float = 1.0,
+        max_delay: float = 30.0,
+        deadline: Optional[float] = 60.0,
+        retry_statuses: Iterable[int] = RETRYABLE_STATUS_CODES,
+        source_budgets: Optional[SourceBudgets] = None,
+        global_budget: Optional[RetryBudget] = None,
+        metrics: Optional[RetryMetrics] = None
+    ):
+        """
+        初始化重试策略
+        
+        Args:
+            max_retries: 单次调用的最大重试次数
+            base_delay: 退避基础时间（秒）
+            max_delay: 单次等待上限（秒）
+            deadline: 单次调用（含所有重试）的截止时间（秒），None表示不限制
+            retry_statuses: 需要重试的HTTP状态码
+            source_budgets: 单源重试预算，默认使用共享预算
+            global_budget: 进程级重试预算，默认使用共享预算
+            metrics: 统计对象，默认使用共享统计
+        """
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.deadline = deadline
+        self.retry_statuses = frozenset(retry_statuses)
+        self.source_budgets = source_budgets if source_budgets is not None else default_source_budgets
+        self.global_budget = global_budget if global_budget is not None else default_retry_budget
+        self.metrics = metrics if metrics is not None else default_retry_metrics
+    
+    def backoff(self, attempt: int, retry_after: Optional[float] = None) -> float:
+        """
+        计算第attempt次重试前的等待时间
+        
+        Args:
+            attempt: 已重试次数（从0开始）
+            retry_after: 上游要求的等待时间
+        
+        Returns:
+            等待秒数
+        """
+        delay = random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+        if retry_after is not None:
+            delay = max(delay, min(retry_after, self.max_delay))
+        return delay
+    
+    def _take_budget(self, key: str) -> bool:
+        source_budget = self.source_budgets.get(key)
+        if not source_budget.available() or not self.global_budget.available():
+            return False
+        return source_budget.withdraw() and self.global_budget.withdraw()
+    
+    async def call(
+        self,
+        attempt_fn: Callable[[float], Awaitable[httpx.Response]],
+        key: str,
+        timeout: float = 30.0,
+        start_attempt: int = 0
+    ) -> httpx.Response:
+        """
+        按策略执行请求
+        
+        Args:
+            attempt_fn: 执行一次请求的协程函数，参数为本次请求的超时时间
+            key: 重试预算的归属（通常是API源）
+            timeout: 单次请求超时（秒），会被剩余的deadline截短
+            start_attempt: 起始重试次数
+        
+        Returns:
+            最后一次请求的响应（可能是可重试状态码的响应）
+        
+        Raises:
+            最后一次请求抛出的异常（超时、连接错误等）
+        """
+        self.metrics.calls += 1
+        started = time.monotonic()
+        attempt = start_attempt
+        
+        while True:
+            remaining = None
+            if self.deadline is not None:
+                remaining = self.deadline - (time.monotonic() - started)
+            request_timeout = timeout if remaining is None else max(0.001, min(timeout, remaining))
+            
+            self.metrics.attempts += 1
+            try:
+                response = await attempt_fn(request_timeout)
+            except (httpx.TimeoutException, httpx.TransportError) as e:
+                reason = "timeout" if isinstance(e, httpx.TimeoutException) else "transport"
+                delay = self._retry_delay(attempt, key, started, reason, None)
+                if delay is None:
+                    raise
+            else:
+                if response.status_code not in self.retry_statuses:
+                    return response
+                reason = str(response.status_code)
+                retry_after = parse_retry_after(response.headers.get("Retry-After"))
+                delay = self._retry_delay(attempt, key, started, reason, retry_after)
+                if delay is None:
+                    return response
+            
+            logger.warning(f"请求失败({reason})，{delay:.2f} 秒后进行第 {attempt + 1} 次重试")
+            self.metrics.retries += 1
+            self.metrics.retries_by_reason[reason] += 1
+            self.metrics.sleep_seconds += delay
+            await asyncio.sleep(delay)
+            attempt += 1
+    
+    def _retry_delay(
+        self,
+        attempt: int,
+        key: str,
+        started: float,
+        reason: str,
+        retry_after: Optional[float]
+    ) -> Optional[float]:
+        """判断是否继续重试，返回等待时间；不再重试时返回None"""
+        if attempt >= self.max_retries:
+            return None
+        
+        delay = self.backoff(attempt, retry_after)
+        if self.deadline is not None and time.monotonic() - started + delay >= self.deadline:
+            self.metrics.deadline_exceeded += 1
+            logger.warning(f"请求失败({reason})，剩余时间不足，放弃重试")
+            return None
+        
+        if not self._take_budget(key):
+            self.metrics.budget_exhausted += 1
+            logger.warning(f"请求失败({reason})，重试预算已耗尽，放弃重试")
+            return None
+        
+        return delay
+    
+    def get_stats(self) -> Dict:
+        """获取重试统计"""
+        return self.metrics.get_stats()
+
+
+def default_retry_policy(**overrides) -> RetryPolicy:
+    """
+    按Settings创建重试策略
+    
+    Args:
+        overrides: 覆盖默认参数
+    
+    Returns:
+        重试策略实例
+    """
+    params = {
+        "max_retries": settings.RETRY_MAX_ATTEMPTS,
+        "base_delay": settings.RETRY_BASE_DELAY,
+        "max_delay": settings.RETRY_MAX_DELAY,
+        "deadline": settings.RETRY_DEADLINE
+    }
+    params.update(overrides)
+    return RetryPolicy(**params)
+
+
+# 进程级共享的重试预算和统计
+default_retry_budget = RetryBudget(
+    capacity=settings.RETRY_GLOBAL_BUDGET,
+    refill_per_second=settings.RETRY_GLOBAL_BUDGET_REFILL
+)
+default_source_budgets = SourceBudgets(
+    capacity=settings.RETRY_SOURCE_BUDGET,
+    refill_per_second=settings.RETRY_SOURCE_BUDGET_REFILL,
+    max_sources=settings.RETRY_SOURCE_BUDGET_MAX_SOURCES
+)
+default_retry_metrics = RetryMetrics()
@@ -0,0 +1,249 @@
+"""
+HTTP传输管理
+进程级共享的HTTP连接池，供API聚合、健康监控和配置应用复用连接
+"""
+import importlib.util
+import logging
+from typing import Dict, Optional, Tuple
+
+import httpx
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+def http2_available() -> bool:
+    """检查是否安装了HTTP/2支持（h2）"""
+    return importlib.util.find_spec("h2") is not None
+
+
+class _HostPool:
+    """单个主机的连接池及其使用计数"""
+    
+    __slots__ = ("transport", "in_flight", "requests")
+    
+    def __init__(self, transport: httpx.AsyncHTTPTransport):
+        self.transport = transport
+        self.in_flight = 0
+        self.requests = 0
+
+
+class _PerHostResponseStream(httpx.AsyncByteStream):
+    """包装响应流，在响应关闭时释放主机的在途计数"""
+    
+    def __init__(self, stream: httpx.AsyncByteStream, pool: _HostPool):
+        self._stream = stream
+        self._pool = pool
+        self._released = False
+    
+    async def __aiter__(self):
+        async for chunk in self._stream:
+            yield chunk
+    
+    async def aclose(self) -> None:
+        try:
+            await self._stream.aclose()
+        finally:
+            if not self._released:
+                self._released = True
+                self._pool.in_flight -= 1
+
+
+class PerHostTransport(httpx.AsyncBaseTransport):
+    """
+    按主机路由的传输层
+    
+    每个 scheme://host:port 使用独立的连接池，从而可以限制单个主机的连接数，
+    同一主机的请求在HTTP/2下复用同一连接。
+    """
+    
+    def __init__(
+        self,
+        http2: bool,
+        limits: httpx.Limits
+    ):
+        self.http2 = http2
+        self.limits = limits
+        self._pools: Dict[Tuple[bytes, bytes, Optional[int]], _HostPool] = {}
+    
+    def _get_pool(self, url: httpx.URL) -> _HostPool:
+        key = (url.raw_scheme, url.raw_host, url.port)
+        pool = self._pools.get(key)
+        if pool is None:
+            pool = _HostPool(httpx.AsyncHTTPTransport(http2=self.http2, limits=self.limits))
+            self._pools[key] = pool
+            logger.debug(f"创建主机连接池: {url.host}")
+        return pool
+    
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        pool = self._get_pool(request.url)
+        pool.in_flight += 1
+        pool.requests += 1
+        try:
+            response = await pool.transport.handle_async_request(request)
+        except BaseException:
+            pool.in_flight -= 1
+            raise
+        response.stream = _PerHostResponseStream(response.stream, pool)
+        return response
+    
+    async def aclose(self) -> None:
+        pools = list(self._pools.values())
+        self._pools.clear()
+        for pool in pools:
+            await pool.transport.aclose()
+    
+    def get_stats(self) -> Dict:
+        """
+        获取连接池使用情况
+        
+        Returns:
+            每个主机的在途请求数、请求总数，以及能读取到时的连接数和空闲连接数
+        """
+        hosts = {}
+        for (scheme, host, port), pool in self._pools.items():
+            name = f"{scheme.decode()}://{host.decode()}" + (f":{port}" if port else "")
+            counts = _connection_counts(pool.transport)
+            if counts is None:
+                # 连接池不提供连接明细时按在途请求估算占用（HTTP/2下可能高估）
+                connections = idle = None
+                active = pool.in_flight
+            else:
+                connections, idle = counts
+                active = connections - idle
+            hosts[name] = {
+                "connections": connections,
+                "idle_connections": idle,
+                "active_connections": active,
+                "in_flight": pool.in_flight,
+                "requests": pool.requests,
+                "utilization": round(
+                    min(active / self.limits.max_connections, 1.0), 4
+                ) if self.limits.max_connections else 0.0
+            }
+        return hosts
+
+
+def _connection_counts(transport: httpx.AsyncHTTPTransport) -> Optional[Tuple[int, int]]:
+    """
+    读取底层连接池的连接数和空闲连接数
+    
+    httpx 没有公开连接明细，这里按 httpcore 连接池的结构读取；
+    结构不符（httpx/httpcore 版本变化）时返回None，由调用方回退到自己的计数
+    
+    Returns:
+        (连接数, 空闲连接数)，无法读取时返回None
+    """
+    connections = getattr(getattr(transport, "_pool", None), "connections", None)
+    if connections is None:
+        return None
+    try:
+        connections = list(connections)
+        idle = sum(1 for conn in connections if conn.is_idle())
+    except (AttributeError, TypeError):
+        return None
+    return len(connections), idle
+
+
+class TransportManager:
+    """
+    HTTP传输管理器
+    
+    惰性创建一个共享的 httpx.AsyncClient，所有服务通过 get_client() 获取，
+    应用关闭时由 lifespan 调用 aclose() 统一释放连接。
+    """
+    
+    def __init__(
+        self,
+        http2: bool = True,
+        max_connections_per_host: int = 10,
+        max_keepalive_per_host: int = 5,
+        keepalive_expiry: float = 30.0,
+        connect_timeout: float = 10.0,
+        timeout: float = 30.0
+    ):
+        """
+        初始化传输管理器
+        
+        Args:
+            http2: 是否启用HTTP/2（未安装h2时自动回退）
+            max_connections_per_host: 单个主机的最大连接数
+            max_keepalive_per_host: 单个主机保持的最大空闲连接数
+            keepalive_expiry: 空闲连接保持时间（秒）
+            connect_timeout: 建立连接超时（秒）
+            timeout: 默认请求超时（秒）
+        """
+        if http2 and not http2_available():
+            logger.warning("未安装h2，HTTP连接池回退到HTTP/1.1")
+            http2 = False
+        
+        self.http2 = http2
+        self.limits = httpx.Limits(
+            max_connections=max_connections_per_host,
+            max_keepalive_connections=max_keepalive_per_host,
+            keepalive_expiry=keepalive_expiry
+        )
+        self.timeout = httpx.Timeout(timeout, connect=connect_timeout)
+        self._transport: Optional[PerHostTransport] = None
+        self._client: Optional[httpx.AsyncClient] = None
+    
+    def get_client(self) -> httpx.AsyncClient:
+        """
+        获取共享的HTTP客户端
+        
+        Returns:
+            共享的 httpx.AsyncClient，调用方不应关闭它
+        """
+        if self._client is None or self._client.is_closed:
+            self._transport = PerHostTransport(http2=self.http2, limits=self.limits)
+            self._client = httpx.AsyncClient(transport=self._transport, timeout=self.timeout)
+            logger.info(f"创建共享HTTP客户端 (HTTP/2: {self.http2})")
+        return self._client
+    
+    def owns(self, client: httpx.AsyncClient) -> bool:
+        """判断客户端是否为共享客户端"""
+        return client is self._client
+    
+    def get_stats(self) -> Dict:
+        """
+        获取连接池使用情况
+        
+        Returns:
+            总体统计及按主机的明细
+        """
+        hosts = self._transport.get_stats() if self._transport and not self._client.is_closed else {}
+        known = [h for h in hosts.values() if h["connections"] is not None]
+        connections = sum(h["connections"] for h in known)
+        active = sum(h["active_connections"] for h in hosts.values())
+        return {
+            "http2": self.http2,
+            "max_connections_per_host": self.limits.max_connections,
+            "max_keepalive_per_host": self.limits.max_keepalive_connections,
+            "keepalive_expiry": self.limits.keepalive_expiry,
+            "hosts": len(hosts),
+            "connections": connections if len(known) == len(hosts) else None,
+            "active_connections": active,
+            "idle_connections": sum(h["idle_connections"] for h in known) if len(known) == len(hosts) else None,
+            "in_flight": sum(h["in_flight"] for h in hosts.values()),
+            "per_host": hosts
+        }
+    
+    async def aclose(self) -> None:
+        """关闭共享客户端及所有连接"""
+        if self._client is not None and not self._client.is_closed:
+            await self._client.aclose()
+            logger.info("共享HTTP客户端已关闭")
+        self._client = None
+        self._transport = None
+
+
+# 进程级共享的传输管理器
+transport_manager = TransportManager(
+    http2=settings.HTTP2_ENABLED,
+    max_connections_per_host=settings.HTTP_MAX_CONNECTIONS_PER_HOST,
+    max_keepalive_per_host=settings.HTTP_MAX_KEEPALIVE_PER_HOST,
+    keepalive_expiry=settings.HTTP_KEEPALIVE_EXPIRY,
+    connect_timeout=settings.HTTP_CONNECT_TIMEOUT,
+    timeout=settings.REQUEST_TIMEOUT
+)
@@ -0,0 +1,154 @@
+"""
+配置序列化工具
+优先使用LibYAML（CSafeDumper）输出YAML，未安装时回退到纯Python实现；
+大的列表段可以分批流式输出，也支持输出JSON
+"""
+import json
+import logging
+import re
+from typing import Dict, Iterable, Iterator, List
+
+import yaml
+
+logger = logging.getLogger(__name__)
+
+try:
+    from yaml import CSafeDumper as _BaseDumper
+    LIBYAML_AVAILABLE = True
+except ImportError:
+    from yaml import SafeDumper as _BaseDumper
+    LIBYAML_AVAILABLE = False
+
+
+class ConfigDumper(_BaseDumper):
+    """
+    配置文件使用的YAML Dumper
+    
+    不生成锚点和别名：分批输出时别名无法跨批次引用，
+    关闭后整体输出与分批输出的结果逐字节一致
+    """
+    
+    def ignore_aliases(self, data) -> bool:
+        return True
+
+
+# 与原 yaml.dump 调用保持一致的输出格式
+YAML_DUMP_OPTIONS = {
+    "allow_unicode": True,
+    "default_flow_style": False,
+    "sort_keys": False
+}
+
+# 支持的输出格式及对应的文件扩展名
+FORMAT_EXTENSIONS = {
+    "yaml": ".yaml",
+    "json": ".json"
+}
+
+# 默认流式输出的顶层段
+STREAM_SECTIONS = ("providers", "groups", "aggregate_groups")
+
+# 可以直接写成 "key:" 的顶层键
+_PLAIN_KEY = re.compile(r"^[A-Za-z_][A-Za-z0-9_-]*$")
+
+
+def render_yaml(config: Dict) -> str:
+    """将配置序列化为YAML字符串"""
+    return yaml.dump(config, Dumper=ConfigDumper, **YAML_DUMP_OPTIONS)
+
+
+class ConfigSerializer:
+    """
+    配置序列化器
+    
+    iter_chunks() 按顶层键逐段产出字节块：providers、groups 等大列表每
+    batch_size 个元素序列化一次，不需要先构建整个文档的字符串。
+    """
+    
+    def __init__(
+        self,
+        output_format: str = "yaml",
+        stream_sections: Iterable[str] = STREAM_SECTIONS,
+        batch_size: int = 1000
+    ):
+        """
+        初始化配置序列化器
+        
+        Args:
+            output_format: 输出格式（yaml 或 json）
+            stream_sections: 分批输出的顶层列表段
+            batch_size: 每次序列化的列表元素数量
+        """
+        if output_format not in FORMAT_EXTENSIONS:
+            raise ValueError(f"不支持的配置输出格式: {output_format}")
+        self.output_format = output_format
+        self.stream_sections = frozenset(stream_sections)
+        self.batch_size = batch_size
+    
+    @property
+    def extension(self) -> str:
+        """输出文件的扩展名"""
+        return FORMAT_EXTENSIONS[self.output_format]
+    
+    def dumps(self, config: Dict) -> bytes:
+        """序列化整个配置"""
+        return b"".join(self.iter_chunks(config))
+    
+    def iter_chunks(self, config: Dict) -> Iterator[bytes]:
+        """
+        逐块序列化配置
+        
+        Args:
+            config: 配置字典
+        
+        Yields:
+            UTF-8编码的字节块，按顺序拼接即为完整文件内容
+        """
+        if self.output_format == "json":
+            yield from self._iter_json(config)
+        else:
+            yield from self._iter_yaml(config)
+    
+    def _iter_yaml(self, config: Dict) -> Iterator[bytes]:
+        if not config:
+            yield render_yaml(config).encode("utf-8")
+            return
+        
+        for key, value in config.items():
+            streamable = (
+                key in self.stream_sections
+                and isinstance(value, list)
+                and value
+                and isinstance(key, str)
+                and _PLAIN_KEY.match(key)
+            )
+            if not streamable:
+                yield render_yaml({key: value}).encode("utf-8")
+                continue
+            
+            # 顶层映射中的列表不缩进，逐批输出的 "- ..." 可以直接拼接
+            yield f"{key}:\n".encode("utf-8")
+            for batch in self._batches(value):
+                yield render_yaml(batch).encode("utf-8")
+    
+    def _iter_json(self, config: Dict) -> Iterator[bytes]:
+        encoder = json.JSONEncoder(ensure_ascii=False, indent=2)
+        buffer: List[str] = []
+        size = 0
+        for chunk in encoder.iterencode(config):
+            buffer.append(chunk)
+            size += len(chunk)
+            if size >= 65536:
+                yield "".join(buffer).encode("utf-8")
+                buffer = []
+                size = 0
+        buffer.append("\n")
+        yield "".join(buffer).encode("utf-8")
+    
+    def _batches(self, items: List) -> Iterator[List]:
+        for start in range(0, len(items), self.batch_size):
+            yield items[start:start + self.batch_size]
+
+
+if not LIBYAML_AVAILABLE:
+    logger.info("未安装LibYAML，配置序列化使用纯Python实现")
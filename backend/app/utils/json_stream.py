@@ -0,0 +1,168 @@
+"""
+增量JSON解析工具
+用于流式解析大型 /v1/models 响应，逐个产出模型条目而不构建完整文档
+"""
+import codecs
+import json
+from typing import AsyncIterator, Dict, Iterable, Optional
+
+# 模型列表在响应中可能使用的字段名
+MODEL_LIST_KEYS = ("data", "models")
+
+# 保留的模型字段
+MODEL_FIELDS = ("id", "owned_by", "created")
+
+_WHITESPACE = " \t\n\r"
+
+
+class _Buffer:
+    """文本缓冲区，按需从异步字节流中读取数据"""
+    
+    def __init__(self, chunks: AsyncIterator[bytes]):
+        self._chunks = chunks.__aiter__()
+        self._decoder = codecs.getincrementaldecoder("utf-8")()
+        self.text = ""
+        self.pos = 0
+        self.eof = False
+    
+    async def fill(self) -> bool:
+        """读取下一块数据，返回是否读到了新内容"""
+        if self.eof:
+            return False
+        try:
+            chunk = await self._chunks.__anext__()
+        except StopAsyncIteration:
+            self.text = self.text[self.pos:] + self._decoder.decode(b"", final=True)
+            self.pos = 0
+            self.eof = True
+            return False
+        # 丢弃已消费的部分，避免缓冲区无限增长
+        self.text = self.text[self.pos:] + self._decoder.decode(chunk)
+        self.pos = 0
+        return True
+    
+    async def peek(self) -> Optional[str]:
+        """跳过空白并返回下一个字符，流结束时返回None"""
+        while True:
+            while self.pos < len(self.text) and self.text[self.pos] in _WHITESPACE:
+                self.pos += 1
+            if self.pos < len(self.text):
+                return self.text[self.pos]
+            if not await self.fill():
+                return None
+    
+    async def expect(self, char: str) -> None:
+        """消费指定字符"""
+        if await self.peek() != char:
+            raise ValueError(f"JSON格式错误: 期望 '{char}'，位置 {self.pos}")
+        self.pos += 1
+    
+    async def decode_value(self, decoder: json.JSONDecoder):
+        """解析下一个完整的JSON值"""
+        while True:
+            await self.peek()
+            try:
+                value, end = decoder.raw_decode(self.text, self.pos)
+                # 值恰好位于缓冲区末尾时（如数字）可能被截断，需读取更多数据确认
+                if end < len(self.text) or self.eof:
+                    self.pos = end
+                    return value
+            except json.JSONDecodeError:
+                if self.eof:
+                    raise
+            if not await self.fill():
+                value, end = decoder.raw_decode(self.text, self.pos)
+                self.pos = end
+                return value
+
+
+def slim_model(item, fields: Iterable[str] = MODEL_FIELDS) -> Optional[Dict]:
+    """
+    只保留模型条目中需要的字段
+    
+    Args:
+        item: 原始模型条目
+        fields: 需要保留的字段
+    
+    Returns:
+        精简后的模型条目，无法识别时返回None
+    """
+    if isinstance(item, dict):
+        return {field: item[field] for field in fields if field in item}
+    if isinstance(item, str):
+        return {"id": item}
+    return None
+
+
+async def iter_model_entries(
+    chunks: AsyncIterator[bytes],
+    fields: Iterable[str] = MODEL_FIELDS
+) -> AsyncIterator[Dict]:
+    """
+    增量解析模型列表响应
+    
+    支持与 APIAggregatorService._extract_models 相同的响应格式：
+    {"data": [...]}、{"models": [...]} 以及直接返回的列表。
+    
+    Args:
+        chunks: 响应体字节流
+        fields: 每个模型需要保留的字段
+    
+    Yields:
+        精简后的模型条目
+    """
+    fields = tuple(fields)
+    decoder = json.JSONDecoder()
+    buf = _Buffer(chunks)
+    
+    first = await buf.peek()
+    if first == "[":
+        async for item in _iter_array(buf, decoder, fields):
+            yield item
+        return
+    if first != "{":
+        raise ValueError("JSON格式错误: 响应既不是对象也不是数组")
+    
+    # 遍历顶层对象的键，跳过不相关的值，找到模型列表后流式产出
+    await buf.expect("{")
+    if await buf.peek() == "}":
+        return
+    while True:
+        key = await buf.decode_value(decoder)
+        await buf.expect(":")
+        if key in MODEL_LIST_KEYS and await buf.peek() == "[":
+            async for item in _iter_array(buf, decoder, fields):
+                yield item
+            return
+        await buf.decode_value(decoder)
+        next_char = await buf.peek()
+        if next_char == ",":
+            buf.pos += 1
+            continue
+        if next_char == "}":
+            return
+        raise ValueError(f"JSON格式错误: 意外的字符 {next_char!r}")
+
+
+async def _iter_array(
+    buf: _Buffer,
+    decoder: json.JSONDecoder,
+    fields: tuple
+) -> AsyncIterator[Dict]:
+    """逐个解析数组元素"""
+    await buf.expect("[")
+    if await buf.peek() == "]":
+        buf.pos += 1
+        return
+    while True:
+        item = slim_model(await buf.decode_value(decoder), fields)
+        if item is not None:
+            yield item
+        next_char = await buf.peek()
+        if next_char == ",":
+            buf.pos += 1
+            continue
+        if next_char == "]":
+            buf.pos += 1
+            return
+        raise ValueError(f"JSON格式错误: 意外的字符 {next_char!r}")
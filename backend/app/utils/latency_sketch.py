@@ -0,0 +1,102 @@
+"""
+延迟分布草图
+按对数分桶统计响应时间，可以合并，序列化后只保存非空的桶；
+分位数的相对误差不超过 (GAMMA - 1) / (GAMMA + 1)
+"""
+import math
+import struct
+from typing import Dict, Iterable, Optional
+
+# 相邻桶边界的比值，相对误差约2.4%
+GAMMA = 1.05
+_LOG_GAMMA = math.log(GAMMA)
+
+# 序列化格式：每个非空桶为 (桶序号 uint16, 计数 uint32)，小端
+_BUCKET = struct.Struct("<HI")
+
+
+def bucket_index(ms: float) -> int:
+    """响应时间所在的桶，0ms 和 1ms 以内都落在桶0"""
+    if ms <= 1:
+        return 0
+    return int(math.ceil(math.log(ms) / _LOG_GAMMA))
+
+
+def bucket_value(index: int) -> float:
+    """桶的代表值，取使相对误差最小的点"""
+    if index == 0:
+        return 1.0
+    return 2 * GAMMA ** index / (GAMMA + 1)
+
+
+class LatencySketch:
+    """
+    延迟分布草图
+    
+    counts 为 桶序号 -> 计数；两个草图相加即为合并后两段时间的分布，
+    因此按分钟、按小时的汇总可以任意合并后再求分位数
+    """
+    
+    __slots__ = ("counts",)
+    
+    def __init__(self, counts: Optional[Dict[int, int]] = None):
+        self.counts: Dict[int, int] = counts if counts is not None else {}
+    
+    def __len__(self) -> int:
+        return sum(self.counts.values())
+    
+    def add(self, ms: float, count: int = 1) -> None:
+        """记录一个响应时间（毫秒）"""
+        index = bucket_index(ms)
+        self.counts[index] = self.counts.get(index, 0) + count
+    
+    def update(self, values: Iterable[float]) -> None:
+        """记录多个响应时间"""
+        for ms in values:
+            self.add(ms)
+    
+    def merge(self, other: "LatencySketch") -> "LatencySketch":
+        """将另一个草图合并进来"""
+        for index, count in other.counts.items():
+            self.counts[index] = self.counts.get(index, 0) + count
+        return self
+    
+    def merge_bytes(self, data: Optional[bytes]) -> "LatencySketch":
+        """将序列化的草图合并进来，不创建中间对象"""
+        if data:
+            counts = self.counts
+            for index, count in _BUCKET.iter_unpack(data):
+                counts[index] = counts.get(index, 0) + count
+        return self
+    
+    def quantile(self, q: float) -> Optional[int]:
+        """
+        估计分位数
+        
+        Args:
+            q: 0到1之间的分位点
+        
+        Returns:
+            毫秒；草图为空时为None
+        """
+        total = len(self)
+        if total == 0:
+            return None
+        rank = max(math.ceil(q * total), 1)
+        seen = 0
+        for index in sorted(self.counts):
+            seen += self.counts[index]
+            if seen >= rank:
+                return int(round(bucket_value(index)))
+        return int(round(bucket_value(max(self.counts))))
+    
+    def to_bytes(self) -> bytes:
+        """序列化，只保存非空的桶"""
+        return b"".join(_BUCKET.pack(index, count) for index, count in sorted(self.counts.items()) if count)
+    
+    @classmethod
+    def from_bytes(cls, data: Optional[bytes]) -> "LatencySketch":
+        """反序列化，空值得到空草图"""
+        if not data:
+            return cls()
+        return cls({index: count for index, count in _BUCKET.iter_unpack(data)})
@@ -2,12 +2,20 @@
 模型名称标准化工具
 """
 import re
-from typing import Dict, List, Optional
+import yaml
+from functools import lru_cache
+from typing import Dict, List, Optional, Pattern, Tuple
 from urllib.parse import urlparse
 
 
 class ModelNameNormalizer:
-    """模型名称标准化器"""
+    """
+    模型名称标准化器
+    
+    规则在初始化时编译一次：全部为后缀移除规则（以$结尾、替换为空）时，
+    合并成单个正则一次完成；否则按顺序逐条应用编译后的规则。
+    标准化结果缓存在有界LRU中。
+    """
     
     # 默认标准化规则
     DEFAULT_RULES = [
@@ -18,14 +26,57 @@ class ModelNameNormalizer:
         (r'-\d{4}$', ''),  # 移除年份后缀
     ]
     
-    def __init__(self, custom_rules: List[tuple] = None):
+    # 默认LRU缓存容量
+    DEFAULT_CACHE_SIZE = 65536
+    
+    _HYPHENS = re.compile(r'-+')
+    
+    def __init__(
+        self,
+        custom_rules: List[tuple] = None,
+        cache_size: int = DEFAULT_CACHE_SIZE,
+        lowercase: bool = True
+    ):
         """
         初始化标准化器
         
         Args:
             custom_rules: 自定义规则列表 [(pattern, replacement), ...]
+            cache_size: 标准化结果的LRU缓存容量，0表示不缓存
+            lowercase: 是否统一转小写
         """
         self.rules = custom_rules or self.DEFAULT_RULES
+        self.lowercase = lowercase
+        self._suffix_pattern, self._compiled_rules = self._compile(self.rules)
+        if cache_size:
+            self._normalize_cached = lru_cache(maxsize=cache_size)(self._normalize)
+        else:
+            self._normalize_cached = self._normalize
+    
+    @staticmethod
+    def _compile(rules: List[tuple]) -> Tuple[Optional[Pattern], List[Tuple[Pattern, str]]]:
+        """
+        编译规则集
+        
+        逐条应用的后缀移除规则 r1..rn 等价于一次匹配 (?:rn)?...(?:r1)?$：
+        第一条规则移除的是最末尾的后缀，因此合并时需要倒序排列。
+        
+        Returns:
+            (合并后的后缀正则, 逐条编译的规则)，无法合并时前者为None
+        """
+        suffixes = []
+        for pattern, replacement in rules:
+            if (replacement or '|' in pattern or pattern.startswith('^')
+                    or not pattern.endswith('$') or pattern.endswith('\\$')):
+                suffixes = None
+                break
+            suffixes.append(pattern[:-1])
+        
+        if suffixes:
+            combined = ''.join(f'(?:{suffix})?' for suffix in reversed(suffixes)) + '$'
+            return re.compile(combined, re.IGNORECASE), []
+        
+        return None, [(re.compile(pattern, re.IGNORECASE), replacement) for pattern, replacement in rules]
     
     def normalize(self, model_name: str) -> str:
         """
@@ -40,29 +91,35 @@ class ModelNameNormalizer:
         
         Args:
             model_name: 原始模型名称
-            
+        
         Returns:
             标准化后的名称
         """
         if not model_name:
             return ""
-        
+        return self._normalize_cached(model_name)
+    
+    def _normalize(self, model_name: str) -> str:
+        """标准化模型名称（不经过缓存）"""
         normalized = model_name.strip()
         
-        # 移除provider前缀
-        if '/' in normalized:
-            parts = normalized.split('/')
-            normalized = parts[-1]  # 取最后一部分
+        # 移除provider前缀，取最后一部分
+        normalized = normalized.rpartition('/')[2]
         
         # 应用所有规则
-        for pattern, replacement in self.rules:
-            normalized = re.sub(pattern, replacement, normalized, flags=re.IGNORECASE)
+        if self._suffix_pattern is not None:
+            match = self._suffix_pattern.search(normalized)
+            normalized = normalized[:match.start()]
+        else:
+            for pattern, replacement in self._compiled_rules:
+                normalized = pattern.sub(replacement, normalized)
         
         # 转小写
-        normalized = normalized.lower()
+        if self.lowercase:
+            normalized = normalized.lower()
         
         # 移除多余的连字符
-        normalized = re.sub(r'-+', '-', normalized)
+        normalized = self._HYPHENS.sub('-', normalized)
         normalized = normalized.strip('-')
         
         # 移除多余空格
@@ -74,13 +131,53 @@ class ModelNameNormalizer:
         """
         批量标准化模型名称
         
+        重复的名称只计算一次
+        
         Args:
             model_names: 模型名称列表
-            
+        
         Returns:
             {original_name: normalized_name}
         """
-        return {name: self.normalize(name) for name in model_names}
+        normalize = self.normalize
+        return {name: normalize(name) for name in dict.fromkeys(model_names)}
+    
+    def cache_info(self) -> Dict:
+        """获取LRU缓存统计"""
+        if not hasattr(self._normalize_cached, 'cache_info'):
+            return {}
+        info = self._normalize_cached.cache_info()
+        return {
+            "hits": info.hits,
+            "misses": info.misses,
+            "size": info.currsize,
+            "max_size": info.maxsize
+        }
+
+
+# 当前生效的标准化器，热加载时整体替换
+_active_normalizer = ModelNameNormalizer()
+
+
+def get_normalizer() -> ModelNameNormalizer:
+    """获取当前生效的标准化器"""
+    return _active_normalizer
+
+
+def set_normalizer(normalizer: ModelNameNormalizer) -> ModelNameNormalizer:
+    """
+    替换当前生效的标准化器
+    
+    新标准化器在调用前已完成编译，替换只是一次引用赋值，
+    正在进行的标准化调用不受影响。
+    
+    Returns:
+        被替换的旧标准化器
+    """
+    global _active_normalizer
+    previous = _active_normalizer
+    _active_normalizer = normalizer
+    return previous
 
 
 def normalize_model_name(name: str) -> str:
@@ -89,12 +186,178 @@ def normalize_model_name(name: str) -> str:
     
     Args:
         name: 原始模型名称
-        
+    
     Returns:
         标准化后的名称
     """
-    normalizer = ModelNameNormalizer()
-    return normalizer.normalize(name)
+    return _active_normalizer.normalize(name)
+
+
+def load_normalizer_from_config(path: str) -> Optional[ModelNameNormalizer]:
+    """
+    从YAML配置文件的 normalization 段创建标准化器
+    
+    配置格式：
+        normalization:
+          rules:
+            - pattern: "-\\d{8}$"
+              replacement: ""
+          lowercase: true
+    
+    Args:
+        path: 配置文件路径
+    
+    Returns:
+        标准化器，配置中没有 normalization 段时返回None
+    
+    Raises:
+        ValueError: 规则格式错误或正则无法编译
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        config = yaml.safe_load(f) or {}
+    
+    section = config.get('normalization')
+    if not isinstance(section, dict):
+        return None
+    
+    rules = []
+    for idx, rule in enumerate(section.get('rules') or []):
+        if not isinstance(rule, dict) or 'pattern' not in rule:
+            raise ValueError(f"标准化规则 {idx}: 缺少 'pattern' 字段")
+        pattern = str(rule['pattern'])
+        try:
+            re.compile(pattern)
+        except re.error as e:
+            raise ValueError(f"标准化规则 {idx}: 无效的正则 '{pattern}': {e}")
+        rules.append((pattern, str(rule.get('replacement') or '')))
+    
+    return ModelNameNormalizer(
+        custom_rules=rules or None,
+        lowercase=bool(section.get('lowercase', True))
+    )
+
+
+def rule_literal_suffix(pattern: str) -> str:
+    """
+    提取后缀规则末尾的字面量部分
+    
+    Args:
+        pattern: 正则规则
+    
+    Returns:
+        规则必然匹配的末尾字面量，无法确定时返回空字符串
+    
+    Examples:
+        >>> rule_literal_suffix(r"-preview$")
+        "-preview"
+        >>> rule_literal_suffix(r"-\d{8}$")
+        ""
+    """
+    if not pattern.endswith('$') or pattern.endswith('\\$') or '|' in pattern:
+        return ""
+    
+    body = pattern[:-1]
+    literal = []
+    i = len(body) - 1
+    while i >= 0:
+        char = body[i]
+        if i > 0 and body[i - 1] == '\\':
+            # 仅转义的标点是字面量，\d、\w 等字符类不是
+            if char.isalnum():
+                break
+            literal.append(char)
+            i -= 2
+            continue
+        if char in '.^$*+?{}[]()|\\':
+            break
+        literal.append(char)
+        i -= 1
+    return ''.join(reversed(literal))
+
+
+class SuffixTrie:
+    """
+    后缀字典树
+    
+    以倒序字符存储一组字面量后缀（不区分大小写），用于快速判断名称中是否出现了其中某个片段
+    """
+    
+    _END = object()
+    
+    def __init__(self, suffixes: List[str] = None):
+        self._root: Dict = {}
+        self.size = 0
+        for suffix in suffixes or []:
+            self.add(suffix)
+    
+    def add(self, suffix: str) -> None:
+        """添加后缀"""
+        node = self._root
+        for char in reversed(suffix.lower()):
+            node = node.setdefault(char, {})
+        if self._END not in node:
+            node[self._END] = True
+            self.size += 1
+    
+    def ends_with_any(self, text: str, end: Optional[int] = None) -> bool:
+        """判断 text[:end] 是否以任一后缀结尾（text需已转小写）"""
+        node = self._root
+        i = len(text) if end is None else end
+        while i > 0:
+            i -= 1
+            node = node.get(text[i])
+            if node is None:
+                return False
+            if self._END in node:
+                return True
+        return False
+    
+    def contains_any(self, text: str) -> bool:
+        """
+        判断text中是否包含任一后缀
+        
+        后缀规则按顺序剥离，某条规则的片段可能位于名称中部（后面还跟着会被
+        其他规则剥离的后缀），因此需要在每个位置检查
+        """
+        text = text.lower()
+        return any(self.ends_with_any(text, end) for end in range(len(text), 0, -1))
+
+
+def affected_suffixes(
+    old: ModelNameNormalizer,
+    new: ModelNameNormalizer
+) -> Optional[SuffixTrie]:
+    """
+    计算规则集变更可能影响的名称片段
+    
+    只有包含某条新增或删除规则末尾字面量的名称，标准化结果才可能变化。
+    
+    Args:
+        old: 旧标准化器
+        new: 新标准化器
+        
+    Returns:
+        变更规则的后缀字典树；无法通过字面量判断（如 \\d 结尾的规则、
+        非后缀规则、共有规则顺序变化、大小写设置变化）时返回None，表示需要检查全部名称
+    """
+    if old.lowercase != new.lowercase:
+        return None
+    
+    old_rules = [tuple(rule) for rule in old.rules]
+    new_rules = [tuple(rule) for rule in new.rules]
+    
+    # 共有规则的相对顺序变化会影响所有后续规则
+    if [r for r in old_rules if r in new_rules] != [r for r in new_rules if r in old_rules]:
+        return None
+    
+    trie = SuffixTrie()
+    changed = [r for r in old_rules if r not in new_rules] + [r for r in new_rules if r not in old_rules]
+    for pattern, replacement in changed:
+        suffix = rule_literal_suffix(pattern)
+        if replacement or not suffix:
+            return None
+        trie.add(suffix)
+    return trie
 
 
 def normalize_url(url: str) -> str:
@@ -103,7 +366,7 @@ def normalize_url(url: str) -> str:
     
     Args:
         url: 原始URL
-        
+    
     Returns:
         标准化后的URL
     """
@@ -126,10 +389,10 @@ def extract_provider_from_model(name: str) -> Optional[str]:
     
     Args:
         name: 模型名称（可能包含provider前缀）
-        
+    
     Returns:
         provider前缀，如果没有则返回None
-        
+    
     Examples:
         >>> extract_provider_from_model("openai/gpt-4")
         "openai"
@@ -152,10 +415,10 @@ def remove_version_suffix(name: str) -> str:
     
     Args:
         name: 模型名称
-        
+    
     Returns:
         移除版本后缀后的名称
-        
+    
     Examples:
         >>> remove_version_suffix("gpt-4-20240101")
         "gpt-4"
@@ -181,7 +444,7 @@ def validate_url(url: str) -> bool:
     
     Args:
         url: URL字符串
-        
+    
     Returns:
         是否为有效的URL
     """
@@ -198,7 +461,7 @@ def sanitize_provider_name(name: str) -> str:
     
     Args:
         name: 原始名称
-        
+    
     Returns:
         清理后的名称
     """
@@ -0,0 +1,37 @@
+"""
+拆分provider命名工具
+按模型拆分出的provider和分组使用由内容派生的稳定标识，
+新增或删除模型不会改变其他provider和分组的名称
+"""
+import hashlib
+
+# 标识中哈希的十六进制位数（48位，单个API源内发生碰撞的概率可以忽略）
+SPLIT_KEY_LENGTH = 12
+
+
+def split_key(source_id: str, original_name: str) -> str:
+    """
+    计算模型的拆分标识
+    
+    只由API源ID和上游原始模型名决定，与查询结果中的位置无关；
+    模型创建时写入 models.split_key，之后保持不变
+    
+    Args:
+        source_id: API源ID
+        original_name: 原始模型名称
+    
+    Returns:
+        拆分标识
+    """
+    digest = hashlib.sha256(f"{source_id}\0{original_name}".encode("utf-8")).hexdigest()
+    return digest[:SPLIT_KEY_LENGTH]
+
+
+def split_provider_name(source_name: str, key: str) -> str:
+    """拆分provider的名称：{源名称}-{拆分标识}"""
+    return f"{source_name}-{key}"
+
+
+def split_group_name(provider_name: str, unified_name: str) -> str:
+    """拆分provider对应的分组名称：{provider名称}-{统一名称}"""
+    return f"{provider_name}-{unified_name}"
@@ -0,0 +1,26 @@
+"""
+测试用数据库
+"""
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.pool import StaticPool
+
+from app.database import Base
+from app.models import api_source, health_rollup, model, provider_model, revision  # noqa: F401
+
+
+async def create_session_factory():
+    """
+    创建内存SQLite数据库并建表
+    
+    Returns:
+        (引擎, 会话工厂)
+    """
+    engine = create_async_engine(
+        "sqlite+aiosqlite://",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool
+    )
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    session_factory = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+    return engine, session_factory
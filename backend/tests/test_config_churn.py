@@ -0,0 +1,94 @@
+"""
+配置变更幅度测试
+拆分provider使用稳定标识命名，一次模型变更只影响与该模型相关的配置行
+"""
+import asyncio
+import difflib
+
+from sqlalchemy import delete, insert, select
+
+from app.models import APISource, Model, Provider
+from app.services.config_changes import ConfigChangeLog
+from app.services.config_graph import IncrementalConfigGenerator
+from app.services.load_balancer import LoadBalanceScores
+from app.services.model_manager import ModelManagerService
+from app.utils.config_serializer import render_yaml
+from tests.db import create_session_factory
+
+FAMILIES = ["gpt-4o", "claude-3-5-sonnet", "gemini-1.5-pro", "llama-3.1-70b-instruct", "qwen2.5-72b-instruct"]
+SOURCES = 20
+MODELS_PER_SOURCE = 10
+TARGET = "src-0010"
+
+# 新增一个模型只应增加该模型的provider、分组和聚合分组成员等少数几行
+MAX_LINES_FOR_ONE_MODEL = 20
+
+
+def diff_lines(before: str, after: str) -> int:
+    """unified diff中的 +/- 行数"""
+    diff = difflib.unified_diff(before.splitlines(), after.splitlines(), lineterm="", n=0)
+    return sum(1 for line in diff if line[:1] in ("+", "-") and not line.startswith(("+++", "---")))
+
+
+async def render(session_factory) -> str:
+    """从数据库全量生成gpt-load配置"""
+    generator = IncrementalConfigGenerator(changelog=ConfigChangeLog(), balance=LoadBalanceScores())
+    async with session_factory() as db:
+        graph = await generator.refresh(db, full=True)
+    return render_yaml(graph.gptload_config())
+
+
+async def populate(session_factory) -> None:
+    async with session_factory() as db:
+        rows = [
+            {"id": f"src-{s:04d}", "name": f"src-{s:04d}", "base_url": f"https://api{s}.example.com/v1",
+             "api_key": f"sk-{s:04d}", "enabled": True}
+            for s in range(SOURCES)
+        ]
+        await db.execute(insert(APISource), rows)
+        await db.execute(insert(Provider), rows)
+        await db.commit()
+    for s in range(SOURCES):
+        async with session_factory() as db:
+            await ModelManagerService(db).bulk_upsert_models(f"src-{s:04d}", [
+                {"id": f"{FAMILIES[(s + i) % len(FAMILIES)]}-{s}-{i}"} for i in range(MODELS_PER_SOURCE)
+            ])
+
+
+def test_adding_one_model_changes_few_lines():
+    async def run():
+        engine, session_factory = await create_session_factory()
+        await populate(session_factory)
+        before = await render(session_factory)
+        async with session_factory() as db:
+            # 排序在该源所有模型之前，按位置编号命名时会使该源其余provider全部改名
+            await ModelManagerService(db).bulk_upsert_models(TARGET, [{"id": "a-new-model"}])
+        after = await render(session_factory)
+        await engine.dispose()
+        return before, after
+    
+    before, after = asyncio.run(run())
+    assert "a-new-model" in after
+    assert 0 < diff_lines(before, after) <= MAX_LINES_FOR_ONE_MODEL
+
+
+def test_resync_source_changes_nothing():
+    """删除并重新创建一个API源的所有模型行（新的模型ID），配置不变"""
+    async def run():
+        engine, session_factory = await create_session_factory()
+        await populate(session_factory)
+        before = await render(session_factory)
+        async with session_factory() as db:
+            names = (await db.execute(
+                select(Model.original_name).where(Model.provider_id == TARGET)
+            )).scalars().all()
+            await db.execute(delete(Model).where(Model.provider_id == TARGET))
+            await db.commit()
+        async with session_factory() as db:
+            await ModelManagerService(db).bulk_upsert_models(TARGET, [{"id": name} for name in reversed(names)])
+        after = await render(session_factory)
+        await engine.dispose()
+        return before, after
+    
+    before, after = asyncio.run(run())
+    assert diff_lines(before, after) == 0
@@ -0,0 +1,212 @@
+"""
+配置热更新测试
+使用进程内的gpt-load和uni-api替身服务（httpx.MockTransport）
+"""
+import asyncio
+import copy
+import json
+from typing import Dict, List, Optional, Tuple
+
+import httpx
+import pytest
+
+from app.services.config_deployer import ConfigDeployer
+
+GPT_LOAD_URL = "http://gpt-load.test"
+UNI_API_URL = "http://uni-api.test"
+
+GPTLOAD_CONFIG = {
+    "providers": [
+        {"name": "source-a", "base_url": "http://a.test/v1", "keys": ["sk-a"]},
+        {"name": "source-b", "base_url": "http://b.test/v1", "keys": ["sk-b"]},
+    ],
+    "groups": [
+        {"name": "gpt-4o-a", "provider": "source-a", "models": ["gpt-4o"]},
+        {"name": "gpt-4o-b", "provider": "source-b", "models": ["gpt-4o"]},
+        {"name": "o1-b", "provider": "source-b", "models": ["o1"]},
+    ],
+    "aggregate_groups": [
+        {"name": "gpt-4o", "groups": ["gpt-4o-a", "gpt-4o-b"]},
+    ],
+    "model_redirects": {"gpt-4o-2024-08-06": "gpt-4o"},
+}
+
+UNIAPI_CONFIG = {
+    "providers": [
+        {"provider": "gpt-load", "base_url": "http://gpt-load:3001/v1", "model": ["gpt-4o", "o1"]},
+    ],
+    "api_keys": [{"api": "sk-uni", "model": ["all"]}],
+}
+
+
+class StandInGateway:
+    """
+    网关替身服务
+    
+    记录收到的请求；unsupported 中的路径返回指定状态码，
+    重载后的前 unhealthy_after_reload 次健康检查返回503；
+    设置了 auth_key 时管理接口要求对应的Bearer令牌
+    """
+    
+    def __init__(self, auth_key: str = ""):
+        self.auth_key = auth_key
+        self.requests: List[Tuple[str, str, Optional[Dict]]] = []
+        self.unsupported: Dict[str, int] = {}
+        self.unhealthy_after_reload = 0
+        self._unhealthy = 0
+    
+    def handle(self, request: httpx.Request) -> httpx.Response:
+        path = request.url.path
+        if path == "/health":
+            if self._unhealthy:
+                self._unhealthy -= 1
+                return httpx.Response(503)
+            return httpx.Response(200, json={"status": "ok"})
+        
+        if self.auth_key and request.headers.get("Authorization") != f"Bearer {self.auth_key}":
+            return httpx.Response(401)
+        payload = json.loads(request.content) if request.content else None
+        self.requests.append((request.method, path, payload))
+        if path in self.unsupported:
+            return httpx.Response(self.unsupported[path])
+        if path == "/api/reload":
+            self._unhealthy = self.unhealthy_after_reload
+        return httpx.Response(200, json={"ok": True})
+    
+    def calls(self, method: Optional[str] = None) -> List[Tuple[str, str, Optional[Dict]]]:
+        return [call for call in self.requests if method is None or call[0] == method]
+    
+    def reset(self) -> None:
+        self.requests = []
+
+
+@pytest.fixture
+def gateways():
+    return StandInGateway(auth_key="admin"), StandInGateway()
+
+
+def run_apply(tmp_path, gateways, gptload_config, uniapi_config, confirm_timeout: float = 5.0) -> Dict:
+    gpt_load, uni_api = gateways
+    
+    def handler(request: httpx.Request) -> httpx.Response:
+        gateway = gpt_load if request.url.host == "gpt-load.test" else uni_api
+        return gateway.handle(request)
+    
+    async def run():
+        async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+            deployer = ConfigDeployer(
+                client,
+                str(tmp_path),
+                GPT_LOAD_URL,
+                UNI_API_URL,
+                gpt_load_auth_key="admin",
+                confirm_timeout=confirm_timeout
+            )
+            return await deployer.apply(gptload_config, uniapi_config)
+    
+    return asyncio.run(run())
+
+
+def test_first_deploy_pushes_full_config(tmp_path, gateways):
+    """没有已部署快照时提交完整配置并重载"""
+    gpt_load, uni_api = gateways
+    result = run_apply(tmp_path, gateways, GPTLOAD_CONFIG, UNIAPI_CONFIG)
+    
+    assert result["requires_restart"] is False
+    assert result["gpt_load"]["success"] and result["gpt_load"]["reloaded"]
+    assert result["uni_api"]["success"] and result["uni_api"]["reloaded"]
+    assert result["gpt_load"]["changes"]["groups"] == {"added": 3, "updated": 0, "removed": 0}
+    
+    assert gpt_load.requests == [
+        ("POST", "/api/config", GPTLOAD_CONFIG),
+        ("POST", "/api/reload", None),
+    ]
+    assert uni_api.requests == [("POST", "/api/reload", None)]
+    assert (tmp_path / "deployed" / "gpt-load.json").exists()
+    assert (tmp_path / "deployed" / "uni-api.json").exists()
+
+
+def test_reapply_unchanged_config_sends_no_requests(tmp_path, gateways):
+    gpt_load, uni_api = gateways
+    run_apply(tmp_path, gateways, GPTLOAD_CONFIG, UNIAPI_CONFIG)
+    gpt_load.reset()
+    uni_api.reset()
+    
+    result = run_apply(tmp_path, gateways, GPTLOAD_CONFIG, UNIAPI_CONFIG)
+    
+    assert gpt_load.requests == []
+    assert uni_api.requests == []
+    assert result["gpt_load"]["success"] and not result["gpt_load"]["reloaded"]
+    assert result["uni_api"]["success"] and not result["uni_api"]["reloaded"]
+    assert result["message"] == "配置无变化，无需更新"
+
+
+def test_changed_config_is_pushed_and_reported(tmp_path, gateways):
+    """gpt-load配置变化时提交完整配置，差异只用于汇报；未变化的uni-api不收到请求"""
+    gpt_load, uni_api = gateways
+    run_apply(tmp_path, gateways, GPTLOAD_CONFIG, UNIAPI_CONFIG)
+    gpt_load.reset()
+    uni_api.reset()
+    
+    config = copy.deepcopy(GPTLOAD_CONFIG)
+    config["groups"][0]["models"] = ["gpt-4o", "gpt-4o-mini"]
+    del config["groups"][2]
+    config["model_redirects"]["gpt-4o-mini-2024-07-18"] = "gpt-4o-mini"
+    result = run_apply(tmp_path, gateways, config, UNIAPI_CONFIG)
+    
+    assert result["gpt_load"]["success"]
+    assert result["gpt_load"]["changes"]["groups"] == {"added": 0, "updated": 1, "removed": 1}
+    assert result["gpt_load"]["changes"]["providers"] == {"added": 0, "updated": 0, "removed": 0}
+    assert gpt_load.requests == [
+        ("POST", "/api/config", config),
+        ("POST", "/api/reload", None),
+    ]
+    # uni-api配置未变化
+    assert uni_api.requests == []
+
+
+def test_reload_waits_for_health(tmp_path, gateways):
+    """重载后等待健康检查通过才确认并保存快照"""
+    gpt_load, _ = gateways
+    gpt_load.unhealthy_after_reload = 1
+    result = run_apply(tmp_path, gateways, GPTLOAD_CONFIG, UNIAPI_CONFIG)
+    
+    assert result["gpt_load"]["success"] and result["gpt_load"]["reloaded"]
+    assert gpt_load._unhealthy == 0
+
+
+def test_unhealthy_after_reload_is_not_confirmed(tmp_path, gateways):
+    gpt_load, _ = gateways
+    gpt_load.unhealthy_after_reload = 1000
+    result = run_apply(tmp_path, gateways, GPTLOAD_CONFIG, UNIAPI_CONFIG, confirm_timeout=0.1)
+    
+    assert not result["gpt_load"]["success"]
+    assert not result["gpt_load"]["reloaded"]
+    assert result["message"] == "配置应用失败，请检查服务状态"
+    # 未确认的配置不作为下一次的对比基准
+    assert not (tmp_path / "deployed" / "gpt-load.json").exists()
+
+
+@pytest.mark.parametrize("status_code", [404, 405, 501])
+def test_unsupported_admin_api_requires_restart(tmp_path, gateways, status_code):
+    gpt_load, uni_api = gateways
+    gpt_load.unsupported["/api/reload"] = status_code
+    uni_api.unsupported["/api/reload"] = status_code
+    result = run_apply(tmp_path, gateways, GPTLOAD_CONFIG, UNIAPI_CONFIG)
+    
+    assert result["requires_restart"] is True
+    assert result["gpt_load"]["requires_restart"] and result["uni_api"]["requires_restart"]
+    assert result["restart_command"] == "docker-compose restart gpt-load uni-api"
+    assert not (tmp_path / "deployed" / "gpt-load.json").exists()
+
+
+def test_unsupported_config_api_requires_restart(tmp_path, gateways):
+    gpt_load, uni_api = gateways
+    gpt_load.unsupported["/api/config"] = 404
+    result = run_apply(tmp_path, gateways, GPTLOAD_CONFIG, UNIAPI_CONFIG)
+    
+    assert result["gpt_load"]["requires_restart"]
+    assert not result["uni_api"]["requires_restart"]
+    assert result["restart_command"] == "docker-compose restart gpt-load"
+    # 提交失败后不触发重载
+    assert ("POST", "/api/reload", None) not in gpt_load.requests
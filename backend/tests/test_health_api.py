@@ -0,0 +1,41 @@
+"""
+健康状态接口测试
+"""
+import asyncio
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.api.config import router
+from app.database import get_db
+from app.services.health_monitor import MAX_LATENCY_WINDOW
+from tests.db import create_session_factory
+
+
+@pytest.fixture
+def client():
+    engine, session_factory = asyncio.run(create_session_factory())
+    
+    async def override_get_db():
+        async with session_factory() as session:
+            yield session
+    
+    app = FastAPI()
+    app.include_router(router)
+    app.dependency_overrides[get_db] = override_get_db
+    with TestClient(app) as test_client:
+        yield test_client
+
+
+@pytest.mark.parametrize("window", ["0", "-1", "1e11", "inf", "nan"])
+def test_provider_health_rejects_invalid_window(client, window):
+    response = client.get("/health/providers", params={"window": window})
+    assert response.status_code == 422
+
+
+@pytest.mark.parametrize("window", ["60", str(MAX_LATENCY_WINDOW)])
+def test_provider_health_accepts_window_up_to_retention(client, window):
+    response = client.get("/health/providers", params={"window": window})
+    assert response.status_code == 200
+    assert response.json() == {"providers": []}
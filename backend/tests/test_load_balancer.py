@@ -0,0 +1,34 @@
+"""
+负载均衡评分测试
+"""
+from app.services.health_rollup import RollupBucket
+from app.services.load_balancer import score_rollup
+
+
+def test_fast_failures_do_not_lower_latency():
+    """快速失败的检查不计入延迟，故障的API源不会因此获得更低的延迟分位数"""
+    healthy = RollupBucket()
+    flaky = RollupBucket()
+    for _ in range(50):
+        healthy.add("healthy", 300)
+        flaky.add("healthy", 300)
+        # 连接被拒绝或立即返回5xx
+        flaky.add("unhealthy", 5)
+    
+    healthy_score = score_rollup(healthy)
+    flaky_score = score_rollup(flaky)
+    assert flaky_score.p50 == healthy_score.p50
+    assert flaky_score.p95 == healthy_score.p95
+    assert flaky_score.error_rate > healthy_score.error_rate
+    assert flaky.summary()["avg_response_time"] == 300
+
+
+def test_only_failures_have_no_latency():
+    rollup = RollupBucket()
+    for _ in range(10):
+        rollup.add("unhealthy", 3)
+        rollup.add("timeout", None)
+    
+    assert len(rollup.sketch) == 0
+    assert rollup.summary()["avg_response_time"] is None
+    assert score_rollup(rollup).p50 == 0
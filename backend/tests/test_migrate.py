@@ -0,0 +1,93 @@
+"""
+数据库迁移测试
+"""
+import asyncio
+import importlib.util
+import os
+from datetime import datetime, timedelta
+
+from sqlalchemy import insert, select, text
+
+from app.models import APISource, HealthCheck, Model, Provider
+from app.services.model_manager import ModelManagerService
+from app.utils.split_naming import split_key, split_provider_name
+from tests.db import create_session_factory
+
+_spec = importlib.util.spec_from_file_location(
+    "migrate",
+    os.path.join(os.path.dirname(__file__), "..", "..", "scripts", "migrate.py")
+)
+migrate = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(migrate)
+
+
+def test_unique_index_migration_dedupes_models():
+    """创建唯一索引前合并重复行：保留最近更新的一行，并沿用其余行的显示名称"""
+    now = datetime.utcnow()
+    
+    async def run():
+        engine, _ = await create_session_factory()
+        async with engine.begin() as conn:
+            await conn.execute(text("DROP INDEX uq_models_provider_original"))
+            await conn.execute(insert(APISource).values(id="s1", name="s1", base_url="http://up", api_key="sk"))
+            await conn.execute(insert(Model), [
+                {"id": "old", "provider_id": "s1", "original_name": "gpt-4o", "normalized_name": "gpt-4o",
+                 "display_name": "GPT-4o", "updated_at": now - timedelta(days=2)},
+                {"id": "new", "provider_id": "s1", "original_name": "gpt-4o", "normalized_name": "gpt-4o",
+                 "display_name": None, "updated_at": now},
+                {"id": "older", "provider_id": "s1", "original_name": "gpt-4o", "normalized_name": "gpt-4o",
+                 "display_name": "gpt4", "updated_at": now - timedelta(days=3)},
+                {"id": "other", "provider_id": "s1", "original_name": "o1", "normalized_name": "o1",
+                 "display_name": None, "updated_at": now},
+            ])
+        
+        async with engine.begin() as conn:
+            await migrate.create_models_unique_index(conn)
+            # 再次执行不做任何修改
+            await migrate.create_models_unique_index(conn)
+        
+        async with engine.connect() as conn:
+            rows = (await conn.execute(select(Model.id, Model.display_name).order_by(Model.id))).all()
+            indexes = (await conn.execute(text("PRAGMA index_list(models)"))).all()
+        await engine.dispose()
+        return rows, indexes
+    
+    rows, indexes = asyncio.run(run())
+    assert [tuple(row) for row in rows] == [("new", "GPT-4o"), ("other", None)]
+    assert any(index[1] == "uq_models_provider_original" and index[2] for index in indexes)
+
+
+def test_legacy_split_providers_are_renamed():
+    """旧版按序号命名的拆分provider改为稳定标识命名，之后拆分不再创建新provider"""
+    async def run():
+        engine, session_factory = await create_session_factory()
+        source = {"id": "s1", "name": "src", "base_url": "http://up", "api_key": "sk"}
+        async with engine.begin() as conn:
+            await conn.execute(insert(APISource).values(**source))
+            await conn.execute(insert(Provider), [
+                {**source, "name": "src"},
+                *({**source, "id": f"src-{index}", "name": f"src-{index}"} for index in range(3)),
+            ])
+            await conn.execute(insert(Model), [
+                {"id": name, "provider_id": "s1", "original_name": name, "normalized_name": name,
+                 "split_key": split_key("s1", name)}
+                for name in ("gpt-4o", "o1")
+            ])
+            await conn.execute(insert(HealthCheck).values(provider_id="src-1", status="healthy", response_time=100))
+        
+        async with engine.begin() as conn:
+            await migrate.migrate_legacy_split_providers(conn)
+            await migrate.migrate_legacy_split_providers(conn)
+        
+        async with session_factory() as db:
+            created = await ModelManagerService(db).split_providers_by_model("s1")
+            providers = set((await db.execute(select(Provider.id))).scalars().all())
+            checks = set((await db.execute(select(HealthCheck.provider_id))).scalars().all())
+        await engine.dispose()
+        return created, providers, checks
+    
+    created, providers, checks = asyncio.run(run())
+    expected = {split_provider_name("src", split_key("s1", name)) for name in ("gpt-4o", "o1")}
+    assert created == []
+    assert providers == {"s1"} | expected
+    assert len(checks) == 1 and checks <= expected
@@ -0,0 +1,66 @@
+"""
+模型管理服务测试
+"""
+import asyncio
+
+from sqlalchemy import insert, select
+
+from app.models import APISource, Model
+from app.services.model_manager import ModelManagerService
+from tests.db import create_session_factory
+
+
+def rename(models, renames):
+    """在包含给定模型的数据库中执行批量重命名，返回 (成功的ID, 失败的ID, 重命名后的显示名称)"""
+    async def run():
+        engine, session_factory = await create_session_factory()
+        async with session_factory() as db:
+            await db.execute(insert(APISource).values(id="p", name="p", base_url="http://up", api_key="sk"))
+            await db.execute(insert(Model), [
+                {"id": model_id, "provider_id": "p", "original_name": model_id, "normalized_name": model_id,
+                 "display_name": display_name}
+                for model_id, display_name in models.items()
+            ])
+            await db.commit()
+        
+        async with session_factory() as db:
+            accepted, failed = await ModelManagerService(db).batch_rename_models([
+                {"model_id": model_id, "new_name": new_name} for model_id, new_name in renames
+            ])
+        async with session_factory() as db:
+            names = dict((await db.execute(select(Model.id, Model.display_name))).tuples().all())
+        await engine.dispose()
+        return [model.id for model in accepted], [item["model_id"] for item in failed], names
+    
+    return asyncio.run(run())
+
+
+def test_rejected_rename_does_not_release_name():
+    """改名被拒绝的模型仍持有原名称，依赖该名称的重命名也应被拒绝"""
+    accepted, failed, names = rename(
+        {"A": "X", "B": None, "C": "Y"},
+        [("B", "X"), ("A", "Y")]
+    )
+    assert accepted == []
+    assert sorted(failed) == ["A", "B"]
+    assert names == {"A": "X", "B": None, "C": "Y"}
+
+
+def test_swap_names_within_batch():
+    accepted, failed, names = rename(
+        {"A": "X", "B": "Y"},
+        [("A", "Y"), ("B", "X")]
+    )
+    assert sorted(accepted) == ["A", "B"]
+    assert failed == []
+    assert names == {"A": "Y", "B": "X"}
+
+
+def test_first_request_wins_within_batch():
+    accepted, failed, names = rename(
+        {"A": None, "B": None, "C": "X"},
+        [("A", "Z"), ("B", "Z"), ("C", "W")]
+    )
+    assert sorted(accepted) == ["A", "C"]
+    assert failed == ["B"]
+    assert names == {"A": "Z", "B": None, "C": "W"}
@@ -0,0 +1,113 @@
+"""
+模型同步测试
+上游模型目录未变化（304）时不应访问数据库
+"""
+import asyncio
+import json
+
+import httpx
+import pytest
+from sqlalchemy import event, insert, select
+
+from app.models import APISource, Model
+from app.services.api_aggregator import APIAggregatorService
+from app.services.catalog_cache import ModelCatalogCache
+from app.services.model_sync import ModelSyncService
+from tests.db import create_session_factory
+
+SOURCES = [{"id": "p", "base_url": "http://upstream.test", "api_key": "sk-p"}]
+ETAG = '"catalog-v1"'
+CATALOG = {"object": "list", "data": [
+    {"id": "gpt-4o", "context_length": 128000},
+    {"id": "o1-mini", "context_length": 65536}
+]}
+
+
+class Upstream:
+    """支持 ETag 条件请求的上游替身"""
+    
+    def __init__(self):
+        self.statuses = []
+    
+    def handle(self, request: httpx.Request) -> httpx.Response:
+        if request.headers.get("If-None-Match") == ETAG:
+            response = httpx.Response(304, headers={"ETag": ETAG})
+        else:
+            response = httpx.Response(200, headers={"ETag": ETAG}, content=json.dumps(CATALOG).encode())
+        self.statuses.append(response.status_code)
+        return response
+
+
+def run_syncs(times: int, stream: bool = False):
+    """连续同步 times 次，返回 (每次的结果, 每次执行的SQL语句, 上游状态码, 最终的模型名称)"""
+    async def run():
+        engine, session_factory = await create_session_factory()
+        async with session_factory() as db:
+            await db.execute(insert(APISource).values(id="p", name="p", base_url="http://upstream.test", api_key="sk-p"))
+            await db.commit()
+        
+        statements = []
+        event.listen(engine.sync_engine, "before_cursor_execute",
+                     lambda conn, cursor, sql, params, context, many: statements[-1].append(sql))
+        
+        upstream = Upstream()
+        aggregator = APIAggregatorService(
+            catalog_cache=ModelCatalogCache(),
+            client=httpx.AsyncClient(transport=httpx.MockTransport(upstream.handle))
+        )
+        service = ModelSyncService(session_factory, aggregator)
+        results = []
+        for _ in range(times):
+            statements.append([])
+            results.append(await service.sync_sources(SOURCES, stream=stream))
+        await aggregator.close()
+        
+        statements.append([])
+        async with session_factory() as db:
+            names = sorted((await db.execute(select(Model.original_name))).scalars().all())
+        await engine.dispose()
+        return results, statements[:times], upstream.statuses, names
+    
+    return asyncio.run(run())
+
+
+@pytest.mark.parametrize("stream", [False, True])
+def test_not_modified_skips_database(stream):
+    results, statements, statuses, names = run_syncs(2, stream=stream)
+    
+    assert statuses == [200, 304]
+    assert names == ["gpt-4o", "o1-mini"]
+    
+    first, second = (r["results"]["p"] for r in results)
+    assert first["changes"] == {"created": 2, "updated": 0, "unchanged": 0}
+    assert any(sql.lstrip().upper().startswith("INSERT") for sql in statements[0])
+    
+    assert second["success"] and second["unchanged"]
+    assert second["changes"] is None
+    assert results[1]["summary"]["skipped"] == 1
+    assert statements[1] == []
+
+
+def test_streamed_fetch_does_not_leave_slim_entries_in_cache():
+    """流式获取之后的普通获取仍返回完整的模型条目"""
+    upstream = Upstream()
+    
+    async def drain(source_id, models):
+        async for _ in models:
+            pass
+    
+    async def run():
+        aggregator = APIAggregatorService(
+            catalog_cache=ModelCatalogCache(),
+            client=httpx.AsyncClient(transport=httpx.MockTransport(upstream.handle))
+        )
+        await aggregator.batch_fetch_models(SOURCES, stream=True, consumer=drain)
+        fetched = await aggregator.batch_fetch_models(SOURCES)
+        again = await aggregator.batch_fetch_models(SOURCES)
+        await aggregator.close()
+        return fetched["results"]["p"], again["results"]["p"]
+    
+    fetched, again = asyncio.run(run())
+    assert upstream.statuses == [200, 200, 304]
+    assert fetched["models"] == CATALOG["data"] and not fetched["unchanged"]
+    assert again["models"] == CATALOG["data"] and again["unchanged"]
@@ -0,0 +1,65 @@
+"""
+标准化规则热加载测试
+"""
+import asyncio
+
+from sqlalchemy import insert, select
+from sqlalchemy.exc import OperationalError
+
+from app.models import APISource, Model
+from app.services.model_manager import ModelManagerService
+from app.services.normalization_reloader import NormalizationReloader
+from app.utils.normalization import get_normalizer, set_normalizer
+from tests.db import create_session_factory
+
+RULES = """
+normalization:
+  rules:
+    - pattern: "-latest$"
+      replacement: ""
+"""
+
+
+def test_failed_renormalize_is_retried(tmp_path, monkeypatch):
+    """重新标准化失败后，配置文件未再变化也会在下一次检查时重试"""
+    config_path = tmp_path / "config.yaml"
+    original_normalizer = get_normalizer()
+    original_renormalize = ModelManagerService.renormalize_models
+    failures = [OperationalError("UPDATE models", {}, Exception("database is locked"))]
+    
+    async def flaky_renormalize(self, normalizer, candidates=None):
+        if failures:
+            raise failures.pop()
+        return await original_renormalize(self, normalizer, candidates)
+    
+    monkeypatch.setattr(ModelManagerService, "renormalize_models", flaky_renormalize)
+    
+    async def run():
+        engine, session_factory = await create_session_factory()
+        async with session_factory() as db:
+            await db.execute(insert(APISource).values(id="s1", name="s1", base_url="http://up", api_key="sk"))
+            await db.execute(insert(Model).values(
+                id="m1", provider_id="s1", original_name="gpt-4o-latest", normalized_name="gpt-4o-latest"
+            ))
+            await db.commit()
+        
+        reloader = NormalizationReloader(str(config_path), session_factory)
+        await reloader.check_once()
+        config_path.write_text(RULES, encoding="utf-8")
+        try:
+            await reloader.check_once()
+        except OperationalError:
+            pass
+        assert await reloader.check_once() is False
+        
+        async with session_factory() as db:
+            normalized = await db.scalar(select(Model.normalized_name).where(Model.id == "m1"))
+        await engine.dispose()
+        return normalized, reloader.last_result
+    
+    try:
+        normalized, last_result = asyncio.run(run())
+    finally:
+        set_normalizer(original_normalizer)
+    assert normalized == "gpt-4o"
+    assert last_result["updated"] == 1
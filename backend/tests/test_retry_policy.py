@@ -0,0 +1,124 @@
+"""
+重试策略测试
+"""
+import asyncio
+import json
+
+import httpx
+
+from app.services.api_aggregator import APIAggregatorService
+from app.services.catalog_cache import ModelCatalogCache
+from app.services.host_scheduler import HostScheduler
+from app.services.retry_policy import RetryBudget, RetryPolicy, SourceBudgets, default_retry_policy
+
+BODY = json.dumps({"object": "list", "data": [{"id": "gpt-4o"}, {"id": "claude-3-5-sonnet"}]}).encode()
+
+
+def make_policy(source_budgets: SourceBudgets, **overrides) -> RetryPolicy:
+    params = {
+        "base_delay": 0.0,
+        "deadline": None,
+        "source_budgets": source_budgets,
+        "global_budget": RetryBudget(1000, 0)
+    }
+    params.update(overrides)
+    return RetryPolicy(**params)
+
+
+def test_source_budget_shared_across_policies():
+    """同一个源的预算在不同的策略实例之间共享"""
+    budgets = SourceBudgets(capacity=2, refill_per_second=0)
+    calls = 0
+    
+    async def attempt(timeout: float) -> httpx.Response:
+        nonlocal calls
+        calls += 1
+        return httpx.Response(503)
+    
+    async def run():
+        for _ in range(3):
+            await make_policy(budgets).call(attempt, key="source-a")
+    
+    asyncio.run(run())
+    # 3次调用共计只能重试2次
+    assert calls == 3 + 2
+
+
+def test_source_budgets_evict_least_recently_used():
+    budgets = SourceBudgets(capacity=1, refill_per_second=0, max_sources=2)
+    first = budgets.get("a")
+    budgets.get("b")
+    assert budgets.get("a") is first
+    budgets.get("c")
+    assert len(budgets) == 2
+    assert budgets.get("a") is first
+    assert "b" not in budgets._budgets
+
+
+def test_default_policy_uses_shared_budgets():
+    assert default_retry_policy().source_budgets is default_retry_policy().source_budgets
+
+
+def test_stream_models_retries_through_policy():
+    """流式获取与普通获取一样按重试策略重试"""
+    statuses = [503, 429]
+    
+    def handler(request: httpx.Request) -> httpx.Response:
+        if statuses:
+            return httpx.Response(statuses.pop(0))
+        return httpx.Response(200, content=BODY)
+    
+    async def collect_ids(source_id, models):
+        return [model["id"] async for model in models]
+    
+    async def run():
+        client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        service = APIAggregatorService(
+            catalog_cache=ModelCatalogCache(),
+            client=client,
+            scheduler=HostScheduler(),
+            retry_policy=make_policy(SourceBudgets(capacity=5, refill_per_second=0))
+        )
+        result = await service.batch_fetch_models(
+            [{"id": "s1", "base_url": "http://upstream.test", "api_key": "sk"}],
+            stream=True,
+            consumer=collect_ids
+        )
+        await client.aclose()
+        return result["results"]["s1"], service.scheduler.get_stats()
+    
+    result, scheduler_stats = asyncio.run(run())
+    assert result["success"]
+    assert result["result"] == ["gpt-4o", "claude-3-5-sonnet"]
+    assert not statuses
+    # 所有槽位都已释放
+    assert all(host["in_flight"] == 0 for host in scheduler_stats["hosts"].values())
+
+
+def test_stream_models_gives_up_when_budget_exhausted():
+    def handler(request: httpx.Request) -> httpx.Response:
+        return httpx.Response(503)
+    
+    async def drain(source_id, models):
+        async for _ in models:
+            pass
+    
+    async def run():
+        client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        service = APIAggregatorService(
+            catalog_cache=ModelCatalogCache(),
+            client=client,
+            scheduler=HostScheduler(),
+            retry_policy=make_policy(SourceBudgets(capacity=1, refill_per_second=0))
+        )
+        result = await service.batch_fetch_models(
+            [{"id": "s1", "base_url": "http://upstream.test", "api_key": "sk"}],
+            stream=True,
+            consumer=drain
+        )
+        await client.aclose()
+        return result["results"]["s1"]
+    
+    result = asyncio.run(run())
+    assert not result["success"]
+    assert result["error"] == "HTTP错误: 503"
@@ -0,0 +1,32 @@
+"""
+HTTP传输管理测试
+"""
+import httpx
+
+from app.services.transport_manager import PerHostTransport, _HostPool
+
+
+def make_transport(pool_transport) -> PerHostTransport:
+    transport = PerHostTransport(http2=False, limits=httpx.Limits(max_connections=4))
+    pool = _HostPool(pool_transport)
+    pool.in_flight = 2
+    pool.requests = 5
+    transport._pools[(b"http", b"upstream.test", None)] = pool
+    return transport
+
+
+def test_stats_read_connection_counts():
+    stats = make_transport(httpx.AsyncHTTPTransport()).get_stats()["http://upstream.test"]
+    assert stats["connections"] == 0
+    assert stats["idle_connections"] == 0
+    assert stats["in_flight"] == 2
+    assert stats["requests"] == 5
+
+
+def test_stats_fall_back_to_own_counters():
+    """连接池结构不符时不抛出异常，按在途请求估算占用"""
+    stats = make_transport(object()).get_stats()["http://upstream.test"]
+    assert stats["connections"] is None
+    assert stats["idle_connections"] is None
+    assert stats["active_connections"] == 2
+    assert stats["utilization"] == 0.5
@@ -0,0 +1,85 @@
+"""
+批量重命名/删除基准测试
+在SQLite文件数据库上对比逐条调用 rename_model/delete_model 与集合操作实现
+"""
+import asyncio
+import os
+import sys
+import tempfile
+import time
+import uuid
+
+# 使用临时数据库，需在导入app之前设置
+_tmp_dir = tempfile.mkdtemp(prefix="bench-batch-")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_tmp_dir, 'bench.db')}"
+
+# 添加项目根目录到Python路径
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'backend'))
+
+from sqlalchemy import delete, insert
+from app.database import AsyncSessionLocal, init_db
+from app.models import APISource, Model
+from app.services.model_manager import ModelManagerService
+
+
+async def reset_models(count: int):
+    """重建测试数据，返回模型ID列表"""
+    ids = [str(uuid.uuid4()) for _ in range(count)]
+    async with AsyncSessionLocal() as db:
+        await db.execute(delete(Model))
+        await db.execute(delete(APISource))
+        await db.execute(insert(APISource).values(id="bench", name="bench", base_url="http://bench", api_key="sk"))
+        await db.execute(insert(Model), [
+            {"id": model_id, "original_name": f"model-{i}", "normalized_name": f"model-{i}",
+             "provider_id": "bench", "enabled": True}
+            for i, model_id in enumerate(ids)
+        ])
+        await db.commit()
+    return ids
+
+
+async def legacy_rename(service: ModelManagerService, renames):
+    """改造前的实现：逐条调用rename_model，每条单独提交"""
+    for rename in renames:
+        await service.rename_model(rename["model_id"], rename["new_name"])
+
+
+async def legacy_delete(service: ModelManagerService, model_ids):
+    """改造前的实现：逐条调用delete_model，每条单独提交"""
+    for model_id in model_ids:
+        await service.delete_model(model_id)
+
+
+async def timed(name: str, count: int, func, *args):
+    async with AsyncSessionLocal() as db:
+        service = ModelManagerService(db)
+        start = time.perf_counter()
+        await func(service, *args)
+        elapsed = time.perf_counter() - start
+    print(f"{name:<26} rows={count:<7} time={elapsed:8.2f}s  ({count / elapsed:,.0f} rows/s)")
+
+
+async def main(count: int, legacy_count: int):
+    await init_db()
+    
+    ids = await reset_models(legacy_count)
+    renames = [{"model_id": model_id, "new_name": f"renamed-{i}"} for i, model_id in enumerate(ids)]
+    await timed("legacy rename loop", legacy_count, legacy_rename, renames)
+    await timed("legacy delete loop", legacy_count, legacy_delete, ids)
+    
+    ids = await reset_models(count)
+    renames = [{"model_id": model_id, "new_name": f"renamed-{i}"} for i, model_id in enumerate(ids)]
+    await timed("set-based batch rename", count, lambda s, r: s.batch_rename_models(r), renames)
+    await timed("set-based batch delete", count, lambda s, i: s.batch_delete_models(i), ids)
+
+
+if __name__ == "__main__":
+    import argparse
+    import logging
+    
+    logging.basicConfig(level=logging.WARNING)
+    parser = argparse.ArgumentParser(description='批量重命名/删除基准测试')
+    parser.add_argument('--rows', type=int, default=10000, help='批量操作的行数')
+    parser.add_argument('--legacy-rows', type=int, default=10000, help='逐条实现的行数（较慢，可调小后按比例估算）')
+    args = parser.parse_args()
+    asyncio.run(main(args.rows, args.legacy_rows))
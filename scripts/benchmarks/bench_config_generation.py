@@ -0,0 +1,172 @@
+"""
+配置生成基准测试
+在合成的 2,000 provider / 50,000 模型数据库上对比：
+- 改造前：gpt-load 与 uni-api 各自查询、gpt-load 两次遍历
+- generate_all() 全量重建：一次关联查询、单次遍历
+- generate_all() 增量更新：修改一个模型后只重算受影响的provider
+报告耗时和峰值内存（tracemalloc）
+"""
+import asyncio
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+from collections import defaultdict
+
+# 使用临时数据库，需在导入app之前设置
+_tmp_dir = tempfile.mkdtemp(prefix="bench-config-")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_tmp_dir, 'bench.db')}"
+
+# 添加项目根目录到Python路径
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'backend'))
+
+from sqlalchemy import insert, select
+from app.database import AsyncSessionLocal, init_db
+from app.models import APISource, Model, Provider
+from app.services.config_generator import ConfigGeneratorService
+from app.services.model_manager import ModelManagerService
+
+FAMILIES = [
+    "gpt-4o", "gpt-4o-mini", "gpt-3.5-turbo", "claude-3-opus", "claude-3-5-sonnet", "gemini-1.5-pro",
+    "gemini-2.0-flash", "llama-3.1-70b-instruct", "mistral-large", "qwen2.5-72b-instruct",
+    "deepseek-chat", "o1-mini", "text-embedding-3-large"
+]
+
+
+async def populate(providers: int, models: int, seed: int = 42):
+    """生成合成数据"""
+    rng = random.Random(seed)
+    per_provider = models // providers
+    async with AsyncSessionLocal() as db:
+        sources = [
+            {"id": f"src-{p:05d}", "name": f"src-{p:05d}", "base_url": f"https://api{p}.example.com/v1/",
+             "api_key": f"sk-{p:05d}", "enabled": True}
+            for p in range(providers)
+        ]
+        await db.execute(insert(APISource), sources)
+        await db.execute(insert(Provider), sources)
+        rows = []
+        for p in range(providers):
+            for i in range(per_provider):
+                name = f"{rng.choice(FAMILIES)}-v{rng.randint(0, 300)}"
+                rows.append({
+                    "id": f"m-{p:05d}-{i:04d}", "original_name": f"{name}-{i}", "normalized_name": name,
+                    "provider_id": f"src-{p:05d}", "enabled": True
+                })
+                if len(rows) >= 5000:
+                    await db.execute(insert(Model), rows)
+                    rows = []
+        if rows:
+            await db.execute(insert(Model), rows)
+        await db.commit()
+
+
+async def legacy_generate(db, gpt_load_url: str):
+    """改造前的实现：两份配置各自查询，gpt-load配置遍历provider两次"""
+    providers = (await db.execute(select(Provider).where(Provider.enabled == True))).scalars().all()
+    models = (await db.execute(select(Model).where(Model.enabled == True))).scalars().all()
+    models_by_provider = defaultdict(list)
+    for model in models:
+        models_by_provider[model.provider_id].append(model)
+    
+    providers_config, groups_config = [], []
+    for provider in providers:
+        for idx, model in enumerate(models_by_provider.get(provider.id, [])):
+            provider_id = f"{provider.name}-{idx}"
+            unified_name = model.display_name or model.normalized_name
+            providers_config.append({"name": provider_id, "base_url": provider.base_url.rstrip('/'),
+                                     "api_key": provider.api_key, "models": [model.original_name], "enabled": True})
+            groups_config.append({"name": f"{provider_id}-{unified_name}", "providers": [provider_id],
+                                  "strategy": "fixed_priority", "model_mapping": {unified_name: model.original_name}})
+    
+    aggregate_groups_config, model_redirects = [], {}
+    models_by_unified_name = defaultdict(list)
+    for provider in providers:
+        for idx, model in enumerate(models_by_provider.get(provider.id, [])):
+            unified_name = model.display_name or model.normalized_name
+            models_by_unified_name[unified_name].append(f"{provider.name}-{idx}-{unified_name}")
+    for unified_name, group_names in models_by_unified_name.items():
+        if len(group_names) > 1:
+            aggregate_groups_config.append({"name": f"Aggr-{unified_name}", "sub_groups": group_names,
+                                            "load_balance": "round_robin"})
+            model_redirects[unified_name] = f"Aggr-{unified_name}"
+        else:
+            model_redirects[unified_name] = group_names[0]
+    gptload = {"providers": providers_config, "groups": groups_config,
+               "aggregate_groups": aggregate_groups_config, "model_redirects": model_redirects}
+    
+    uni_models = (await db.execute(select(Model).where(Model.enabled == True))).scalars().all()
+    unified = {}
+    for model in uni_models:
+        unified.setdefault(model.display_name or model.normalized_name, model)
+    uniapi = {"providers": [{"provider": f"gptload-{name}", "base_url": f"{gpt_load_url}/proxy/{name}",
+                             "api": "openai", "model": [name]} for name in unified],
+              "api": {"port": 8000, "bind": "0.0.0.0"}}
+    return gptload, uniapi
+
+
+async def measure(name: str, func, trace_memory: bool = True):
+    """
+    在新会话中执行并统计耗时与峰值内存
+
+    tracemalloc 会显著拖慢执行，因此耗时与峰值内存分两次测量
+    """
+    async with AsyncSessionLocal() as db:
+        start = time.perf_counter()
+        gptload, uniapi = await func(db)
+        elapsed = time.perf_counter() - start
+    peak = 0
+    if trace_memory:
+        async with AsyncSessionLocal() as db:
+            tracemalloc.start()
+            await func(db)
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+    print(f"{name:<34} time={elapsed:7.2f}s  peak={peak / 1024 / 1024:8.1f} MiB  "
+          f"groups={len(gptload['groups'])} aggregates={len(gptload['aggregate_groups'])} "
+          f"uni-api={len(uniapi['providers'])}")
+    return gptload, uniapi
+
+
+async def main(providers: int, models: int):
+    await init_db()
+    print(f"生成数据: {providers} providers, {models} models")
+    await populate(providers, models)
+    gpt_load_url = "http://gpt-load:3001"
+    
+    legacy = await measure("legacy (separate queries)", lambda db: legacy_generate(db, gpt_load_url))
+    full = await measure(
+        "generate_all (full rebuild)",
+        lambda db: ConfigGeneratorService(db, gpt_load_url=gpt_load_url).generate_all(full_rebuild=True)
+    )
+    
+    async with AsyncSessionLocal() as db:
+        await ModelManagerService(db).rename_model("m-00000-0000", "bench-renamed-model")
+    # 增量更新只有第一次调用会处理变更，不重复测量内存
+    await measure(
+        "generate_all (incremental, 1 edit)",
+        lambda db: ConfigGeneratorService(db, gpt_load_url=gpt_load_url).generate_all(),
+        trace_memory=False
+    )
+    
+    # 拆分provider改为按 split_key 命名，分组按模型映射比较
+    def group_mappings(config):
+        return sorted(tuple(g["model_mapping"].items()) for g in config["groups"])
+    
+    same_groups = group_mappings(legacy[0]) == group_mappings(full[0])
+    same_names = set(legacy[0]["model_redirects"]) == set(full[0]["model_redirects"])
+    print(f"与改造前结果一致（分组模型映射/重定向集合）: {same_groups and same_names}")
+
+
+if __name__ == "__main__":
+    import argparse
+    import logging
+    
+    logging.basicConfig(level=logging.WARNING)
+    parser = argparse.ArgumentParser(description='配置生成基准测试')
+    parser.add_argument('--providers', type=int, default=2000, help='provider数量')
+    parser.add_argument('--models', type=int, default=50000, help='模型数量')
+    args = parser.parse_args()
+    asyncio.run(main(args.providers, args.models))
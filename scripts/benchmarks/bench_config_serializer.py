@@ -0,0 +1,109 @@
+"""
+配置序列化基准测试
+在10万条目的gpt-load配置上对比：
+- 改造前：纯Python yaml.dump 生成整个文档
+- LibYAML（CSafeDumper）生成整个文档
+- ConfigSerializer 分批流式写入文件（YAML / JSON）
+报告耗时和峰值内存（tracemalloc），并校验各YAML输出逐字节一致
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+# 添加项目根目录到Python路径
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'backend'))
+
+import yaml
+from app.services.config_writer import ConfigWriter
+from app.utils.config_serializer import LIBYAML_AVAILABLE, ConfigSerializer, render_yaml
+
+FAMILIES = ["gpt-4o", "claude-3-5-sonnet", "gemini-1.5-pro", "llama-3.1-70b-instruct", "qwen2.5-72b-instruct"]
+
+
+def build_config(entries: int, seed: int = 42):
+    """构造包含 entries 个provider/分组的gpt-load配置"""
+    rng = random.Random(seed)
+    providers, groups = [], []
+    names = {}
+    for i in range(entries):
+        split_id = f"source-{i // 25:05d}-{i % 25}"
+        unified = f"{rng.choice(FAMILIES)}-v{rng.randint(0, entries // 20)}"
+        providers.append({
+            "name": split_id, "base_url": f"https://api{i // 25}.example.com/v1",
+            "api_key": f"sk-{i:08d}", "models": [f"{unified}-2024"], "enabled": True
+        })
+        group_name = f"{split_id}-{unified}"
+        groups.append({
+            "name": group_name, "providers": [split_id], "strategy": "fixed_priority",
+            "model_mapping": {unified: f"{unified}-2024"}
+        })
+        names.setdefault(unified, []).append(group_name)
+    aggregate_groups = [
+        {"name": f"Aggr-{name}", "sub_groups": members, "load_balance": "round_robin"}
+        for name, members in names.items() if len(members) > 1
+    ]
+    redirects = {
+        name: (f"Aggr-{name}" if len(members) > 1 else members[0]) for name, members in names.items()
+    }
+    return {"providers": providers, "groups": groups, "aggregate_groups": aggregate_groups,
+            "model_redirects": redirects}
+
+
+def measure(name: str, func, trace_memory: bool = True):
+    """执行并统计耗时与峰值内存（分两次测量，tracemalloc会拖慢执行）"""
+    start = time.perf_counter()
+    output = func()
+    elapsed = time.perf_counter() - start
+    peak = 0
+    if trace_memory:
+        tracemalloc.start()
+        func()
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    print(f"{name:<32} time={elapsed:7.2f}s  peak={peak / 1024 / 1024:8.1f} MiB")
+    return output
+
+
+def main(entries: int, skip_legacy: bool):
+    print(f"LibYAML: {LIBYAML_AVAILABLE}, entries: {entries}")
+    config = build_config(entries)
+    out_dir = tempfile.mkdtemp(prefix="bench-serializer-")
+    yaml_serializer = ConfigSerializer("yaml")
+    json_serializer = ConfigSerializer("json")
+    
+    def write_streamed(serializer, filename):
+        # 每次写入不同内容的目标文件前先删除，避免被“内容未变化”跳过
+        path = os.path.join(out_dir, filename)
+        if os.path.exists(path):
+            os.unlink(path)
+        ConfigWriter(out_dir, backup_keep=0).write(filename, serializer.iter_chunks(config))
+        return path
+    
+    outputs = {}
+    if not skip_legacy:
+        outputs["legacy"] = measure(
+            "yaml.dump (pure Python)",
+            lambda: yaml.dump(config, allow_unicode=True, default_flow_style=False, sort_keys=False).encode("utf-8")
+        )
+    outputs["whole"] = measure("ConfigDumper (whole document)", lambda: render_yaml(config).encode("utf-8"))
+    streamed_path = measure("ConfigSerializer yaml (streamed)", lambda: write_streamed(yaml_serializer, "gpt-load.yaml"))
+    with open(streamed_path, "rb") as f:
+        outputs["streamed"] = f.read()
+    measure("ConfigSerializer json (streamed)", lambda: write_streamed(json_serializer, "gpt-load.json"))
+    
+    reference = next(iter(outputs.values()))
+    identical = all(output == reference for output in outputs.values())
+    print(f"YAML输出逐字节一致: {identical} ({len(reference) / 1024 / 1024:.1f} MiB)")
+
+
+if __name__ == "__main__":
+    import argparse
+    
+    parser = argparse.ArgumentParser(description='配置序列化基准测试')
+    parser.add_argument('--entries', type=int, default=100000, help='provider/分组条目数')
+    parser.add_argument('--skip-legacy', action='store_true', help='跳过较慢的纯Python基线')
+    args = parser.parse_args()
+    main(args.entries, args.skip_legacy)
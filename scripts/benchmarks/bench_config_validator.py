@@ -0,0 +1,95 @@
+"""
+配置验证基准测试
+在10万分组的gpt-load配置上对比：
+- 改造前：逐个provider检查必需字段，不检查引用
+- ConfigValidator：编译后的schema按列校验 + 哈希集合检查引用完整性
+并在配置中注入悬空子分组、缺失的重定向目标、重复的provider名称等错误，
+确认所有错误都被报告且带有路径
+"""
+import copy
+import os
+import sys
+import time
+
+# 添加项目根目录到Python路径
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'backend'))
+
+from bench_config_serializer import build_config
+from app.services.config_validator import config_validator
+
+
+def legacy_validate(config):
+    """改造前的 validate_config（gptload部分）"""
+    errors = []
+    if "providers" not in config:
+        errors.append("缺少 'providers' 字段")
+    elif not isinstance(config["providers"], list):
+        errors.append("'providers' 必须是列表")
+    
+    if "groups" not in config:
+        errors.append("缺少 'groups' 字段")
+    elif not isinstance(config["groups"], list):
+        errors.append("'groups' 必须是列表")
+    
+    for idx, provider in enumerate(config.get("providers", [])):
+        if "name" not in provider:
+            errors.append(f"Provider {idx}: 缺少 'name' 字段")
+        if "base_url" not in provider:
+            errors.append(f"Provider {idx}: 缺少 'base_url' 字段")
+        if "api_key" not in provider:
+            errors.append(f"Provider {idx}: 缺少 'api_key' 字段")
+    return errors
+
+
+def inject_errors(config):
+    """注入各类错误，返回被修改的配置和注入的错误数"""
+    broken = copy.deepcopy(config)
+    broken["aggregate_groups"][0]["sub_groups"].append("missing-group")
+    first_redirect = next(iter(broken["model_redirects"]))
+    broken["model_redirects"][first_redirect] = "missing-target"
+    broken["providers"][10]["name"] = broken["providers"][0]["name"]
+    del broken["groups"][20]["providers"]
+    broken["groups"][30]["providers"] = ["missing-provider"]
+    return broken, 5
+
+
+def best_of(func, repeat: int):
+    """多次执行取最短耗时"""
+    best = None
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def main(entries: int, repeat: int):
+    config = build_config(entries)
+    print(f"providers: {len(config['providers'])}, groups: {len(config['groups'])}, "
+          f"aggregate_groups: {len(config['aggregate_groups'])}, redirects: {len(config['model_redirects'])}")
+    
+    elapsed, errors = best_of(lambda: legacy_validate(config), repeat)
+    print(f"{'legacy (keys only)':<32} time={elapsed:7.3f}s  errors={len(errors)}")
+    
+    elapsed, issues = best_of(lambda: config_validator.validate(config), repeat)
+    print(f"{'ConfigValidator (valid)':<32} time={elapsed:7.3f}s  errors={len(issues)}")
+    
+    broken, injected = inject_errors(config)
+    elapsed, errors = best_of(lambda: legacy_validate(broken), repeat)
+    print(f"{'legacy (broken)':<32} time={elapsed:7.3f}s  errors={len(errors)} (注入 {injected})")
+    elapsed, issues = best_of(lambda: config_validator.validate(broken), repeat)
+    print(f"{'ConfigValidator (broken)':<32} time={elapsed:7.3f}s  errors={len(issues)} (注入 {injected})")
+    for issue in issues:
+        print(f"  {issue}")
+
+
+if __name__ == "__main__":
+    import argparse
+    
+    parser = argparse.ArgumentParser(description='配置验证基准测试')
+    parser.add_argument('--entries', type=int, default=100000, help='provider/分组条目数')
+    parser.add_argument('--repeat', type=int, default=5, help='每项测量的执行次数（取最短耗时）')
+    args = parser.parse_args()
+    main(args.entries, args.repeat)
@@ -0,0 +1,144 @@
+"""
+健康检查探测流量基准测试
+在本地启动模拟上游（返回大体积的模型列表），对比完整下载、HEAD、
+只读首字节的流式GET三种探测方式的传输字节数和耗时；部分上游不支持HEAD和Range，
+用于验证回退逻辑
+"""
+import asyncio
+import json
+import sys
+import os
+import time
+
+# 添加项目根目录到Python路径
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'backend'))
+
+import httpx
+from app.services.health_probe import PROBE_FULL, PROBE_HEAD, PROBE_STREAM, HealthProber
+
+
+def build_body(model_count: int) -> bytes:
+    """构造一个大型聚合商的 /v1/models 响应"""
+    return json.dumps({
+        "object": "list",
+        "data": [
+            {"id": f"vendor-{i % 40}/model-{i}", "object": "model", "created": 1700000000, "owned_by": f"vendor-{i % 40}"}
+            for i in range(model_count)
+        ]
+    }).encode()
+
+
+async def start_upstream(body: bytes, supports_probe: bool = True):
+    """
+    启动一个模拟上游
+    
+    Args:
+        body: /v1/models 的响应内容
+        supports_probe: 是否支持HEAD和Range；不支持时HEAD返回405，Range被忽略
+    
+    Returns:
+        (server, base_url, 已发送字节数计数器)
+    """
+    sent = [0]
+    
+    async def handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while True:
+                request = await reader.readuntil(b"\r\n\r\n")
+                method = request.split(b" ", 1)[0]
+                ranged = b"\r\nrange: bytes=0-0" in request.lower()
+                if method == b"HEAD" and not supports_probe:
+                    head = b"HTTP/1.1 405 Method Not Allowed\r\nContent-Length: 0\r\n\r\n"
+                    payload = b""
+                elif ranged and supports_probe:
+                    head = (
+                        b"HTTP/1.1 206 Partial Content\r\nContent-Type: application/json\r\n"
+                        b"Content-Range: bytes 0-0/" + str(len(body)).encode() + b"\r\nContent-Length: 1\r\n\r\n"
+                    )
+                    payload = body[:1]
+                else:
+                    head = (
+                        b"HTTP/1.1 200 OK\r\nContent-Type: application/json\r\n"
+                        b"Content-Length: " + str(len(body)).encode() + b"\r\n\r\n"
+                    )
+                    payload = b"" if method == b"HEAD" else body
+                writer.write(head)
+                sent[0] += len(head)
+                # 分块发送，客户端提前关闭连接时停止
+                for start in range(0, len(payload), 65536):
+                    chunk = payload[start:start + 65536]
+                    writer.write(chunk)
+                    await writer.drain()
+                    sent[0] += len(chunk)
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+    
+    server = await asyncio.start_server(handle, "127.0.0.1", 0)
+    port = server.sockets[0].getsockname()[1]
+    return server, f"http://127.0.0.1:{port}", sent
+
+
+async def run(mode: str, upstreams, rounds: int) -> None:
+    """对每个上游执行 rounds 次探测并输出流量"""
+    for _, _, sent in upstreams:
+        sent[0] = 0
+    prober = HealthProber(mode)
+    client = httpx.AsyncClient(limits=httpx.Limits(max_connections=None, max_keepalive_connections=None))
+    ttfbs = []
+    totals = []
+    healthy = 0
+    start = time.perf_counter()
+    for _ in range(rounds):
+        results = await asyncio.gather(*(
+            prober.probe(client, f"{base_url}/v1/models", key=base_url)
+            for _, base_url, _ in upstreams
+        ))
+        for result in results:
+            ttfbs.append(result.ttfb)
+            totals.append(result.total)
+            healthy += result.response.status_code in (200, 206)
+    elapsed = time.perf_counter() - start
+    await client.aclose()
+    await asyncio.sleep(0.05)
+    
+    server_bytes = sum(sent[0] for _, _, sent in upstreams)
+    checks = rounds * len(upstreams)
+    print(
+        f"{mode:<7} checks={checks:<5} healthy={healthy:<5} "
+        f"client_bytes={prober.bytes_read / 1e6:9.2f}MB server_bytes={server_bytes / 1e6:9.2f}MB "
+        f"per_check={prober.bytes_read / checks / 1e3:8.1f}KB "
+        f"ttfb_avg={sum(ttfbs) / len(ttfbs):6.1f}ms total_avg={sum(totals) / len(totals):6.1f}ms "
+        f"fallbacks={prober.fallbacks} time={elapsed:5.2f}s"
+    )
+
+
+async def main(source_count: int, unsupported: int, model_count: int, rounds: int):
+    body = build_body(model_count)
+    print(f"模型列表大小: {len(body) / 1e6:.2f}MB，{source_count} 个源（{unsupported} 个不支持HEAD/Range），{rounds} 轮")
+    upstreams = []
+    for i in range(source_count):
+        upstreams.append(await start_upstream(body, supports_probe=i >= unsupported))
+    
+    for mode in (PROBE_FULL, PROBE_HEAD, PROBE_STREAM):
+        await run(mode, upstreams, rounds)
+    
+    for server, _, _ in upstreams:
+        server.close()
+        await server.wait_closed()
+
+
+if __name__ == "__main__":
+    import argparse
+    import logging
+    
+    logging.basicConfig(level=logging.WARNING)
+    parser = argparse.ArgumentParser(description='健康检查探测流量基准测试')
+    parser.add_argument('--sources', type=int, default=50, help='API源数量')
+    parser.add_argument('--unsupported', type=int, default=5, help='不支持HEAD和Range的源数量')
+    parser.add_argument('--models', type=int, default=20000, help='每个源的模型数量')
+    parser.add_argument('--rounds', type=int, default=5, help='检查轮数')
+    args = parser.parse_args()
+    asyncio.run(main(args.sources, args.unsupported, args.models, args.rounds))
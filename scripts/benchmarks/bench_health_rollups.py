@@ -0,0 +1,232 @@
+"""
+健康统计基准测试
+在SQLite文件数据库中生成大量健康检查历史记录，对比改造前对 health_checks
+的 GROUP BY max(checked_at) 自连接统计与读取最新状态表、汇总表的统计耗时，
+对比扫描原始记录与合并延迟分布计算各API源窗口分位数的耗时，
+并测量写入路径同步更新汇总表的额外开销
+"""
+import asyncio
+import math
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+# 使用临时数据库，需在导入app之前设置
+_tmp_dir = tempfile.mkdtemp(prefix="bench-rollups-")
+_db_path = os.path.join(_tmp_dir, "bench.db")
+os.environ["DATABASE_URL"] = f"sqlite:///{_db_path}"
+
+# 添加项目根目录到Python路径
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'backend'))
+
+from sqlalchemy import and_, func, insert, select
+from app.database import AsyncSessionLocal, init_db
+from app.models import APISource, HealthCheck, HealthRollupHour, HealthRollupMinute, ProviderHealthLatest
+from app.services.health_buffer import HealthCheckBuffer
+from app.services.health_monitor import HealthMonitorService
+from app.services.health_rollup import RollupBucket, hour_bucket, minute_bucket, provider_latency
+
+STATUSES = ("healthy",) * 18 + ("unhealthy", "timeout")
+
+
+def generate_history(source_count: int, rows: int, now: datetime, interval: int):
+    """
+    按检查间隔倒推生成历史记录，同时在内存中汇总
+    
+    Returns:
+        (最新记录, 分钟汇总, 小时汇总)
+    """
+    db = sqlite3.connect(_db_path)
+    latest = {}
+    minutes = {}
+    hours = {}
+    minute_since = now - timedelta(days=1)
+    per_source = rows // source_count
+    batch = []
+    for round_index in range(per_source, 0, -1):
+        for source in range(source_count):
+            provider_id = f"bench-{source}"
+            checked_at = now - timedelta(seconds=round_index * interval + source % interval)
+            status = random.choice(STATUSES)
+            response_time = None if status == "timeout" else int(random.lognormvariate(5.5, 0.6))
+            batch.append((provider_id, status, response_time, None, checked_at.isoformat(sep=" ")))
+            latest[provider_id] = (status, response_time, checked_at)
+            hours.setdefault((provider_id, hour_bucket(checked_at)), RollupBucket()).add(status, response_time)
+            if checked_at >= minute_since:
+                minutes.setdefault((provider_id, minute_bucket(checked_at)), RollupBucket()).add(status, response_time)
+        if len(batch) >= 200000:
+            db.executemany(
+                "INSERT INTO health_checks (provider_id, status, response_time, error_message, checked_at) VALUES (?, ?, ?, ?, ?)",
+                batch
+            )
+            db.commit()
+            batch = []
+    if batch:
+        db.executemany(
+            "INSERT INTO health_checks (provider_id, status, response_time, error_message, checked_at) VALUES (?, ?, ?, ?, ?)",
+            batch
+        )
+        db.commit()
+    db.close()
+    return latest, minutes, hours
+
+
+async def load_rollups(latest, minutes, hours):
+    """写入与生成的历史记录一致的最新状态和汇总"""
+    async with AsyncSessionLocal() as db:
+        await db.execute(insert(ProviderHealthLatest), [
+            {"provider_id": provider_id, "status": status, "response_time": response_time, "checked_at": checked_at}
+            for provider_id, (status, response_time, checked_at) in latest.items()
+        ])
+        for table, buckets in ((HealthRollupMinute, minutes), (HealthRollupHour, hours)):
+            await db.execute(insert(table), [
+                {"provider_id": provider_id, "bucket": bucket, **rollup.as_row()}
+                for (provider_id, bucket), rollup in buckets.items()
+            ])
+        await db.commit()
+
+
+async def legacy_statistics(db):
+    """改造前的实现：两次计数加对 health_checks 的 GROUP BY max(checked_at) 自连接"""
+    total_sources = (await db.execute(select(func.count(APISource.id)))).scalar()
+    enabled_sources = (await db.execute(select(func.count(APISource.id)).where(APISource.enabled == True))).scalar()
+    subquery = (
+        select(HealthCheck.provider_id, func.max(HealthCheck.checked_at).label('latest_check'))
+        .group_by(HealthCheck.provider_id)
+        .subquery()
+    )
+    latest_checks = (await db.execute(
+        select(HealthCheck).join(
+            subquery,
+            and_(HealthCheck.provider_id == subquery.c.provider_id, HealthCheck.checked_at == subquery.c.latest_check)
+        )
+    )).scalars().all()
+    response_times = [check.response_time for check in latest_checks if check.response_time is not None]
+    return {
+        "total_sources": total_sources,
+        "enabled_sources": enabled_sources,
+        "online_sources": sum(1 for check in latest_checks if check.status == "healthy"),
+        "avg_response_time": int(sum(response_times) / len(response_times)) if response_times else 0
+    }
+
+
+async def raw_percentiles(db, since: datetime):
+    """扫描原始记录，按API源排序后取成功检查的 p50/p95/p99"""
+    result = await db.execute(
+        select(HealthCheck.provider_id, HealthCheck.response_time)
+        .where(
+            HealthCheck.checked_at >= since,
+            HealthCheck.status == "healthy",
+            HealthCheck.response_time.is_not(None)
+        )
+    )
+    latencies = {}
+    for provider_id, response_time in result:
+        latencies.setdefault(provider_id, []).append(response_time)
+    percentiles = {}
+    for provider_id, values in latencies.items():
+        values.sort()
+        percentiles[provider_id] = [values[max(math.ceil(q * len(values)) - 1, 0)] for q in (0.5, 0.95, 0.99)]
+    return percentiles
+
+
+async def sketch_percentiles(db, since: datetime):
+    """合并汇总表的延迟分布后取 p50/p95/p99"""
+    rollups = await provider_latency(db, since)
+    return {
+        provider_id: [rollup.sketch.quantile(q) for q in (0.5, 0.95, 0.99)]
+        for provider_id, rollup in rollups.items()
+    }
+
+
+async def timed(name: str, func, repeat: int):
+    timings = []
+    result = None
+    for _ in range(repeat):
+        async with AsyncSessionLocal() as db:
+            start = time.perf_counter()
+            result = await func(db)
+            timings.append(time.perf_counter() - start)
+    timings.sort()
+    print(f"{name:<22} median={timings[len(timings) // 2] * 1000:10.2f}ms  min={timings[0] * 1000:10.2f}ms")
+    return result
+
+
+async def bench_write_path(source_count: int, now: datetime, rounds: int):
+    """一轮检查的写入耗时：写入缓冲的批量写入（含汇总表更新）"""
+    buffer = HealthCheckBuffer(AsyncSessionLocal, batch_size=source_count + 1)
+    timings = []
+    for round_index in range(rounds):
+        checked_at = now + timedelta(seconds=30 * (round_index + 1))
+        for source in range(source_count):
+            status = random.choice(STATUSES)
+            await buffer.add({
+                "provider_id": f"bench-{source}",
+                "status": status,
+                "response_time": None if status == "timeout" else int(random.lognormvariate(5.5, 0.6)),
+                "ttfb": None,
+                "error_message": None,
+                "checked_at": checked_at
+            })
+        start = time.perf_counter()
+        await buffer.flush()
+        timings.append(time.perf_counter() - start)
+    timings.sort()
+    print(f"{'flush (rollups)':<22} median={timings[len(timings) // 2] * 1000:10.2f}ms  rows/round={source_count}")
+
+
+async def main(source_count: int, rows: int, interval: int, repeat: int):
+    await init_db()
+    async with AsyncSessionLocal() as db:
+        await db.execute(insert(APISource), [
+            {"id": f"bench-{i}", "name": f"bench-{i}", "base_url": "http://bench", "api_key": "sk"}
+            for i in range(source_count)
+        ])
+        await db.commit()
+    
+    now = datetime.utcnow().replace(microsecond=0)
+    start = time.perf_counter()
+    latest, minutes, hours = generate_history(source_count, rows, now, interval)
+    await load_rollups(latest, minutes, hours)
+    print(
+        f"生成 {rows:,} 条记录（{source_count} 个源，间隔 {interval} 秒）: {time.perf_counter() - start:.1f}s，"
+        f"分钟汇总 {len(minutes):,} 行，小时汇总 {len(hours):,} 行，数据库 {os.path.getsize(_db_path) / 1e6:.0f}MB"
+    )
+    
+    legacy = await timed("legacy self-join", legacy_statistics, repeat)
+    current = await timed("rollup tables", lambda db: HealthMonitorService(db).get_health_statistics(), repeat)
+    assert legacy["online_sources"] == current["online_sources"]
+    assert legacy["avg_response_time"] == current["avg_response_time"]
+    print(f"last_hour={current['last_hour']}")
+    
+    for label, window in (("1h", timedelta(hours=1)), ("24h", timedelta(days=1)), ("7d", timedelta(days=7))):
+        # 窗口起点对齐到分钟，两种方式统计同一批记录
+        since = minute_bucket(datetime.utcnow() - window)
+        exact = await timed(f"raw scan p99 {label}", lambda db: raw_percentiles(db, since), repeat)
+        approx = await timed(f"sketch p99 {label}", lambda db: sketch_percentiles(db, since), repeat)
+        error = max(
+            abs(approx[provider_id][i] - values[i]) / values[i]
+            for provider_id, values in exact.items()
+            for i in range(3)
+        )
+        print(f"{'':<22} max relative error={error:.2%}")
+    
+    await bench_write_path(source_count, now, rounds=20)
+
+
+if __name__ == "__main__":
+    import argparse
+    import logging
+    
+    logging.basicConfig(level=logging.WARNING)
+    parser = argparse.ArgumentParser(description='健康统计基准测试')
+    parser.add_argument('--sources', type=int, default=200, help='API源数量')
+    parser.add_argument('--rows', type=int, default=10_000_000, help='历史记录数量')
+    parser.add_argument('--interval', type=int, default=60, help='每个源的检查间隔（秒）')
+    parser.add_argument('--repeat', type=int, default=5, help='每种统计方式的执行次数')
+    args = parser.parse_args()
+    asyncio.run(main(args.sources, args.rows, args.interval, args.repeat))
@@ -0,0 +1,124 @@
+"""
+批量获取模型调度基准测试
+在本地启动多个不同延迟的模拟上游，对比全局信号量与按主机自适应调度的总刷新耗时
+"""
+import asyncio
+import json
+import sys
+import os
+import time
+
+# 添加项目根目录到Python路径
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'backend'))
+
+import httpx
+from app.services.api_aggregator import APIAggregatorService
+from app.services.catalog_cache import ModelCatalogCache
+from app.services.host_scheduler import HostScheduler
+from app.services.retry_policy import RetryBudget, RetryPolicy, SourceBudgets
+
+BODY = json.dumps({"object": "list", "data": [{"id": f"model-{i}"} for i in range(50)]}).encode()
+
+
+async def start_upstream(latency: float, max_parallel: int = 0):
+    """
+    启动一个模拟上游
+    
+    Args:
+        latency: 每个请求的响应延迟（秒）
+        max_parallel: 超过该并发数时返回429，0表示不限制
+    """
+    in_flight = 0
+    
+    async def handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        nonlocal in_flight
+        try:
+            while True:
+                request = await reader.readuntil(b"\r\n\r\n")
+                if not request:
+                    break
+                in_flight += 1
+                try:
+                    await asyncio.sleep(latency)
+                    if max_parallel and in_flight > max_parallel:
+                        status, body = b"429 Too Many Requests", b"{}"
+                    else:
+                        status, body = b"200 OK", BODY
+                finally:
+                    in_flight -= 1
+                writer.write(
+                    b"HTTP/1.1 " + status + b"\r\nContent-Type: application/json\r\n"
+                    b"Content-Length: " + str(len(body)).encode() + b"\r\n\r\n" + body
+                )
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+    
+    server = await asyncio.start_server(handle, "127.0.0.1", 0)
+    port = server.sockets[0].getsockname()[1]
+    return server, f"http://127.0.0.1:{port}"
+
+
+async def run(name: str, scheduler: HostScheduler, sources) -> None:
+    """执行一次批量刷新并输出耗时"""
+    client = httpx.AsyncClient(limits=httpx.Limits(max_connections=None, max_keepalive_connections=None))
+    service = APIAggregatorService(
+        catalog_cache=ModelCatalogCache(),
+        client=client,
+        scheduler=scheduler
+    )
+    # 每次运行使用独立的重试预算，互不影响
+    service.retry_policy = RetryPolicy(
+        base_delay=1.0,
+        source_budgets=SourceBudgets(3.0, 0.1),
+        global_budget=RetryBudget(1000, 100)
+    )
+    start = time.perf_counter()
+    result = await service.batch_fetch_models(sources)
+    elapsed = time.perf_counter() - start
+    await client.aclose()
+    summary = result["summary"]
+    print(f"{name:<22} time={elapsed:6.2f}s success={summary['success']}/{summary['total']}")
+
+
+async def main(source_count: int, max_concurrent: int):
+    # 3个慢主机、1个有速率限制的主机、8个快主机
+    hosts = []
+    for _ in range(3):
+        hosts.append(await start_upstream(2.0))
+    hosts.append(await start_upstream(0.2, max_parallel=2))
+    for _ in range(8):
+        hosts.append(await start_upstream(0.05))
+    
+    # 慢主机上的源排在前面，使全局信号量优先被它们占满
+    sources = [
+        {"id": f"source-{i}", "base_url": hosts[i % len(hosts)][1], "api_key": f"sk-{i}"}
+        for i in range(source_count)
+    ]
+    sources.sort(key=lambda s: [h[1] for h in hosts].index(s["base_url"]) >= 3)
+    
+    # 两种调度使用相同的全局并发上限，只比较按主机调度本身的效果
+    await run(
+        f"global semaphore({max_concurrent})",
+        HostScheduler(max_concurrent=max_concurrent, initial_window=max_concurrent, max_window=max_concurrent),
+        sources
+    )
+    await run(f"adaptive per-host({max_concurrent})", HostScheduler(max_concurrent=max_concurrent), sources)
+    
+    for server, _ in hosts:
+        server.close()
+        await server.wait_closed()
+
+
+if __name__ == "__main__":
+    import argparse
+    import logging
+    
+    logging.basicConfig(level=logging.WARNING)
+    parser = argparse.ArgumentParser(description='批量获取模型调度基准测试')
+    parser.add_argument('--sources', type=int, default=300, help='API源数量')
+    parser.add_argument('--max-concurrent', type=int, default=5, help='全局最大并发请求数（两种调度相同）')
+    args = parser.parse_args()
+    asyncio.run(main(args.sources, args.max_concurrent))
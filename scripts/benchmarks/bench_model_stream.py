@@ -0,0 +1,104 @@
+"""
+模型列表解析内存基准测试
+对比一次性解析（response.json）与流式增量解析在大型 /v1/models 响应上的峰值内存
+"""
+import asyncio
+import json
+import sys
+import os
+import time
+import tracemalloc
+
+# 添加项目根目录到Python路径
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'backend'))
+
+import httpx
+from app.services.api_aggregator import APIAggregatorService
+from app.services.catalog_cache import ModelCatalogCache
+
+CHUNK_SIZE = 64 * 1024
+
+
+def build_payload(count: int) -> bytes:
+    """构造带有嵌套定价和能力元数据的合成模型目录"""
+    models = [
+        {
+            "id": f"vendor-{i % 37}/model-{i}-20240101",
+            "object": "model",
+            "created": 1700000000 + i,
+            "owned_by": f"vendor-{i % 37}",
+            "pricing": {
+                "prompt": "0.000001",
+                "completion": "0.000002",
+                "image": "0",
+                "request": "0",
+                "tiers": [{"threshold": t * 1000, "price": "0.0000005"} for t in range(4)]
+            },
+            "capabilities": {
+                "context_length": 128000,
+                "modalities": ["text", "image"],
+                "tools": True,
+                "description": "synthetic model entry used for benchmarking " * 3
+            }
+        }
+        for i in range(count)
+    ]
+    return json.dumps({"object": "list", "data": models}).encode("utf-8")
+
+
+def make_service(payload: bytes) -> APIAggregatorService:
+    """创建使用本地模拟上游的服务实例"""
+    async def body():
+        for i in range(0, len(payload), CHUNK_SIZE):
+            yield payload[i:i + CHUNK_SIZE]
+    
+    def handler(request: httpx.Request) -> httpx.Response:
+        return httpx.Response(200, content=body())
+    
+    service = APIAggregatorService(catalog_cache=ModelCatalogCache())
+    service.client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    return service
+
+
+async def drain(source_id: str, models) -> None:
+    """逐条消费模型，不保留列表"""
+    async for _ in models:
+        pass
+
+
+async def measure(name: str, payload: bytes, stream: bool) -> None:
+    """测量一次批量获取的耗时和峰值内存"""
+    service = make_service(payload)
+    sources = [{"id": "bench", "base_url": "http://mock.local", "api_key": "sk-bench"}]
+    
+    tracemalloc.start()
+    start = time.perf_counter()
+    if stream:
+        result = await service.batch_fetch_models(sources, stream=True, consumer=drain)
+    else:
+        result = await service.batch_fetch_models(sources)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    
+    await service.close()
+    count = result["results"]["bench"]["model_count"]
+    print(f"{name:<10} models={count:<7} time={elapsed:6.2f}s peak={peak / 1024 / 1024:8.1f} MiB")
+
+
+async def main(count: int):
+    payload = build_payload(count)
+    print(f"payload: {count} models, {len(payload) / 1024 / 1024:.1f} MiB")
+    await measure("json", payload, stream=False)
+    await measure("stream", payload, stream=True)
+
+
+if __name__ == "__main__":
+    import argparse
+    import logging
+    
+    logging.basicConfig(level=logging.WARNING)
+    parser = argparse.ArgumentParser(description='模型列表解析内存基准测试')
+    parser.add_argument('--models', type=int, default=50000, help='合成模型数量')
+    args = parser.parse_args()
+    asyncio.run(main(args.models))
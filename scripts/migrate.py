@@ -9,8 +9,15 @@ import os
 # 添加项目根目录到Python路径
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'backend'))
 
-from app.database import engine
+from app.database import Base, engine
+from app.models.health_rollup import HealthRollupDay, HealthRollupHour, HealthRollupMinute, ProviderHealthLatest
+from app.models.provider_model import HealthCheck
+from app.services.health_rollup import RollupBucket, hour_bucket, minute_bucket
+from app.utils.split_naming import split_key, split_provider_name
+from datetime import datetime, timedelta
+from sqlalchemy import bindparam, inspect, insert, select, text
 import logging
+import re
 
 logging.basicConfig(
     level=logging.INFO,
@@ -19,16 +26,302 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 
+def create_tables(*models):
+    """创建数据表的迁移步骤（已存在时跳过）"""
+    tables = [model.__table__ for model in models]
+    
+    async def upgrade(conn):
+        await conn.run_sync(lambda sync_conn: Base.metadata.create_all(sync_conn, tables=tables))
+    return upgrade
+
+
+def drop_tables(*models):
+    """删除数据表的迁移步骤（不存在时跳过）"""
+    tables = [model.__table__ for model in models]
+    
+    async def downgrade(conn):
+        await conn.run_sync(lambda sync_conn: Base.metadata.drop_all(sync_conn, tables=tables))
+    return downgrade
+
+
+async def dedupe_models(conn):
+    """
+    合并 (provider_id, original_name) 重复的模型行
+    
+    旧版本逐行先查询再插入，并发同步时可能写入重复行，创建唯一索引前需要先合并：
+    每组保留最近更新的一行，该行没有显示名称时沿用其余行中最近的显示名称，
+    其余行删除（没有其他表引用 models.id）
+    """
+    result = await conn.execute(text(
+        "SELECT m.id, m.provider_id, m.original_name, m.display_name FROM models m "
+        "JOIN (SELECT provider_id, original_name FROM models "
+        "GROUP BY provider_id, original_name HAVING COUNT(*) > 1) d "
+        "ON m.provider_id = d.provider_id AND m.original_name = d.original_name "
+        "ORDER BY m.provider_id, m.original_name, m.updated_at DESC, m.created_at DESC, m.id DESC"
+    ))
+    keep = {}
+    renames = {}
+    removed = []
+    for model_id, provider_id, original_name, display_name in result.all():
+        key = (provider_id, original_name)
+        if key not in keep:
+            keep[key] = (model_id, display_name)
+            continue
+        removed.append(model_id)
+        kept_id, kept_display_name = keep[key]
+        if kept_display_name is None and display_name is not None and kept_id not in renames:
+            renames[kept_id] = display_name
+    
+    if renames:
+        await conn.execute(
+            text("UPDATE models SET display_name = :display_name WHERE id = :id"),
+            [{"id": model_id, "display_name": display_name} for model_id, display_name in renames.items()]
+        )
+    delete = text("DELETE FROM models WHERE id IN :ids").bindparams(bindparam("ids", expanding=True))
+    for start in range(0, len(removed), BACKFILL_BATCH_SIZE):
+        await conn.execute(delete, {"ids": removed[start:start + BACKFILL_BATCH_SIZE]})
+    if removed:
+        logger.info(f"  - 已合并 {len(keep)} 组重复模型，删除 {len(removed)} 行")
+
+
+async def create_models_unique_index(conn):
+    """合并重复行后创建 (provider_id, original_name) 唯一索引"""
+    await dedupe_models(conn)
+    await conn.execute(text(
+        "CREATE UNIQUE INDEX IF NOT EXISTS uq_models_provider_original ON models (provider_id, original_name)"
+    ))
+
+
+# 迁移步骤：(描述, 升级SQL, 回滚SQL)，均可重复执行；SQL也可以是接收连接的异步函数
+MIGRATIONS = [
+    (
+        "models表 (provider_id, original_name) 唯一索引（先合并重复行）",
+        create_models_unique_index,
+        "DROP INDEX IF EXISTS uq_models_provider_original",
+    ),
+    (
+        "models表 split_key 列（拆分provider的稳定标识）",
+        "ALTER TABLE models ADD COLUMN split_key VARCHAR",
+        "ALTER TABLE models DROP COLUMN split_key",
+    ),
+    (
+        "health_checks表 ttfb 列（首字节时间）",
+        "ALTER TABLE health_checks ADD COLUMN ttfb INTEGER",
+        "ALTER TABLE health_checks DROP COLUMN ttfb",
+    ),
+    (
+        "provider_health_latest、health_rollups_minute、health_rollups_hour 表（健康检查汇总）",
+        create_tables(ProviderHealthLatest, HealthRollupMinute, HealthRollupHour),
+        drop_tables(ProviderHealthLatest, HealthRollupMinute, HealthRollupHour),
+    ),
+    (
+        "health_rollups_day 表（按天汇总）",
+        create_tables(HealthRollupDay),
+        drop_tables(HealthRollupDay),
+    ),
+    (
+        "health_checks表 (provider_id, checked_at) 索引",
+        "CREATE INDEX IF NOT EXISTS ix_health_checks_provider_checked ON health_checks (provider_id, checked_at)",
+        "DROP INDEX IF EXISTS ix_health_checks_provider_checked",
+    ),
+]
+
+# ALTER TABLE ... ADD/DROP COLUMN 不支持 IF [NOT] EXISTS，执行前检查列是否存在
+_ALTER_COLUMN = re.compile(r"^ALTER TABLE (\w+) (ADD|DROP) COLUMN (\w+)", re.IGNORECASE)
+
+# 回填时每条语句更新的行数
+BACKFILL_BATCH_SIZE = 500
+
+# 回填分钟汇总的时间范围（统计接口只读取最近一小时的分钟汇总），更早的记录只回填小时汇总
+MINUTE_ROLLUP_BACKFILL = timedelta(days=1)
+
+
+async def _execute(conn, sql: str):
+    """执行一条迁移SQL，列已存在（或已删除）时跳过"""
+    if callable(sql):
+        await sql(conn)
+        return
+    match = _ALTER_COLUMN.match(sql)
+    if match:
+        table, action, column = match.groups()
+        columns = await conn.run_sync(
+            lambda sync_conn: {c["name"] for c in inspect(sync_conn).get_columns(table)}
+        )
+        if (action.upper() == "ADD") == (column in columns):
+            return
+    await conn.execute(text(sql))
+
+
+async def backfill_split_keys(conn):
+    """为迁移前创建的模型补齐拆分标识"""
+    result = await conn.execute(text("SELECT id, provider_id, original_name FROM models WHERE split_key IS NULL"))
+    updates = [
+        {"id": model_id, "split_key": split_key(provider_id, original_name)}
+        for model_id, provider_id, original_name in result.all()
+    ]
+    for start in range(0, len(updates), BACKFILL_BATCH_SIZE):
+        await conn.execute(
+            text("UPDATE models SET split_key = :split_key WHERE id = :id"),
+            updates[start:start + BACKFILL_BATCH_SIZE]
+        )
+    if updates:
+        logger.info(f"  - 已为 {len(updates)} 个模型补齐拆分标识")
+
+
+# 引用provider ID的表和列，重命名拆分provider时一并更新
+PROVIDER_REFERENCES = (
+    ("health_checks", "provider_id"),
+    ("provider_health_latest", "provider_id"),
+    ("health_rollups_minute", "provider_id"),
+    ("health_rollups_hour", "provider_id"),
+    ("health_rollups_day", "provider_id"),
+)
+
+
+async def migrate_legacy_split_providers(conn):
+    """
+    将旧版按位置编号命名的拆分provider（{源名称}-{序号}）改为稳定标识命名
+    
+    旧版拆分provider只复制了API源的地址和密钥，与具体模型无关，因此按序号顺序
+    改名为该源尚未创建的 {源名称}-{split_key}；多出的旧provider删除。
+    否则升级后第一次拆分会在旧provider之外再创建一整套新provider
+    """
+    sources = (await conn.execute(text("SELECT id, name FROM api_sources"))).all()
+    source_ids = {source_id for source_id, _ in sources}
+    keys = {}
+    result = await conn.execute(text("SELECT provider_id, split_key FROM models WHERE enabled = 1"))
+    for provider_id, key in result.all():
+        keys.setdefault(provider_id, set()).add(key)
+    existing = set((await conn.execute(text("SELECT id FROM providers"))).scalars().all())
+    
+    renames = []
+    removed = []
+    handled = set()
+    for source_id, name in sources:
+        prefix = f"{name}-"
+        source_keys = keys.get(source_id, set())
+        legacy = sorted(
+            (int(provider_id[len(prefix):]), provider_id)
+            for provider_id in existing
+            if provider_id.startswith(prefix)
+            and provider_id[len(prefix):].isdigit()
+            and provider_id[len(prefix):] not in source_keys
+            and provider_id not in source_ids
+            and provider_id not in handled
+        )
+        targets = sorted(
+            target for target in (split_provider_name(name, key) for key in source_keys)
+            if target not in existing
+        )
+        for index, (_, provider_id) in enumerate(legacy):
+            handled.add(provider_id)
+            if index < len(targets):
+                renames.append({"old": provider_id, "new": targets[index]})
+            else:
+                removed.append(provider_id)
+    if not renames and not removed:
+        return
+    
+    tables = set(await conn.run_sync(lambda sync_conn: inspect(sync_conn).get_table_names()))
+    references = [(table, column) for table, column in PROVIDER_REFERENCES if table in tables]
+    if renames:
+        await conn.execute(text("UPDATE providers SET id = :new, name = :new WHERE id = :old"), renames)
+        for table, column in references:
+            await conn.execute(text(f"UPDATE {table} SET {column} = :new WHERE {column} = :old"), renames)
+    for start in range(0, len(removed), BACKFILL_BATCH_SIZE):
+        ids = {"ids": removed[start:start + BACKFILL_BATCH_SIZE]}
+        for table, column in references + [("providers", "id")]:
+            await conn.execute(
+                text(f"DELETE FROM {table} WHERE {column} IN :ids").bindparams(bindparam("ids", expanding=True)),
+                ids
+            )
+    logger.info(f"  - 已将 {len(renames)} 个旧版拆分provider改为稳定标识命名，删除 {len(removed)} 个")
+
+
+async def _insert_batches(conn, table, rows):
+    for start in range(0, len(rows), BACKFILL_BATCH_SIZE):
+        await conn.execute(insert(table).values(rows[start:start + BACKFILL_BATCH_SIZE]))
+
+
+async def _write_health_rollups(conn, provider_id, latest, minutes, hours):
+    """写入一个API源的最新状态和汇总"""
+    await conn.execute(insert(ProviderHealthLatest).values(
+        provider_id=provider_id,
+        status=latest.status,
+        response_time=latest.response_time,
+        ttfb=latest.ttfb,
+        error_message=latest.error_message,
+        checked_at=latest.checked_at
+    ))
+    for table, buckets in ((HealthRollupMinute, minutes), (HealthRollupHour, hours)):
+        await _insert_batches(conn, table, [
+            {"provider_id": provider_id, "bucket": bucket, **rollup.as_row()}
+            for bucket, rollup in buckets.items()
+        ])
+
+
+async def backfill_health_rollups(conn):
+    """根据已有的健康检查记录生成最新状态表和汇总表（汇总表非空时跳过）"""
+    result = await conn.execute(text("SELECT COUNT(*) FROM provider_health_latest"))
+    if result.scalar():
+        return
+    
+    minute_since = minute_bucket(datetime.utcnow() - MINUTE_ROLLUP_BACKFILL)
+    # 按API源顺序读取，内存中只保留当前API源的汇总
+    rows = await conn.stream(
+        select(
+            HealthCheck.provider_id,
+            HealthCheck.status,
+            HealthCheck.response_time,
+            HealthCheck.ttfb,
+            HealthCheck.error_message,
+            HealthCheck.checked_at
+        )
+        .where(HealthCheck.checked_at.is_not(None))
+        .order_by(HealthCheck.provider_id, HealthCheck.checked_at)
+    )
+    provider_id = None
+    latest = None
+    minutes = {}
+    hours = {}
+    providers = 0
+    checks = 0
+    async for row in rows:
+        if row.provider_id != provider_id:
+            if provider_id is not None:
+                await _write_health_rollups(conn, provider_id, latest, minutes, hours)
+                providers += 1
+            provider_id = row.provider_id
+            minutes = {}
+            hours = {}
+        latest = row
+        checks += 1
+        hours.setdefault(hour_bucket(row.checked_at), RollupBucket()).add(row.status, row.response_time)
+        if row.checked_at >= minute_since:
+            minutes.setdefault(minute_bucket(row.checked_at), RollupBucket()).add(row.status, row.response_time)
+    if provider_id is not None:
+        await _write_health_rollups(conn, provider_id, latest, minutes, hours)
+        providers += 1
+    
+    if checks:
+        logger.info(f"  - 已根据 {checks} 条健康检查记录生成 {providers} 个API源的汇总")
+
+
 async def migrate():
     """执行数据库迁移"""
     try:
         logger.info("开始数据库迁移...")
         
-        # TODO: 实现具体的迁移逻辑
-        # 可以使用Alembic或自定义迁移脚本
+        async with engine.begin() as conn:
+            for description, upgrade_sql, _ in MIGRATIONS:
+                logger.info(f"  - {description}")
+                await _execute(conn, upgrade_sql)
+            await backfill_split_keys(conn)
+            await migrate_legacy_split_providers(conn)
+            await backfill_health_rollups(conn)
         
         logger.info("数据库迁移完成！")
-        
+    
     except Exception as e:
         logger.error(f"数据库迁移失败: {e}")
         raise
@@ -39,10 +332,13 @@ async def rollback():
     try:
         logger.info("开始回滚数据库...")
         
-        # TODO: 实现回滚逻辑
+        async with engine.begin() as conn:
+            for description, _, downgrade_sql in reversed(MIGRATIONS):
+                logger.info(f"  - {description}")
+                await _execute(conn, downgrade_sql)
         
         logger.info("数据库回滚完成！")
-        
+    
     except Exception as e:
         logger.error(f"数据库回滚失败: {e}")
         raise